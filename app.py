@@ -11,13 +11,14 @@ import qrcode
 import base64
 import re
 import math
+import click
 from functools import wraps
 from datetime import datetime, timedelta
 from flask import session, flash, redirect, url_for
 
 from flask import (
     Flask, render_template, request, redirect, url_for, flash,
-    session, make_response, send_from_directory, Response, abort, jsonify
+    session, make_response, send_from_directory, send_file, Response, abort, jsonify
 )
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -75,6 +76,13 @@ app.config['SQLALCHEMY_DATABASE_URI'] = f'postgresql://{db_user}:{db_pass}@{db_h
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SECRET_KEY"] = "uma-chave-secreta-muito-dificil-de-adivinhar"
 app.config["UPLOAD_FOLDER"] = "uploads"
+app.config["LOGS_RETENCAO_DIAS"] = 180
+app.config["LOGS_PASTA_ARQUIVO"] = os.path.join(basedir, "arquivo_logs")
+app.config["LICENCA_TTL"] = 60
+app.config["LICENCA_CARIMBO"] = os.path.join(basedir, "instance", "licenca.versao")
+app.config["PDF_CACHE_PASTA"] = os.path.join(basedir, "instance", "pdf_cache")
+app.config["PDF_PROCESSOS"] = 2
+app.config["CONTRATOS_PDF_PASTA"] = os.path.join(basedir, "instance", "contratos_pdf")
 RAIO_PERMITIDO_METROS = 100
 
 # --- Inicialização das Extensões ---
@@ -87,6 +95,43 @@ bcrypt = Bcrypt(app)
 # PARTE 3: Importação dos Modelos
 # ===================================================================
 from models import *
+from relatorios_combustivel import (
+    intervalo_periodo, abastecimentos_com_km_anterior, consulta_exportacao,
+    linhas_tce_pi, linhas_extrato, CABECALHO_TCE_PI, CABECALHO_EXTRATO, analise_consumo,
+)
+from utils import resposta_csv_streaming, ajustar_sequencias
+from resumo_frota import (
+    obter_resumo, indicadores_veiculo, serie_mensal, historico_abastecimentos, recalcular_todos,
+)
+from painel_indicadores import indicadores_painel, recalcular_painel
+from escopo_secretaria import escopo_admin, escopo_da_sessao, secretaria_do_escopo
+from verificacao_indices import verificar_indices
+from dados_benchmark import gerar_municipio, tamanhos
+from benchmark_rotas import medir, carregar_orcamentos, gravar_orcamentos, comparar
+from perfil_sql import iniciar_perfil_sql, resumo_por_endpoint, comandos_mais_lentos, limpar as limpar_perfil_sql
+from auditoria import gravador as gravador_auditoria, registrar_log
+from logs_auditoria import (
+    filtros_da_requisicao, pagina_logs, usuarios_do_filtro, pasta_arquivo, meses_arquivados,
+    pagina_arquivo, arquivar_logs, RETENCAO_PADRAO_DIAS,
+)
+from licenca import expiracao_licenca, invalidar_licenca
+from consulta_servidores import opcoes_filtro, pagina_servidores
+from busca_servidores import recriar_indice_busca
+from consulta_protocolos import recriar_indice_protocolos
+from permanencia_setores import recalcular_permanencias
+from pdf_tabular import Coluna, desenhar_tabela_pdf
+from recursos_pdf import modelo_pagina, estilos, cabecalho_gam
+from tarefas_pdf import (
+    iniciar_tarefas_pdf, relatorio_pdf, especificacao, resposta_pdf, status_pdf, caminho_pdf, acesso_permitido,
+    limpar_cache_pdf,
+)
+from importacao_servidores import (
+    iniciar_importacao, status_importacao, caminho_relatorio_erros, LinhaInvalida, CABECALHO_MODELO,
+)
+
+iniciar_perfil_sql(app)
+iniciar_tarefas_pdf(app)
+gravador_auditoria.init_app(app)
 
 
 # ===================================================================
@@ -126,11 +171,11 @@ def check_license(f):
         if request.endpoint in allowed_routes:
             return f(*args, **kwargs)
 
-        # Busca a licença no banco de dados
-        licenca = License.query.first()
+        # Data de expiração em cache (ver licenca.py); só vai ao banco quando o cache vence
+        expiracao = expiracao_licenca()
 
         # Se a licença não existe ou está expirada
-        if not licenca or licenca.expiration_date < datetime.utcnow():
+        if not expiracao or expiracao < datetime.utcnow():
             # Permite que o admin acesse para poder renovar
             if session.get("role") == "admin":
                 return f(*args, **kwargs)
@@ -150,10 +195,167 @@ def check_license(f):
 @app.cli.command("init-db")
 def init_db_command():
     db.create_all()
+    # As tabelas de busca do SQLite ficam fora do create_all (vêm das migrações)
+    with db.engine.begin() as connection:
+        recriar_indice_busca(connection)
+        recriar_indice_protocolos(connection)
     os.makedirs(os.path.join(app.config["UPLOAD_FOLDER"], "documentos"), exist_ok=True)
     print("Banco de dados e pastas de uploads inicializados.")
 
 
+@app.cli.command("recalcular-resumo-frota")
+def recalcular_resumo_frota_command():
+    """Recalcula os resumos de todos os veículos a partir do histórico (carga inicial/correção)."""
+    with db.engine.begin() as connection:
+        total = recalcular_todos(connection)
+    print(f"Resumo recalculado para {total} veículo(s).")
+
+
+@app.cli.command("recalcular-painel")
+def recalcular_painel_command():
+    """Recalcula os indicadores do dashboard (necessário após cargas/alterações em massa)."""
+    with db.engine.begin() as connection:
+        total = recalcular_painel(connection)
+    print(f"Painel recalculado: {total} indicador(es).")
+
+
+@app.cli.command("recriar-busca-servidores")
+def recriar_busca_servidores_command():
+    """Refaz a tabela de busca de servidores do SQLite (depois de cargas feitas fora do ORM)."""
+    if db.engine.dialect.name != "sqlite":
+        print("Neste banco a busca usa os índices da migração c7a9e1d3f5b2; nada a recriar.")
+        return
+    with db.engine.begin() as connection:
+        total = recriar_indice_busca(connection)
+    print(f"Busca de servidores recriada com {total} registro(s).")
+
+
+@app.cli.command("recriar-busca-protocolos")
+def recriar_busca_protocolos_command():
+    """Refaz a tabela de busca da lista de protocolos do SQLite (depois de cargas feitas fora do ORM)."""
+    if db.engine.dialect.name != "sqlite":
+        print("Neste banco a lista usa os índices da migração f8c2d4e6a1b3; nada a recriar.")
+        return
+    with db.engine.begin() as connection:
+        total = recriar_indice_protocolos(connection)
+    print(f"Busca de protocolos recriada com {total} registro(s).")
+
+
+@app.cli.command("recalcular-permanencias")
+def recalcular_permanencias_command():
+    """Refaz o tempo de permanência dos protocolos em cada setor a partir das tramitações."""
+    with db.engine.begin() as connection:
+        total = recalcular_permanencias(connection)
+    print(f"Permanências recalculadas: {total} passagem(ns).")
+
+
+@app.cli.command("verificar-indices", with_appcontext=False)
+def verificar_indices_command():
+    """Roda EXPLAIN nas consultas das rotas principais e falha se alguma varrer a tabela inteira."""
+    resultados = verificar_indices(app)
+    falhas = 0
+    for descricao, ok, plano in resultados:
+        print(f"[{'OK' if ok else 'FALHOU'}] {descricao}")
+        if not ok:
+            falhas += 1
+            print(plano)
+    if falhas:
+        print(f"{falhas} rota(s) com consulta sem índice.")
+        raise SystemExit(1)
+    print("Todas as consultas usam índice.")
+
+
+@app.cli.command("seed-bench")
+@click.option("--escala", type=float, default=1.0, show_default=True,
+              help="Multiplica os tamanhos padrão (ex: 0.01 para uma carga rápida).")
+@click.option("--semente", type=int, default=42, show_default=True, help="Semente dos dados aleatórios.")
+@click.option("--servidores", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--escolas", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--veiculos", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--motoristas", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--abastecimentos", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--pontos", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--produtos", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--dias-estoque", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--protocolos", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--contratos", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--requerimentos", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+@click.option("--gams", type=int, default=None, help="Sobrescreve o tamanho padrão.")
+def seed_bench_command(escala, semente, **ajustes):
+    """Gera um município sintético para benchmark (use um banco dedicado a isso)."""
+    tam = tamanhos(escala, **ajustes)
+    inicio = datetime.now()
+    with db.engine.begin() as connection:
+        ja_gerado = connection.execute(
+            db.select(Servidor.num_contrato).where(Servidor.num_contrato.like("BENCH-%")).limit(1)
+        ).first()
+        if ja_gerado:
+            print("Este banco já tem dados de benchmark. Use um banco novo.")
+            return
+        print("Gerando dados:", ", ".join(f"{k}={v}" for k, v in tam.items()))
+        gerar_municipio(connection, tam, semente=semente)
+        print("Recalculando resumos da frota e do painel...")
+        recalcular_todos(connection)
+        recalcular_painel(connection)
+        recriar_indice_busca(connection)
+        recriar_indice_protocolos(connection)
+        recalcular_permanencias(connection)
+        # Os protocolos e contratos gerados já têm número: os contadores continuam deles
+        ajustar_sequencias(connection)
+    print(f"Concluído em {(datetime.now() - inicio).total_seconds():.0f}s.")
+
+
+@app.cli.command("bench-rotas", with_appcontext=False)
+@click.option("--repeticoes", type=int, default=5, show_default=True, help="Execuções medidas por rota.")
+@click.option("--atualizar", is_flag=True, help="Grava as medições atuais em orcamentos_rotas.json.")
+def bench_rotas_command(repeticoes, atualizar):
+    """Mede as rotas pesadas (latência, comandos SQL, memória) e compara com os orçamentos."""
+    resultados = medir(app, repeticoes=repeticoes)
+    print(f"{'Rota':<38} {'Status':>9} {'p50 ms':>9} {'p95 ms':>9} {'SQL':>5} {'Memória KB':>11}")
+    for nome, r in resultados.items():
+        if r.get("status") != 200:
+            print(f"{nome:<38} {r['status']:>9}")
+            continue
+        print(f"{nome:<38} {r['status']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} "
+              f"{r['consultas']:>5} {r['memoria_pico_kb']:>11}")
+
+    if atualizar:
+        with app.app_context():
+            banco = db.engine.dialect.name
+        gravar_orcamentos(resultados, banco=banco, repeticoes=repeticoes)
+        print("Orçamentos atualizados em orcamentos_rotas.json.")
+        return
+
+    falhas = comparar(resultados, carregar_orcamentos())
+    if falhas:
+        print("Rotas fora do orçamento:")
+        for falha in falhas:
+            print(f"  - {falha}")
+        raise SystemExit(1)
+    print("Todas as rotas dentro do orçamento.")
+
+
+@app.cli.command("arquivar-logs")
+@click.option("--dias", type=int, default=None, help="Idade mínima (em dias) dos logs arquivados.")
+def arquivar_logs_command(dias):
+    """Move os logs antigos para os arquivos mensais compactados."""
+    dias = dias or app.config.get("LOGS_RETENCAO_DIAS", RETENCAO_PADRAO_DIAS)
+    pasta = pasta_arquivo(app)
+    with db.engine.connect() as connection:
+        movidos = arquivar_logs(connection, pasta, dias=dias)
+    for (ano, mes), quantidade in movidos.items():
+        print(f"{mes:02d}/{ano}: {quantidade} log(s) arquivado(s).")
+    print(f"Logs com mais de {dias} dias movidos para {pasta}." if movidos else "Nenhum log para arquivar.")
+
+
+@app.cli.command("limpar-cache-pdf")
+@click.option("--dias", type=int, default=7, show_default=True, help="Apaga os PDFs sem uso há mais dias que isso.")
+def limpar_cache_pdf_command(dias):
+    """Remove do cache os PDFs gerados em segundo plano que não são pedidos há algum tempo."""
+    apagados = limpar_cache_pdf(dias)
+    print(f"{apagados} PDF(s) removido(s) do cache.")
+
+
 @app.cli.command("create-admin")
 def create_admin_command():
     with app.app_context():
@@ -175,18 +377,6 @@ def inject_year():
     return {"current_year": datetime.utcnow().year}
 
 
-def registrar_log(action):
-    try:
-        if "logged_in" in session:
-            username = session.get("username", "Anônimo")
-            ip_address = request.remote_addr
-            log_entry = Log(username=username, action=action, ip_address=ip_address)
-            db.session.add(log_entry)
-            db.session.commit()
-    except Exception as e:
-        print(f"Erro ao registrar log: {e}")
-        db.session.rollback()
-
 def limpar_cpf(cpf):
     if cpf:
         return re.sub(r"\D", "", cpf)
@@ -220,29 +410,6 @@ def fleet_required(f):
         return f(*args, **kwargs)
     return decorated_function
     
-def cabecalho_e_rodape(canvas, doc):
-    canvas.saveState()
-    canvas.setFont("Helvetica", 9)
-    canvas.drawString(
-        2 * cm, 1.5 * cm, f"Emitido em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
-    )
-    canvas.drawRightString(doc.width + doc.leftMargin, 1.5 * cm, f"Página {doc.page}")
-
-    if doc.page == 1:
-        image_path = os.path.join(basedir, "static", "timbre.jpg")
-        if os.path.exists(image_path):
-            canvas.drawImage(
-                image_path,
-                2 * cm,
-                A4[1] - 2.5 * cm, # A4[1] é a altura da página
-                width=17 * cm,
-                height=2.2 * cm,
-                preserveAspectRatio=True,
-                mask="auto",
-            )
-
-    canvas.restoreState()    
-
 
 # ===================================================================
 # PARTE 5: Definição das Rotas da Aplicação
@@ -396,11 +563,33 @@ def editar_usuario(id):
 @login_required
 @admin_required
 def ver_logs():
-    page = request.args.get("page", 1, type=int)
-    logs_pagination = Log.query.order_by(Log.timestamp.desc()).paginate(
-        page=page, per_page=25, error_out=False
+    filtros = filtros_da_requisicao(request.args)
+    pasta = pasta_arquivo(app)
+    meses = meses_arquivados(pasta)
+    fonte = request.args.get("fonte", "banco")
+    arquivo = next((m for m in meses if fonte == f"{m[0]:04d}-{m[1]:02d}"), None)
+    if arquivo:
+        logs = pagina_arquivo(pasta, *arquivo, filtros, pagina=request.args.get("pagina", 1, type=int))
+    else:
+        fonte = "banco"
+        logs = pagina_logs(filtros, antes=request.args.get("antes"), depois=request.args.get("depois"))
+    return render_template(
+        "logs.html", logs=logs, filtros=filtros, fonte=fonte,
+        meses_arquivados=meses, usuarios=usuarios_do_filtro(filtros["usuario"]),
     )
-    return render_template("logs.html", logs=logs_pagination)    
+
+
+@app.route("/admin/desempenho", methods=["GET", "POST"])
+@login_required
+@admin_required
+def ver_desempenho():
+    if request.method == "POST":
+        limpar_perfil_sql()
+        flash("Medições de desempenho apagadas.", "success")
+        return redirect(url_for("ver_desempenho"))
+    with db.engine.connect() as connection:
+        lentas = comandos_mais_lentos(connection)
+    return render_template("desempenho.html", endpoints=resumo_por_endpoint(), lentas=lentas)
     
     
 @app.route("/admin/licenca", methods=["GET", "POST"])
@@ -412,6 +601,7 @@ def admin_licenca():
         nova_chave = str(uuid.uuid4())
         licenca.renewal_key = nova_chave
         db.session.commit()
+        invalidar_licenca()
         registrar_log("Gerou uma nova chave de renovação.")
         flash("Nova chave de renovação gerada com sucesso!", "success")
         return redirect(url_for("admin_licenca"))
@@ -428,6 +618,7 @@ def renovar_licenca():
             licenca.expiration_date = datetime.utcnow() + timedelta(days=31)
             licenca.renewal_key = None
             db.session.commit()
+            invalidar_licenca()
             registrar_log("Renovou a licença do sistema com sucesso.")
             flash("Licença renovada com sucesso! Obrigado.", "success")
             return redirect(url_for("dashboard"))
@@ -440,74 +631,68 @@ def renovar_licenca():
     return render_template("renovar_licenca.html")    
     
     
+COLUNAS_RELATORIO_SERVIDORES = [
+    Coluna("Nome", 7), Coluna("CPF", 3.5), Coluna("Função", 4),
+    Coluna("Lotação", 4), Coluna("Vínculo", 3.5), Coluna("Telefone", 3),
+]
+
+
+@relatorio_pdf("servidores", ["servidor"])
+def pdf_relatorio_servidores(parametros, saida):
+    # Só as colunas do relatório, lidas em blocos e desenhadas direto no canvas (pdf_tabular.py)
+    linhas = (
+        Servidor.query.with_entities(
+            Servidor.nome, Servidor.cpf, Servidor.funcao, Servidor.lotacao,
+            Servidor.tipo_vinculo, Servidor.telefone,
+        )
+        .order_by(Servidor.nome)
+        .yield_per(1000)
+    )
+    desenhar_tabela_pdf(
+        saida,
+        "Relatório Geral de Servidores",
+        COLUNAS_RELATORIO_SERVIDORES,
+        linhas,
+        paisagem=True,
+        margens=(1.5 * cm, 1.5 * cm, 3 * cm, 2.5 * cm),
+        vazio="Nenhum servidor cadastrado.",
+    )
+
+
 @app.route("/relatorio/servidores/pdf")
 @login_required
 def gerar_relatorio_pdf():
-    servidores = Servidor.query.order_by(Servidor.nome).all()
-    
-    buffer = io.BytesIO()
-    doc = BaseDocTemplate(
-        buffer,
-        pagesize=landscape(A4),
-        leftMargin=1.5 * cm,
-        rightMargin=1.5 * cm,
-        topMargin=3 * cm,
-        bottomMargin=2.5 * cm,
+    # Gerado em segundo plano e reaproveitado enquanto os servidores não mudarem (tarefas_pdf.py)
+    response = resposta_pdf(
+        especificacao("servidores"),
+        f'relatorio_servidores_{datetime.now().strftime("%Y-%m-%d")}.pdf',
     )
+    registrar_log("Gerou o PDF do Relatório Geral de Servidores.")
+    return response
 
-    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id="normal")
-    template = PageTemplate(id="main_template", frames=[frame], onPage=cabecalho_e_rodape)
-    doc.addPageTemplates([template])
-    
-    styles = getSampleStyleSheet()
-    p_style = ParagraphStyle(name="CustomNormal", parent=styles["Normal"], alignment=TA_CENTER, fontSize=8)
-    header_style = ParagraphStyle(name="CustomHeader", parent=styles["Normal"], alignment=TA_CENTER, fontSize=9, fontName="Helvetica-Bold")
-    
-    story = [
-        Paragraph("Relatório Geral de Servidores", styles["h1"]),
-        Spacer(1, 1 * cm),
-    ]
 
-    if not servidores:
-        story.append(Paragraph("Nenhum servidor cadastrado.", styles["Normal"]))
-    else:
-        table_data = [
-            [Paragraph(h, header_style) for h in ["Nome", "CPF", "Função", "Lotação", "Vínculo", "Telefone"]]
-        ]
-        for s in servidores:
-            row = [
-                Paragraph(s.nome or "", p_style),
-                Paragraph(s.cpf or "", p_style),
-                Paragraph(s.funcao or "", p_style),
-                Paragraph(s.lotacao or "", p_style),
-                Paragraph(s.tipo_vinculo or "", p_style),
-                Paragraph(s.telefone or "", p_style),
-            ]
-            table_data.append(row)
-
-        table = Table(table_data, colWidths=[7 * cm, 3.5 * cm, 4 * cm, 4 * cm, 3.5 * cm, 3 * cm])
-        style = TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#004d40")),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("GRID", (0, 0), (-1, -1), 1, colors.black),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ]
+@app.route("/pdf/<chave>")
+@login_required
+def baixar_pdf(chave):
+    status = status_pdf(chave)
+    # 404 também sem permissão, para não confirmar que o PDF existe
+    if status is None or not acesso_permitido(status):
+        abort(404)
+    if status["situacao"] == "pronto":
+        return send_file(
+            caminho_pdf(chave), mimetype="application/pdf", conditional=True,
+            download_name=status.get("nome_arquivo") or f"{chave}.pdf",
         )
-        table.setStyle(style)
-        story.append(table)
+    return render_template("gerando_pdf.html", chave=chave, status=status)
 
-    doc.build(story)
-    buffer.seek(0)
-    
-    response = make_response(buffer.getvalue())
-    response.headers["Content-Type"] = "application/pdf"
-    response.headers["Content-Disposition"] = f'inline; filename=relatorio_servidores_{datetime.now().strftime("%Y-%m-%d")}.pdf'
-    
-    registrar_log("Gerou o PDF do Relatório Geral de Servidores.")
-    return response
+
+@app.route("/api/pdf/<chave>")
+@login_required
+def status_pdf_api(chave):
+    status = status_pdf(chave)
+    if status is None or not acesso_permitido(status):
+        return jsonify({"erro": "PDF não encontrado."}), 404
+    return jsonify(status)
 
 
 @app.route("/combustivel/relatorio/mensal/selecionar")
@@ -518,44 +703,26 @@ def pagina_relatorio_mensal():
 @app.route("/relatorio/combustivel/tce-pi")
 @login_required
 @role_required('Combustivel', 'admin')
+@escopo_admin
 def relatorio_combustivel_tce_pi():
     """
     Gera um relatório de abastecimento no formato CSV exigido pelo TCE-PI.
+    Filtros opcionais pela URL: ano, mes e secretaria_id.
+    O arquivo é enviado em streaming, sem carregar a tabela inteira na memória.
     """
     try:
-        abastecimentos = Abastecimento.query.join(
-            Motorista, Abastecimento.motorista_id == Motorista.id
-        ).join(Veiculo).order_by(Abastecimento.data.asc()).all()
-
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=";")
-
-        header = [
-            "unidade_gestora", "exercicio", "mes_referencia", "numero_notafiscal",
-            "data_notafiscal", "cpf_condutor", "nome_condutor", "placa_veiculo",
-            "quilometragem", "tipo_combustivel", "quantidade_combustivel",
-            "valor_unitario", "valor_total", "cnpj_fornecedor",
-        ]
-        writer.writerow(header)
-
-        for r in abastecimentos:
-            row = [
-                "", r.data.year, r.data.month, "", r.data.strftime("%Y-%m-%d"),
-                r.motorista.cpf, r.motorista.nome, r.veiculo.placa,
-                f"{r.quilometragem:.1f}".replace(".", ","), r.tipo_combustivel,
-                f"{r.litros:.2f}".replace(".", ","), f"{r.valor_litro:.2f}".replace(".", ","),
-                f"{r.valor_total:.2f}".replace(".", ","), "",
-            ]
-            writer.writerow(row)
-
-        csv_content = output.getvalue()
-        response = Response(
-            csv_content.encode("utf-8-sig"),
-            mimetype="text/csv",
-            headers={
-                "Content-Disposition": "attachment;filename=Relatorio_Abastecimento_TCE-PI.csv"
-            },
-        )
+        ano = request.args.get("ano", type=int)
+        mes = request.args.get("mes", type=int)
+        secretaria_id = request.args.get("secretaria_id", type=int)
+
+        data_inicio, data_fim = (None, None)
+        nome_arquivo = "Relatorio_Abastecimento_TCE-PI.csv"
+        if ano:
+            data_inicio, data_fim = intervalo_periodo(ano, mes)
+            nome_arquivo = f"Relatorio_Abastecimento_TCE-PI_{mes}-{ano}.csv" if mes else f"Relatorio_Abastecimento_TCE-PI_{ano}.csv"
+
+        query = consulta_exportacao(data_inicio, data_fim, secretaria_id=secretaria_id)
+        response = resposta_csv_streaming(linhas_tce_pi(query), CABECALHO_TCE_PI, nome_arquivo)
         registrar_log("Gerou o relatório de abastecimento para o TCE-PI.")
         return response
 
@@ -564,6 +731,47 @@ def relatorio_combustivel_tce_pi():
         return redirect(url_for("lancar_abastecimento"))
 
 
+@app.route("/relatorio/combustivel/extrato/selecionar")
+@login_required
+@role_required('Combustivel', 'admin')
+def selecionar_extrato_combustivel():
+    secretarias = Secretaria.query.order_by(Secretaria.nome).all()
+    return render_template("selecionar_extrato_combustivel.html", secretarias=secretarias)
+
+
+# Rota que gera o CSV detalhado com uma linha por abastecimento
+@app.route("/relatorio/combustivel/extrato/gerar", methods=["POST"])
+@login_required
+@role_required('Combustivel', 'admin')
+@escopo_admin
+def gerar_extrato_combustivel_csv():
+    try:
+        ano = int(request.form.get("ano"))
+        mes = int(request.form.get("mes"))
+        secretaria_id = request.form.get("secretaria_id", type=int)
+
+        data_inicio, data_fim = intervalo_periodo(ano, mes)
+        query = consulta_exportacao(
+            data_inicio, data_fim, secretaria_id=secretaria_id, ordenar_por_modelo=True
+        )
+
+        # Verifica se há dados com uma consulta leve antes de começar o streaming
+        if not db.session.query(query.limit(1).exists()).scalar():
+            flash(f"Nenhum abastecimento encontrado para {mes}/{ano}.", "warning")
+            return redirect(url_for("selecionar_extrato_combustivel"))
+
+        return resposta_csv_streaming(
+            linhas_extrato(query),
+            CABECALHO_EXTRATO,
+            f"extrato_abastecimentos_{mes}-{ano}.csv",
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Ocorreu um erro ao gerar o extrato: {e}", "danger")
+        return redirect(url_for("selecionar_extrato_combustivel"))
+
+
 @app.route("/relatorio/veiculos/selecionar")
 @login_required
 def selecionar_relatorio_veiculos():
@@ -589,75 +797,50 @@ def selecionar_relatorio_veiculos():
 def gerar_relatorio_veiculos_mensal():
     try:
         ano = int(request.form.get("ano"))
-        mes = int(request.form.get("mes"))
+        mes = request.form.get("mes")
         orgao_filtro = request.form.get("orgao")
 
-        data_inicio = datetime(ano, mes, 1)
-        if mes == 12:
-            data_fim = datetime(ano + 1, 1, 1)
+        # "todos" gera o ano inteiro; com "mes_fim" gera um intervalo de meses
+        if mes == "todos":
+            mes_inicio, mes_fim = None, None
+            sufixo_arquivo = f"{ano}"
         else:
-            data_fim = datetime(ano, mes + 1, 1)
+            mes_inicio = int(mes)
+            mes_fim = request.form.get("mes_fim", type=int) or mes_inicio
+            sufixo_arquivo = f"{mes_inicio}-{ano}" if mes_fim == mes_inicio else f"{mes_inicio}a{mes_fim}-{ano}"
 
-        query_veiculos = Veiculo.query
+        data_inicio, data_fim = intervalo_periodo(ano, mes_inicio, mes_fim)
 
-        if orgao_filtro and orgao_filtro != "todos":
-            query_veiculos = query_veiculos.filter(Veiculo.orgao == orgao_filtro)
+        if orgao_filtro == "todos":
+            orgao_filtro = None
 
-        veiculos = query_veiculos.order_by(Veiculo.modelo).all()
-        dados_relatorio = []
+        # Uma única consulta para todos os veículos (LAG por placa), em vez de duas por veículo
+        abastecimentos = abastecimentos_com_km_anterior(data_inicio, data_fim, orgao=orgao_filtro)
 
-        for veiculo in veiculos:
-            abastecimentos_do_mes = (
-                Abastecimento.query.filter(
-                    Abastecimento.veiculo_placa == veiculo.placa,
-                    Abastecimento.data >= data_inicio,
-                    Abastecimento.data < data_fim,
-                )
-                .order_by(Abastecimento.quilometragem.asc())
-                .all()
+        dados_relatorio = []
+        for r in abastecimentos:
+            km_inicial = r["km_inicial"]
+            dados_relatorio.append(
+                {
+                    "modelo": r["modelo"],
+                    "placa": r["placa"],
+                    "renavam": r["renavam"] or "",
+                    "ano_fab": r["ano_fabricacao"] or "",
+                    "ano_mod": r["ano_modelo"] or "",
+                    "tipo_veiculo": r["tipo"] or "AUTOMOVEL",
+                    "capacidade": "",
+                    "orgao_localizacao": r["orgao"] or "",
+                    "qtde_abastecimento": f"{r['litros']:.2f}".replace(".", ","),
+                    "combustivel": r["tipo_combustivel"],
+                    "km_inicial_mes": (
+                        f"{km_inicial:.1f}".replace(".", ",")
+                        if km_inicial
+                        else ""
+                    ),
+                    "km_final_mes": f"{r['km_final']:.1f}".replace(".", ","),
+                }
             )
 
-            if abastecimentos_do_mes:
-                km_anterior_por_veiculo = {}
-                ultimo_abastecimento_anterior = (
-                    Abastecimento.query.filter(
-                        Abastecimento.veiculo_placa == veiculo.placa,
-                        Abastecimento.data < data_inicio,
-                    )
-                    .order_by(Abastecimento.quilometragem.desc())
-                    .first()
-                )
-
-                if ultimo_abastecimento_anterior:
-                    km_anterior_por_veiculo[veiculo.placa] = (
-                        ultimo_abastecimento_anterior.quilometragem
-                    )
-
-                for r in abastecimentos_do_mes:
-                    placa = r.veiculo.placa
-                    km_inicial = km_anterior_por_veiculo.get(placa, 0)
-                    km_final = r.quilometragem
-                    dados_relatorio.append(
-                        {
-                            "modelo": veiculo.modelo,
-                            "placa": placa,
-                            "renavam": veiculo.renavam or "",
-                            "ano_fab": veiculo.ano_fabricacao or "",
-                            "ano_mod": veiculo.ano_modelo or "",
-                            "tipo_veiculo": r.veiculo.tipo or "AUTOMOVEL",
-                            "orgao_localizacao": veiculo.orgao or "",
-                            "qtde_abastecimento": f"{r.litros:.2f}".replace(".", ","),
-                            "combustivel": r.tipo_combustivel,
-                            "km_inicial_mes": (
-                                f"{km_inicial:.1f}".replace(".", ",")
-                                if km_inicial
-                                else ""
-                            ),
-                            "km_final_mes": f"{km_final:.1f}".replace(".", ","),
-                        }
-                    )
-                    km_anterior_por_veiculo[placa] = km_final
-
         if not dados_relatorio:
             flash(
                 f"Nenhum abastecimento encontrado para os filtros selecionados.",
@@ -666,7 +849,6 @@ def gerar_relatorio_veiculos_mensal():
             return redirect(url_for("selecionar_relatorio_veiculos"))
 
         output = io.StringIO()
-        # A coluna 'capacidade' não existe no dicionário, foi removida do header
         header = [
             "modelo",
             "placa",
@@ -683,23 +865,13 @@ def gerar_relatorio_veiculos_mensal():
         ]
         writer = csv.DictWriter(output, fieldnames=header, delimiter=";")
         writer.writeheader()
-
-        # O DictWriter espera um dicionário com todas as chaves do cabeçalho
-        # Precisamos garantir que todas as chaves existam em cada linha
-        rows_completas = []
-        for row in dados_relatorio:
-            # Adiciona a chave 'capacidade' vazia se ela não existir
-            if "capacidade" not in row:
-                row["capacidade"] = ""
-            rows_completas.append(row)
-
-        writer.writerows(rows_completas)
+        writer.writerows(dados_relatorio)
 
         response = Response(
             output.getvalue().encode("utf-8-sig"),
             mimetype="text/csv",
             headers={
-                "Content-Disposition": f"attachment;filename=relatorio_detalhado_{mes}-{ano}.csv"
+                "Content-Disposition": f"attachment;filename=relatorio_detalhado_{sufixo_arquivo}.csv"
             },
         )
         return response
@@ -806,72 +978,36 @@ def add_manutencao(placa):
 
 @app.route("/")
 @login_required
+@escopo_admin
 def dashboard():
-    # Pega a permissão e a secretaria do usuário logado na sessão
     user_role = session.get("role")
-    secretaria_id_logada = session.get("secretaria_id")
 
     # --- LÓGICA DE FILTRO INTERATIVO ---
-    # O admin pode passar um filtro de secretaria pela URL (ex: /?secretaria_id=2)
-    secretaria_filtro_id = request.args.get('secretaria_id', type=int)
-    
-    # Define qual secretaria será usada para filtrar os dados
-    target_secretaria_id = secretaria_id_logada
-    
-    # Se o usuário é admin E ele selecionou um filtro, a consulta usará o ID do filtro
-    if user_role == 'admin' and secretaria_filtro_id:
-        target_secretaria_id = secretaria_filtro_id
-        
-    # --- PREPARAÇÃO DAS QUERIES BASE ---
+    # As consultas já vêm filtradas pela secretaria do usuário (escopo_secretaria.py).
+    # O admin vê todas as secretarias, ou só a escolhida na URL (ex: /?secretaria_id=2)
+    target_secretaria_id = secretaria_do_escopo()
     query_servidores = Servidor.query
-    query_veiculos = Veiculo.query
-    
-    # Aplica o filtro de secretaria se o usuário não for admin, ou se o admin aplicou um filtro
-    if user_role != 'admin' or secretaria_filtro_id:
-        query_servidores = query_servidores.filter_by(secretaria_id=target_secretaria_id)
-        query_veiculos = query_veiculos.filter_by(secretaria_id=target_secretaria_id)
 
     # --- CÁLCULOS PARA OS CARDS E GRÁFICOS ---
-    total_servidores = query_servidores.count()
-    remuneracao_media_query = query_servidores.with_entities(db.func.avg(Servidor.remuneracao)).scalar()
-    remuneracao_media = remuneracao_media_query or 0
+    # Todos os números vêm já agregados da tabela painel_indicador (uma única leitura);
+    # ela é mantida pelos eventos de Servidor e Abastecimento em painel_indicadores.py
+    ano_atual = datetime.now().year
+    painel = indicadores_painel(secretaria_id=target_secretaria_id, ano=ano_atual)
+    total_servidores = painel["total_servidores"]
+    remuneracao_media = painel["remuneracao_media"]
 
     # Gráfico de Funções
-    servidores_por_funcao = query_servidores.with_entities(Servidor.funcao, db.func.count(Servidor.funcao)).group_by(Servidor.funcao).order_by(db.func.count(Servidor.funcao).desc()).all()
-    funcao_labels = [item[0] or "Não Especificado" for item in servidores_por_funcao]
-    funcao_data = [item[1] for item in servidores_por_funcao]
+    funcao_labels = [item[0] for item in painel["funcao"]]
+    funcao_data = [item[1] for item in painel["funcao"]]
 
     # Gráfico de Lotações
-    servidores_por_lotacao = query_servidores.with_entities(Servidor.lotacao, db.func.count(Servidor.lotacao)).group_by(Servidor.lotacao).order_by(db.func.count(Servidor.lotacao).desc()).all()
-    lotacao_labels = [item[0] or "Não Especificado" for item in servidores_por_lotacao]
-    lotacao_data = [item[1] for item in servidores_por_lotacao]
-    
-    # --- LÓGICA PARA COMBUSTÍVEL ---
-    ano_atual = datetime.now().year
-    
-    placas_permitidas = [v.placa for v in query_veiculos.all()]
-    total_litros_ano = 0
-    if placas_permitidas:
-        total_litros_ano = db.session.query(db.func.sum(Abastecimento.litros)).filter(
-            Abastecimento.veiculo_placa.in_(placas_permitidas),
-            db.extract('year', Abastecimento.data) == ano_atual
-        ).scalar() or 0
-
-    dados_grafico_combustivel = []
-    if placas_permitidas:
-        dados_grafico_combustivel = db.session.query(
-            db.func.extract('month', Abastecimento.data),
-            db.func.sum(Abastecimento.litros)
-        ).filter(
-            Abastecimento.veiculo_placa.in_(placas_permitidas),
-            db.extract('year', Abastecimento.data) == ano_atual
-        ).group_by(db.func.extract('month', Abastecimento.data)).order_by(db.func.extract('month', Abastecimento.data)).all()
+    lotacao_labels = [item[0] for item in painel["lotacao"]]
+    lotacao_data = [item[1] for item in painel["lotacao"]]
 
+    # --- LÓGICA PARA COMBUSTÍVEL ---
+    total_litros_ano = painel["total_litros_ano"]
     meses_labels = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-    litros_data = [0] * 12
-    for mes, total in dados_grafico_combustivel:
-        if mes is not None:
-            litros_data[int(mes) - 1] = total
+    litros_data = painel["litros_mes"]
 
     # --- LÓGICA PARA ALERTAS ---
     hoje = datetime.now().date()
@@ -1051,40 +1187,28 @@ def excluir_gam(gam_id):
 @role_required('RH', 'admin')
 def imprimir_gam(gam_id):
     guia = GAM.query.get_or_404(gam_id)
-    pdf_buffer = gerar_pdf_gam(guia)
-    response = make_response(pdf_buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
     nome_arquivo = f'GAM_{guia.servidor.nome.replace(" ", "_")}_{guia.id}.pdf'
-    response.headers['Content-Disposition'] = f'inline; filename={nome_arquivo}'
-    return response
+    # Pela fila de PDFs (tarefas_pdf.py): a mesma guia sem alterações reaproveita o arquivo
+    return resposta_pdf(especificacao("gam", gam_id=guia.id), nome_arquivo)
+
+
+@relatorio_pdf("gam", [GAM.__tablename__, "servidor"], papeis=["RH"])
+def pdf_gam(parametros, saida):
+    guia = db.session.get(GAM, parametros["gam_id"])
+    if guia is None:
+        raise ValueError("GAM não encontrada.")
+    saida.write(gerar_pdf_gam(guia).getvalue())
 
 
 def gerar_pdf_gam(guia):
     buffer = io.BytesIO()
     doc = BaseDocTemplate(buffer, pagesize=A4, leftMargin=1.5*cm, rightMargin=1.5*cm, topMargin=4.5*cm, bottomMargin=1.5*cm)
-    def cabecalho_completo(canvas, doc):
-        canvas.saveState()
-        try:
-            timbre_path = os.path.join(basedir, "static", "timbre.jpg")
-            if os.path.exists(timbre_path):
-                logo = Image(timbre_path, width=17*cm, height=2.2*cm, hAlign='CENTER')
-                logo.drawOn(canvas, 2*cm, A4[1] - 3*cm)
-        except Exception as e:
-            print(f"Erro ao carregar o timbre: {e}")
-        posicao_y_texto = A4[1] - 3.7*cm
-        canvas.setFont('Helvetica-Bold', 12)
-        canvas.drawCentredString(10.5*cm, posicao_y_texto, "GUIA PARA ATENDIMENTO MÉDICO - GAM")
-        canvas.setFont('Helvetica-Bold', 11)
-        canvas.drawCentredString(10.5*cm, posicao_y_texto - 0.5*cm, "PREFEITURA MUNICIPAL DE VALENÇA DO PIAUÍ")
-        canvas.restoreState()
-    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
-    template = PageTemplate(id='main_template', frames=[frame], onPage=cabecalho_completo)
-    doc.addPageTemplates([template])
+    doc.addPageTemplates([modelo_pagina(doc, cabecalho_gam)])
     story = []
-    styles = getSampleStyleSheet()
-    style_corpo = ParagraphStyle(name='Corpo', fontName='Helvetica', fontSize=10.5, alignment=TA_JUSTIFY, leading=13)
-    style_negrito = ParagraphStyle(name='Negrito', parent=style_corpo, fontName='Helvetica-Bold')
-    style_assinatura = ParagraphStyle(name='Assinatura', fontName='Helvetica', fontSize=9, alignment=TA_CENTER)
+    styles = estilos()
+    style_corpo = styles['GamCorpo']
+    style_negrito = styles['GamNegrito']
+    style_assinatura = styles['GamAssinatura']
     dados_servidor_texto = f"<b>1-NOME DO SERVIDOR:</b> {guia.servidor.nome.upper()} &nbsp;&nbsp; <b>MATRÍCULA N.</b> {guia.servidor.num_contrato} &nbsp;&nbsp; <b>LOTAÇÃO:</b> {guia.servidor.lotacao}"
     if guia.data_laudo:
         locale.setlocale(locale.LC_TIME, "pt_BR.UTF-8")
@@ -1130,57 +1254,23 @@ def get_servidor_details(num_contrato):
 @app.route("/servidores")
 @login_required
 @role_required('RH', 'admin')
+@escopo_da_sessao
 def lista_servidores():
-    # Pega o ID da secretaria do usuário que está logado na sessão
-    secretaria_id_logada = session.get("secretaria_id")
-    
-    # A LINHA MAIS IMPORTANTE: A consulta principal agora começa com um filtro pela secretaria do usuário
-    query = Servidor.query.filter_by(secretaria_id=secretaria_id_logada)
-
-    # O resto da lógica de filtro e busca continua a mesma, mas aplicada sobre a consulta já filtrada
-    termo_busca = request.args.get("termo")
-    funcao_filtro = request.args.get("funcao")
-    lotacao_filtro = request.args.get("lotacao")
-
-    if termo_busca:
-        search_pattern = f"%{termo_busca}%"
-        query = query.filter(
-            or_(
-                Servidor.nome.ilike(search_pattern),
-                Servidor.cpf.ilike(search_pattern),
-                Servidor.num_contrato.ilike(search_pattern),
-            )
-        )
-
-    if funcao_filtro:
-        query = query.filter(Servidor.funcao == funcao_filtro)
-
-    if lotacao_filtro:
-        query = query.filter(Servidor.lotacao == lotacao_filtro)
-
-    servidores = query.order_by(Servidor.nome).all()
-
-    # (A lógica para preencher os filtros e status continua a mesma)
-    funcoes_disponiveis = [r[0] for r in db.session.query(Servidor.funcao).distinct().order_by(Servidor.funcao).all() if r[0]]
-    lotacoes_disponiveis = [r[0] for r in db.session.query(Servidor.lotacao).distinct().order_by(Servidor.lotacao).all() if r[0]]
-    
-    hoje = datetime.now().date()
-    status_servidores = {}
-    requerimentos_ativos = Requerimento.query.filter(
-        Requerimento.status == "Aprovado", Requerimento.data_inicio_requerimento <= hoje
-    ).all()
-
-    for req in requerimentos_ativos:
-        if not req.data_retorno_trabalho or req.data_retorno_trabalho > hoje:
-            status_servidores[req.servidor_cpf] = req.natureza
-            
+    # A tabela é carregada página a página por /api/servidores
+    funcoes_disponiveis, lotacoes_disponiveis = opcoes_filtro()
     return render_template(
         "index.html",
-        servidores=servidores,
         funcoes_disponiveis=funcoes_disponiveis,
         lotacoes_disponiveis=lotacoes_disponiveis,
-        status_servidores=status_servidores
     )
+
+
+@app.route("/api/servidores")
+@login_required
+@role_required('RH', 'admin')
+@escopo_da_sessao
+def api_servidores():
+    return jsonify(pagina_servidores(request.args))
     
     
 @app.route("/delete/<path:id>")
@@ -1233,28 +1323,55 @@ def importar_servidores():
         flash("Nenhum arquivo selecionado.", "danger")
         return redirect(url_for("lista_servidores"))
 
-    if file and file.filename.endswith(".csv"):
-        try:
-            # Lógica para ler e processar o arquivo CSV
-            # (Esta parte do seu código original)
-            db.session.commit()
-            flash("Importação concluída com sucesso!", "success")
-        except Exception as e:
-            db.session.rollback()
-            flash(f"Ocorreu um erro ao processar o arquivo: {e}", "danger")
-        
-        return redirect(url_for("lista_servidores"))
-    else:
-        flash("Formato de arquivo inválido. Por favor, envie um arquivo .csv.", "warning")
+    # O arquivo é processado em segundo plano (importacao_servidores.py)
+    try:
+        importacao_id = iniciar_importacao(
+            app, file, session.get("secretaria_id"), session.get("username")
+        )
+    except LinhaInvalida as e:
+        flash(f"Arquivo inválido: {e}.", "warning")
         return redirect(url_for("lista_servidores"))
 
+    registrar_log(f'Iniciou a importação de servidores do arquivo "{file.filename}".')
+    return redirect(url_for("acompanhar_importacao", importacao_id=importacao_id))
+
+
+@app.route("/importar_servidores/<importacao_id>")
+@login_required
+@admin_required
+def acompanhar_importacao(importacao_id):
+    status = status_importacao(app, importacao_id)
+    if status is None:
+        abort(404)
+    return render_template("importacao_servidores.html", status=status)
+
+
+@app.route("/api/importar_servidores/<importacao_id>")
+@login_required
+@admin_required
+def progresso_importacao(importacao_id):
+    status = status_importacao(app, importacao_id)
+    if status is None:
+        return jsonify({"error": "Importação não encontrada"}), 404
+    return jsonify(status)
+
+
+@app.route("/importar_servidores/<importacao_id>/erros.csv")
+@login_required
+@admin_required
+def relatorio_erros_importacao(importacao_id):
+    caminho = caminho_relatorio_erros(app, importacao_id)
+    if caminho is None:
+        abort(404)
+    return send_from_directory(
+        os.path.abspath(os.path.dirname(caminho)), os.path.basename(caminho),
+        as_attachment=True, download_name="erros_importacao_servidores.csv",
+    )
+
 @app.route("/baixar_modelo_csv")
 @login_required
 def baixar_modelo_csv():
-    header = [
-        "Nº CONTRATO", "NOME", "FUNÇÃO", "LOTAÇÃO", 
-        "CARGA HORÁRIA", "REMUNERAÇÃO", "VIGÊNCIA",
-    ]
+    header = CABECALHO_MODELO
     output = io.StringIO()
     writer = csv.writer(output, delimiter=";")
     writer.writerow(header)
@@ -1277,41 +1394,45 @@ def baixar_modelo_csv():
 @role_required('Combustivel', 'admin')
 def detalhes_veiculo(placa):
     veiculo = Veiculo.query.get_or_404(placa)
-    abastecimentos = Abastecimento.query.filter_by(veiculo_placa=placa).order_by(Abastecimento.quilometragem.asc()).all()
-    manutencoes = Manutencao.query.filter_by(veiculo_placa=placa).order_by(Manutencao.data.desc()).all()
-    indicadores = { "gasto_combustivel": sum(a.valor_total for a in abastecimentos), "gasto_manutencao": sum(m.custo for m in manutencoes), "total_litros": sum(a.litros for a in abastecimentos), "total_km_rodado": 0, "consumo_medio_geral": 0, "custo_medio_km": 0, }
-    indicadores["gasto_total"] = indicadores["gasto_combustivel"] + indicadores["gasto_manutencao"]
-    chart_labels = []
-    chart_consumo_data = []
-    chart_custo_km_data = []
-    abastecimentos_com_analise = []
-    if len(abastecimentos) > 1:
-        indicadores["total_km_rodado"] = abastecimentos[-1].quilometragem - abastecimentos[0].quilometragem
-        if indicadores["total_km_rodado"] > 0:
-            litros_para_media = sum(a.litros for a in abastecimentos[:-1])
-            if litros_para_media > 0:
-                indicadores["consumo_medio_geral"] = indicadores["total_km_rodado"] / litros_para_media
-            if indicadores["gasto_total"] > 0:
-                indicadores["custo_medio_km"] = indicadores["gasto_total"] / indicadores["total_km_rodado"]
-        for i in range(1, len(abastecimentos)):
-            anterior = abastecimentos[i - 1]
-            atual = abastecimentos[i]
-            analise = {"abastecimento": atual, "km_rodado": 0, "consumo_kml": 0}
-            km_rodado = atual.quilometragem - anterior.quilometragem
-            if km_rodado > 0 and anterior.litros > 0:
-                consumo_kml = km_rodado / anterior.litros
-                custo_km = anterior.valor_total / km_rodado
-                analise.update({"km_rodado": km_rodado, "consumo_kml": consumo_kml})
-                chart_labels.append(atual.data.strftime("%d/%m"))
-                chart_consumo_data.append(round(consumo_kml, 2))
-                chart_custo_km_data.append(round(custo_km, 2))
-            abastecimentos_com_analise.append(analise)
-    abastecimentos_com_analise.reverse()
-    
+    # Totais vêm da tabela de resumo (mantida pelos eventos em resumo_frota.py),
+    # e os históricos são paginados: a página não lê mais todo o histórico do veículo.
+    resumo = obter_resumo(placa)
+    indicadores = indicadores_veiculo(resumo)
+    chart_labels, chart_consumo_data, chart_custo_km_data = serie_mensal(placa)
+
+    abastecimentos = historico_abastecimentos(
+        placa, page=request.args.get("page_abast", 1, type=int), per_page=20,
+        total=resumo.qtd_abastecimentos,
+    )
+    manutencoes = (
+        Manutencao.query.filter_by(veiculo_placa=placa)
+        .order_by(Manutencao.data.desc(), Manutencao.id.desc())
+        .paginate(page=request.args.get("page_manut", 1, type=int), per_page=10, error_out=False, count=False)
+    )
+    manutencoes.total = resumo.qtd_manutencoes
+
     return render_template("detalhes_veiculo.html", veiculo=veiculo,
-                indicadores=indicadores, abastecimentos_com_analise=abastecimentos_com_analise,
-                manutencoes=manutencoes, chart_labels=chart_labels, chart_consumo_data=chart_consumo_data, 
-                chart_custo_km_data=chart_custo_km_data)    
+                indicadores=indicadores, abastecimentos=abastecimentos,
+                manutencoes=manutencoes, chart_labels=chart_labels, chart_consumo_data=chart_consumo_data,
+                chart_custo_km_data=chart_custo_km_data)
+
+
+@app.route("/manutencao/excluir/<int:id>")
+@login_required
+@role_required('Combustivel', 'admin')
+def excluir_manutencao(id):
+    manutencao = Manutencao.query.get_or_404(id)
+    placa_veiculo = manutencao.veiculo_placa
+    try:
+        db.session.delete(manutencao)
+        db.session.commit()
+        registrar_log(f"Excluiu registro de manutenção ID {id} do veículo {placa_veiculo}.")
+        flash("Registro de manutenção excluído com sucesso!", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Erro ao excluir registro: {e}", "danger")
+
+    return redirect(url_for("detalhes_veiculo", placa=placa_veiculo))
 
 
 @app.route("/add", methods=["POST"])
@@ -1457,7 +1578,8 @@ def gerenciar_veiculos():
     if request.method == "POST":
         try:
             nova_placa = request.form.get("placa").upper().strip()
-            veiculo_existente = Veiculo.query.get(nova_placa)
+            # A placa é única no banco todo: procura também nas outras secretarias
+            veiculo_existente = db.session.get(Veiculo, nova_placa, execution_options={"sem_escopo": True})
             if veiculo_existente:
                 flash("Veículo com esta placa já cadastrado.", "danger")
                 return redirect(url_for("gerenciar_veiculos"))
@@ -1498,16 +1620,8 @@ def gerenciar_veiculos():
 
     # Lógica para EXIBIR a página de veículos
     
-    # Inicia a consulta base de veículos
-    query = Veiculo.query
-
-    # --- LÓGICA DO SUPER ADMIN ---
-    # Se o usuário logado NÃO for um admin, aplica o filtro da secretaria
-    if session.get("role") != "admin":
-        secretaria_id_logada = session.get("secretaria_id")
-        query = query.filter_by(secretaria_id=secretaria_id_logada)
-    
-    veiculos = query.order_by(Veiculo.modelo).all()
+    # Já filtrada pela secretaria do usuário; o admin vê todas (escopo_secretaria.py)
+    veiculos = Veiculo.query.order_by(Veiculo.modelo).all()
     
     # Busca a lista de secretarias para popular o formulário de cadastro
     secretarias = Secretaria.query.order_by(Secretaria.nome).all()
@@ -1718,35 +1832,25 @@ def delete_nota(id):
 def relatorio_combustivel():
     # Coleta os filtros da URL
     placa_filtro = request.args.get("placa")
-    query = db.session.query(Abastecimento).join(Veiculo).order_by(Abastecimento.veiculo_placa, Abastecimento.quilometragem)
-
-    if placa_filtro:
-        query = query.filter(Veiculo.placa == placa_filtro)
-
-    resultados_filtrados = query.all()
-    resultados_com_analise = []
-    ultimo_abastecimento = {}
+    data_inicio_str = request.args.get("data_inicio")
+    data_fim_str = request.args.get("data_fim")
+    page = request.args.get("page", 1, type=int)
 
-    for r in resultados_filtrados:
-        placa = r.veiculo_placa
-        analise = {"abastecimento": r, "km_rodado": 0, "consumo_kml": 0, "custo_km": 0}
+    data_inicio = datetime.strptime(data_inicio_str, "%Y-%m-%d") if data_inicio_str else None
+    # A data final do formulário é inclusiva; a consulta usa o dia seguinte como limite
+    data_fim = datetime.strptime(data_fim_str, "%Y-%m-%d") + timedelta(days=1) if data_fim_str else None
 
-        if placa in ultimo_abastecimento:
-            anterior = ultimo_abastecimento[placa]
-            km_rodado = r.quilometragem - anterior.quilometragem
-            analise["km_rodado"] = km_rodado
-            if km_rodado > 0 and anterior.litros > 0:
-                analise["consumo_kml"] = km_rodado / anterior.litros
-                analise["custo_km"] = anterior.valor_total / km_rodado
+    # km rodado, km/l e R$/km vêm do banco (LAG por placa); só a página atual é carregada
+    resultados, totais = analise_consumo(
+        page=page, per_page=50, data_inicio=data_inicio, data_fim=data_fim, placa=placa_filtro
+    )
 
-        resultados_com_analise.append(analise)
-        ultimo_abastecimento[placa] = r
-    
-    veiculos = Veiculo.query.order_by(Veiculo.modelo).all()
+    veiculos = db.session.query(Veiculo.placa, Veiculo.modelo).order_by(Veiculo.modelo).all()
 
     return render_template(
         "relatorio_combustivel.html",
-        resultados=resultados_com_analise,
+        resultados=resultados,
+        totais=totais,
         veiculos=veiculos,
     )
     
@@ -0,0 +1,134 @@
+# auditoria.py
+# Gravação dos logs de auditoria em lote. registrar_log() só coloca a entrada
+# numa fila em memória; uma thread em segundo plano junta as entradas e grava
+# tudo com um único INSERT (executemany) quando a fila chega a AUDITORIA_LOTE
+# entradas ou a cada AUDITORIA_INTERVALO segundos. Assim a rota não abre uma
+# segunda transação só para o log. O que estiver na fila é gravado ao
+# encerrar o processo (atexit).
+#
+# Com AUDITORIA_SINCRONA = True (testes, scripts) cada entrada é gravada na
+# hora, antes de registrar_log() retornar.
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, session, request
+
+from extensions import db
+from models import Log
+
+LOTE_PADRAO = 100
+INTERVALO_PADRAO = 2.0        # segundos
+TAMANHO_MAXIMO_FILA = 10000   # acima disso grava na hora, para não acumular memória
+
+_PARAR = object()
+
+
+class GravadorAuditoria:
+    def __init__(self):
+        self.app = None
+        self.fila = queue.Queue(maxsize=TAMANHO_MAXIMO_FILA)
+        self.thread = None
+        self.pid = None
+        self.trava = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault("AUDITORIA_SINCRONA", False)
+        app.config.setdefault("AUDITORIA_LOTE", LOTE_PADRAO)
+        app.config.setdefault("AUDITORIA_INTERVALO", INTERVALO_PADRAO)
+        atexit.register(self.parar)
+
+    def registrar(self, entrada):
+        if self.app is None or self.app.config["AUDITORIA_SINCRONA"]:
+            self.gravar([entrada])
+            return
+        self._garantir_thread()
+        try:
+            self.fila.put_nowait(entrada)
+        except queue.Full:
+            self.gravar([entrada])
+
+    def _garantir_thread(self):
+        # Processos filhos (workers do gunicorn com --preload) não herdam a thread
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        with self.trava:
+            if self.thread is None or not self.thread.is_alive() or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._executar, name="auditoria", daemon=True)
+                self.thread.start()
+
+    def _executar(self):
+        lote_maximo = self.app.config["AUDITORIA_LOTE"]
+        intervalo = self.app.config["AUDITORIA_INTERVALO"]
+        while True:
+            lote = []
+            limite = time.monotonic() + intervalo
+            parar = False
+            while len(lote) < lote_maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    entrada = self.fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if entrada is _PARAR:
+                    parar = True
+                    break
+                lote.append(entrada)
+            if lote:
+                self.gravar(lote)
+            if parar:
+                return
+
+    def gravar(self, lote):
+        """Grava as entradas com um INSERT em lote, numa transação própria."""
+        app = self.app or current_app._get_current_object()
+        try:
+            with app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(Log.__table__.insert(), lote)
+        except Exception as e:
+            print(f"Erro ao gravar {len(lote)} log(s) de auditoria: {e}")
+
+    def esvaziar(self):
+        """Grava na hora tudo o que estiver na fila (usado ao encerrar e em testes)."""
+        lote = []
+        while True:
+            try:
+                entrada = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if entrada is not _PARAR:
+                lote.append(entrada)
+        if lote:
+            self.gravar(lote)
+
+    def parar(self, espera=5.0):
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            self.fila.put(_PARAR)
+            self.thread.join(espera)
+        self.esvaziar()
+
+
+gravador = GravadorAuditoria()
+
+
+def registrar_log(action):
+    """Registra uma ação do usuário logado no log de auditoria."""
+    try:
+        if "logged_in" in session:
+            gravador.registrar({
+                "timestamp": datetime.utcnow(),
+                "username": session.get("username", "Anônimo"),
+                "action": action[:255],
+                "ip_address": request.remote_addr,
+            })
+    except Exception as e:
+        print(f"Erro ao registrar log: {e}")
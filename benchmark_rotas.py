@@ -0,0 +1,238 @@
+# benchmark_rotas.py
+# Mede as rotas mais pesadas com o test client do Flask sobre a base gerada por
+# 'flask seed-bench': latência (p50/p95/máx), quantidade de comandos SQL e pico
+# de memória por requisição. Os limites aceitos ficam em orcamentos_rotas.json
+# (versionado); 'flask bench-rotas' falha se alguma rota estourar o orçamento,
+# o que pega regressões como um N+1 novo antes de chegar à produção.
+#
+# Rotas que redirecionam para /pdf/<chave> (PDFs gerados em segundo plano, ver
+# tarefas_pdf.py) são medidas até o PDF pronto: o redirecionamento é seguido e a
+# medição espera a geração. Cada rodada usa pastas de cache de PDF vazias, então
+# o tempo medido é sempre o da geração, não o de um arquivo já em cache. Os
+# comandos SQL e o pico de memória do processo filho que gerou o PDF (gravados
+# no status com PDF_MEDIR) são somados aos da requisição. Pelo
+# mesmo motivo os caches de consultas (opções dos filtros de servidores,
+# contagens por status) são esvaziados antes de cada rodada: o orçamento vale
+# para a primeira requisição depois que o cache expira.
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from flask import has_app_context, url_for
+from sqlalchemy import event, func, select
+
+from extensions import db
+from models import Secretaria, Abastecimento, Protocolo, Contrato, Requerimento, GAM
+from tarefas_pdf import aguardar_pdf
+from consulta_servidores import limpar_opcoes_filtro
+from contagem_status import limpar_contagens
+
+# Pastas de cache esvaziadas a cada rodada (PDFs em segundo plano e contratos)
+PASTAS_CACHE_PDF = ("PDF_CACHE_PASTA", "CONTRATOS_PDF_PASTA")
+ESPERA_MAXIMA_PDF = 300  # segundos
+
+ARQUIVO_ORCAMENTOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "orcamentos_rotas.json")
+
+# Folga aplicada ao gravar novos orçamentos (--atualizar)
+FOLGA_LATENCIA = 2.0
+FOLGA_MEMORIA = 1.5
+
+
+def _placa_exemplo():
+    # O veículo com mais abastecimentos é o pior caso para a página de detalhes
+    return db.session.execute(
+        select(Abastecimento.veiculo_placa)
+        .group_by(Abastecimento.veiculo_placa)
+        .order_by(func.count().desc())
+        .limit(1)
+    ).scalar()
+
+
+def _ultimo_mes_com_abastecimento():
+    data = db.session.execute(select(func.max(Abastecimento.data))).scalar()
+    return {"ano": str(data.year), "mes": str(data.month), "orgao": "todos"} if data else None
+
+
+def _primeiro_id(modelo):
+    return db.session.execute(select(func.min(modelo.id))).scalar()
+
+
+def rotas():
+    """
+    (nome, método, url, dados do formulário) de cada rota medida. Rotas que dependem
+    de um registro inexistente na base ficam com url None e são puladas.
+    """
+    placa = _placa_exemplo()
+    periodo = _ultimo_mes_com_abastecimento()
+    protocolo_id = _primeiro_id(Protocolo)
+    contrato_id = _primeiro_id(Contrato)
+    requerimento_id = _primeiro_id(Requerimento)
+    gam_id = _primeiro_id(GAM)
+    return [
+        ("dashboard", "GET", url_for("dashboard"), None),
+        ("lista_servidores", "GET", url_for("lista_servidores"), None),
+        ("api_servidores", "GET", url_for("api_servidores"), None),
+        ("relatorio_combustivel", "GET", url_for("relatorio_combustivel"), None),
+        ("gerar_relatorio_veiculos_mensal", "POST",
+         url_for("gerar_relatorio_veiculos_mensal") if periodo else None, periodo),
+        ("detalhes_veiculo", "GET", url_for("detalhes_veiculo", placa=placa) if placa else None, None),
+        ("frequencia.dashboard_frequencia", "GET", url_for("frequencia.dashboard_frequencia"), None),
+        ("merenda.dashboard", "GET", url_for("merenda.dashboard"), None),
+        ("protocolo.listar_protocolos", "GET", url_for("protocolo.listar_protocolos"), None),
+        ("gerar_relatorio_pdf", "GET", url_for("gerar_relatorio_pdf"), None),
+        ("protocolo.imprimir_comprovante", "GET",
+         url_for("protocolo.imprimir_comprovante", protocolo_id=protocolo_id) if protocolo_id else None, None),
+        ("contratos.visualizar_contrato_pdf", "GET",
+         url_for("contratos.visualizar_contrato_pdf", contrato_id=contrato_id) if contrato_id else None, None),
+        ("gerar_requerimento_pdf", "GET",
+         url_for("gerar_requerimento_pdf", req_id=requerimento_id) if requerimento_id else None, None),
+        ("imprimir_gam", "GET", url_for("imprimir_gam", gam_id=gam_id) if gam_id else None, None),
+    ]
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def _requisitar(app, cliente, metodo, url, dados):
+    """
+    Faz a requisição seguindo redirecionamentos; em /pdf/<chave>, espera o PDF ficar
+    pronto. Devolve (resposta, status da geração em segundo plano ou None).
+    """
+    resposta = cliente.open(url, method=metodo, data=dados)
+    geracao = None
+    for _ in range(5):
+        if resposta.status_code not in (301, 302, 303, 307, 308):
+            break
+        destino = resposta.headers["Location"]
+        endpoint, argumentos = app.url_map.bind("localhost").match(destino.split("?")[0])
+        if endpoint == "baixar_pdf":
+            geracao = aguardar_pdf(argumentos["chave"], ESPERA_MAXIMA_PDF)
+        resposta = cliente.get(destino)
+    resposta.get_data()  # consome respostas em streaming
+    return resposta, geracao
+
+
+def medir(app, repeticoes=5, aquecimento=1, usuario="benchmark"):
+    """
+    Executa cada rota 'aquecimento + repeticoes' vezes como admin e devolve
+    {nome: {p50_ms, p95_ms, max_ms, consultas, memoria_pico_kb, status}}.
+    Precisa ser chamada fora de um app context: o test client reaproveitaria o
+    contexto ativo e o g de uma requisição (escopo da secretaria) vazaria para a próxima.
+    """
+    if has_app_context():
+        raise RuntimeError("medir() precisa rodar fora de um app context.")
+    with app.test_request_context():
+        secretaria = db.session.execute(select(Secretaria.id, Secretaria.nome).limit(1)).first()
+        lista = rotas()
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao.update({
+            "logged_in": True, "username": usuario, "role": "admin",
+            "secretaria_id": secretaria.id if secretaria else None,
+            "secretaria": secretaria.nome if secretaria else None,
+        })
+
+    contador = {"consultas": 0}
+    pastas_originais = {chave: app.config.get(chave) for chave in (*PASTAS_CACHE_PDF, "PDF_MEDIR")}
+    app.config["PDF_MEDIR"] = True
+    pasta_rodadas = tempfile.mkdtemp(prefix="bench_pdf_")
+
+    def contar(*args):
+        contador["consultas"] += 1
+
+    resultados = {}
+    with app.app_context():
+        motor = db.engine
+    event.listen(motor, "before_cursor_execute", contar)
+    tracemalloc.start()
+    try:
+        for nome, metodo, url, dados in lista:
+            if url is None:
+                resultados[nome] = {"status": "sem dados"}
+                continue
+            tempos, consultas, memoria, status = [], [], [], None
+            for rodada in range(aquecimento + repeticoes):
+                for chave in PASTAS_CACHE_PDF:
+                    app.config[chave] = tempfile.mkdtemp(dir=pasta_rodadas)
+                limpar_opcoes_filtro()
+                limpar_contagens()
+                contador["consultas"] = 0
+                tracemalloc.reset_peak()
+                inicio = time.perf_counter()
+                resposta, geracao = _requisitar(app, cliente, metodo, url, dados)
+                decorrido = (time.perf_counter() - inicio) * 1000
+                status = resposta.status_code
+                if rodada < aquecimento:
+                    continue
+                geracao = geracao or {}
+                tempos.append(decorrido)
+                consultas.append(contador["consultas"] + geracao.get("consultas", 0))
+                memoria.append(tracemalloc.get_traced_memory()[1] / 1024 + geracao.get("memoria_pico_kb", 0))
+            resultados[nome] = {
+                "status": status,
+                "p50_ms": round(_percentil(tempos, 50), 1),
+                "p95_ms": round(_percentil(tempos, 95), 1),
+                "max_ms": round(max(tempos), 1),
+                "consultas": max(consultas),
+                "memoria_pico_kb": round(max(memoria)),
+            }
+    finally:
+        tracemalloc.stop()
+        event.remove(motor, "before_cursor_execute", contar)
+        app.config.update(pastas_originais)
+        shutil.rmtree(pasta_rodadas, ignore_errors=True)
+    return resultados
+
+
+def carregar_orcamentos(caminho=ARQUIVO_ORCAMENTOS):
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def gravar_orcamentos(resultados, caminho=ARQUIVO_ORCAMENTOS, **meta):
+    """Grava os resultados como novos orçamentos (com folga na latência e na memória)."""
+    # Mantém as anotações já existentes (ex: com qual base os números foram medidos)
+    orcamentos = {"_meta": {**carregar_orcamentos(caminho).get("_meta", {}), **meta}}
+    for nome, r in resultados.items():
+        if r.get("status") != 200:
+            continue
+        orcamentos[nome] = {
+            "max_consultas": r["consultas"],
+            "p95_ms": round(r["p95_ms"] * FOLGA_LATENCIA, 1),
+            "memoria_pico_kb": round(r["memoria_pico_kb"] * FOLGA_MEMORIA),
+        }
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(orcamentos, arquivo, indent=2, ensure_ascii=False)
+        arquivo.write("\n")
+    return orcamentos
+
+
+def comparar(resultados, orcamentos):
+    """Lista de mensagens de estouro de orçamento (vazia se tudo estiver dentro)."""
+    falhas = []
+    for nome, r in resultados.items():
+        limite = orcamentos.get(nome)
+        if r.get("status") == "sem dados" or limite is None:
+            continue
+        if r["status"] != 200:
+            falhas.append(f"{nome}: respondeu {r['status']}")
+            continue
+        if r["consultas"] > limite["max_consultas"]:
+            falhas.append(f"{nome}: {r['consultas']} comandos SQL (orçamento {limite['max_consultas']})")
+        if r["p95_ms"] > limite["p95_ms"]:
+            falhas.append(f"{nome}: p95 de {r['p95_ms']} ms (orçamento {limite['p95_ms']} ms)")
+        if r["memoria_pico_kb"] > limite["memoria_pico_kb"]:
+            falhas.append(
+                f"{nome}: pico de {r['memoria_pico_kb']} KB (orçamento {limite['memoria_pico_kb']} KB)"
+            )
+    return falhas
@@ -0,0 +1,219 @@
+# busca_servidores.py
+# Busca de servidores por nome, CPF ou nº do vínculo, sem diferenciar acentos
+# ("Joao" encontra "João"), com prefixo e tolerância a erros de digitação.
+#
+# PostgreSQL: índices GIN de trigramas (pg_trgm) sobre f_unaccent(lower(nome)),
+#   sobre os dígitos do CPF e sobre num_contrato (migração c7a9e1d3f5b2). A
+#   semelhança por palavra (operador <%) cobre os erros de digitação e também
+#   ordena o resultado.
+# SQLite: tabela FTS5 servidor_busca (tokenizer unicode61 sem acentos),
+#   mantida pelos eventos do modelo Servidor. Prefixo ordenado por bm25; se nada
+#   for encontrado, cada palavra é trocada pelas palavras parecidas (difflib)
+#   do vocabulário do índice e a busca é refeita. A tabela é criada pela
+#   migração, pelo 'flask init-db' ou pelo 'flask recriar-busca-servidores';
+#   enquanto ela não existe, a busca usa o ILIKE abaixo.
+# Outros bancos: ILIKE simples, como antes.
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+from sqlalchemy import (
+    MetaData, Table, Column, String, event, inspect, select, text, func, literal, literal_column, case, and_, or_, false,
+)
+
+from models import Servidor
+
+servidor = Servidor.__table__
+
+# Fora do db.metadata: o create_all não deve criar a tabela FTS como tabela comum
+servidor_busca = Table(
+    "servidor_busca", MetaData(),
+    Column("num_contrato", String),
+    Column("nome", String),
+    Column("documentos", String),
+)
+
+SEMELHANCA_MINIMA = 0.75   # difflib ratio entre a palavra digitada e a do índice
+LIMITE_PARECIDAS = 20      # palavras parecidas usadas por palavra digitada
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+def _digitos(texto):
+    return re.sub(r"\D", "", texto or "")
+
+
+def _palavras(texto):
+    return re.findall(r"\w+", normalizar(texto))
+
+
+# ---------------------------------------------------------------------------
+# Filtro de busca
+# ---------------------------------------------------------------------------
+
+def aplicar_busca(query, termo, session, ordenar=True):
+    """
+    Filtra a query de Servidor pelo termo e, com ordenar=True, ordena pela relevância.
+    'session' é usada só no SQLite, para decidir se é preciso a busca aproximada.
+    """
+    dialeto = session.get_bind().dialect.name
+    if dialeto == "postgresql":
+        return _busca_postgresql(query, termo, ordenar)
+    if dialeto == "sqlite" and _tem_indice_sqlite(session.connection()):
+        return _busca_sqlite(query, termo, session, ordenar)
+
+    padrao = f"%{termo}%"
+    return query.filter(or_(
+        Servidor.nome.ilike(padrao), Servidor.cpf.ilike(padrao), Servidor.num_contrato.ilike(padrao),
+    ))
+
+
+def _busca_postgresql(query, termo, ordenar):
+    t = normalizar(termo)
+    digitos = _digitos(termo)
+    nome = func.f_unaccent(func.lower(Servidor.nome))
+    condicoes = [
+        and_(*(nome.contains(p, autoescape=True) for p in _palavras(termo) or [t])),
+        literal(t).op("<%")(nome),  # semelhança por palavra (erros de digitação)
+        Servidor.num_contrato.ilike(f"%{termo}%"),
+    ]
+    if digitos:
+        condicoes.append(func.regexp_replace(Servidor.cpf, "[^0-9]", "", "g").contains(digitos, autoescape=True))
+    query = query.filter(or_(*condicoes))
+    if ordenar:
+        query = query.order_by(
+            case((nome.startswith(t, autoescape=True), 0), else_=1),
+            func.word_similarity(t, nome).desc(),
+        )
+    return query
+
+
+def _busca_sqlite(query, termo, session, ordenar):
+    palavras = _palavras(termo)
+    if not palavras:
+        return query
+
+    expressao = _expressao_fts(palavras)
+    if not session.execute(_casamentos(expressao).limit(1)).first():
+        # Nada com esse prefixo: troca cada palavra pelas palavras parecidas do índice
+        expressao = _expressao_aproximada(session, palavras)
+        if expressao is None:
+            return query.filter(false())
+
+    casamentos = _casamentos(expressao).subquery()
+    query = query.join(casamentos, casamentos.c.num_contrato == Servidor.num_contrato)
+    return query.order_by(casamentos.c.relevancia) if ordenar else query
+
+
+def _casamentos(expressao):
+    # rank é o bm25 do FTS5: quanto menor, mais relevante
+    return (
+        select(servidor_busca.c.num_contrato, literal_column("rank").label("relevancia"))
+        .where(text("servidor_busca MATCH :expressao").bindparams(expressao=expressao))
+    )
+
+
+def _expressao_fts(palavras):
+    return " ".join(f'"{p}"*' for p in palavras)
+
+
+def _expressao_aproximada(session, palavras):
+    """
+    Expressão MATCH em que cada palavra vira um OR das palavras parecidas com ela
+    no vocabulário dos nomes (servidor_busca_vocab), ou None se alguma não tiver par.
+    """
+    vocabulario = [
+        t for (t,) in session.execute(text("SELECT term FROM servidor_busca_vocab WHERE col = 'nome'"))
+    ]
+    grupos = []
+    for palavra in palavras:
+        comparador = SequenceMatcher(None, b=palavra)
+        parecidas = []
+        for termo in vocabulario:
+            if abs(len(termo) - len(palavra)) > 2:
+                continue
+            comparador.set_seq1(termo)
+            if comparador.quick_ratio() >= SEMELHANCA_MINIMA and comparador.ratio() >= SEMELHANCA_MINIMA:
+                parecidas.append(termo)
+        if not parecidas:
+            return None
+        grupos.append("(" + " OR ".join(f'nome:"{t}"' for t in parecidas[:LIMITE_PARECIDAS]) + ")")
+    return " AND ".join(grupos)
+
+
+# ---------------------------------------------------------------------------
+# Tabela FTS5 do SQLite
+# ---------------------------------------------------------------------------
+
+SQL_CRIAR_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS servidor_busca USING fts5("
+    "num_contrato UNINDEXED, nome, documentos, tokenize = 'unicode61 remove_diacritics 2')"
+)
+# Lista das palavras indexadas, usada pela busca aproximada
+SQL_CRIAR_VOCABULARIO = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS servidor_busca_vocab USING fts5vocab(servidor_busca, col)"
+)
+
+
+def _documento(num_contrato, nome, cpf):
+    return {
+        "num_contrato": num_contrato,
+        "nome": normalizar(nome),
+        "documentos": " ".join(filter(None, [cpf, _digitos(cpf), num_contrato])),
+    }
+
+
+def _tem_indice_sqlite(connection):
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'servidor_busca'"
+    ).first() is not None
+
+
+def recriar_indice_busca(connection):
+    """Refaz a tabela de busca do SQLite inteira (no PostgreSQL os índices são do próprio banco)."""
+    if connection.dialect.name != "sqlite":
+        return 0
+    connection.exec_driver_sql(SQL_CRIAR_FTS)
+    connection.exec_driver_sql(SQL_CRIAR_VOCABULARIO)
+    connection.execute(servidor_busca.delete())
+    linhas = [
+        _documento(num, nome, cpf)
+        for num, nome, cpf in connection.execute(select(servidor.c.num_contrato, servidor.c.nome, servidor.c.cpf))
+    ]
+    if linhas:
+        connection.execute(servidor_busca.insert(), linhas)
+    return len(linhas)
+
+
+def _sincronizar(connection, remover=None, incluir=None):
+    if connection.dialect.name != "sqlite" or not _tem_indice_sqlite(connection):
+        return
+    if remover:
+        connection.execute(servidor_busca.delete().where(servidor_busca.c.num_contrato == remover))
+    if incluir is not None:
+        connection.execute(servidor_busca.insert(), _documento(incluir.num_contrato, incluir.nome, incluir.cpf))
+
+
+@event.listens_for(Servidor, "after_insert")
+def _servidor_inserido(mapper, connection, target):
+    _sincronizar(connection, incluir=target)
+
+
+@event.listens_for(Servidor, "after_update")
+def _servidor_editado(mapper, connection, target):
+    estado = inspect(target)
+    if not any(estado.attrs[c].history.has_changes() for c in ("num_contrato", "nome", "cpf")):
+        return
+    historico = estado.attrs.num_contrato.history
+    anterior = historico.deleted[0] if historico.deleted else target.num_contrato
+    _sincronizar(connection, remover=anterior, incluir=target)
+
+
+@event.listens_for(Servidor, "after_delete")
+def _servidor_excluido(mapper, connection, target):
+    _sincronizar(connection, remover=target.num_contrato)
@@ -0,0 +1,221 @@
+# consulta_protocolos.py
+# Lista de protocolos (protocolo.listar_protocolos).
+#
+# A lista pagina por cursor (keyset) em (data_criacao, id), do mais recente para
+# o mais antigo, usando o índice ix_protocolo_data_criacao_id: cada página lê só
+# POR_PAGINA + 1 linhas, sem COUNT(*) nem OFFSET, e só as colunas que a tabela
+# mostra (sem carregar tramitações e anexos).
+#
+# Os filtros por nº, interessado e assunto continuam sendo "contém o texto",
+# agora com índice:
+# PostgreSQL: índices GIN de trigramas (pg_trgm) em cada coluna (migração
+#   f8c2d4e6a1b3), que o ILIKE '%...%' usa diretamente.
+# SQLite: tabela FTS5 protocolo_busca com tokenizer trigram (rowid = id do
+#   protocolo), mantida pelos eventos do modelo Protocolo. Termos de 3 ou mais
+#   caracteres viram uma frase MATCH (com trigramas, "contém o texto"); se os
+#   casamentos forem poucos, a página sai de "id IN (...)"; se forem muitos
+#   (ou o termo for curto), o índice de datas é percorrido filtrando as colunas,
+#   o que acha as 50 linhas da página logo no começo. A tabela é criada pela
+#   migração, pelo 'flask init-db' ou pelo 'flask recriar-busca-protocolos';
+#   enquanto ela não existe, os filtros ficam só no ILIKE.
+# Outros bancos: ILIKE simples, como antes.
+
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, event, inspect, select, text, tuple_
+
+from models import Protocolo
+
+protocolo = Protocolo.__table__
+
+POR_PAGINA = 50
+LIMITE_CASAMENTOS = 5000  # acima disso a busca no SQLite percorre o índice de datas
+CAMPOS_BUSCA = ("numero_protocolo", "interessado", "assunto")
+COLUNAS_LISTA = (
+    protocolo.c.id, protocolo.c.numero_protocolo, protocolo.c.assunto, protocolo.c.interessado,
+    protocolo.c.data_criacao, protocolo.c.setor_atual, protocolo.c.status,
+)
+
+# Fora do db.metadata: o create_all não deve criar a tabela FTS como tabela comum
+protocolo_busca = Table(
+    "protocolo_busca", MetaData(),
+    Column("rowid", Integer, key="protocolo_id"),
+    *(Column(campo, String) for campo in CAMPOS_BUSCA),
+)
+
+
+# ---------------------------------------------------------------------------
+# Filtros e cursor
+# ---------------------------------------------------------------------------
+
+def filtros_da_requisicao(args):
+    """Lê os campos de pesquisa da lista (q_numero, q_interessado, q_assunto, q_status)."""
+    return {
+        "numero_protocolo": (args.get("q_numero") or "").strip(),
+        "interessado": (args.get("q_interessado") or "").strip(),
+        "assunto": (args.get("q_assunto") or "").strip(),
+        "status": (args.get("q_status") or "").strip(),
+    }
+
+
+def codificar_cursor(registro):
+    return f"{registro['data_criacao'].isoformat()}_{registro['id']}"
+
+
+def decodificar_cursor(cursor):
+    try:
+        data, id_ = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(data), int(id_)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _padrao(texto):
+    escapado = texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escapado}%"
+
+
+def _aplicar_filtros(consulta, filtros, session):
+    termos = {campo: filtros[campo] for campo in CAMPOS_BUSCA if filtros.get(campo)}
+    if termos and session.get_bind().dialect.name == "sqlite":
+        ids = _casamentos_sqlite(session, termos)
+        if ids is not None:
+            consulta = consulta.where(protocolo.c.id.in_(ids))
+            # os termos curtos não passam pelo índice e ficam no LIKE abaixo
+            termos = {campo: termo for campo, termo in termos.items() if len(termo) < 3}
+    if termos:
+        consulta = consulta.where(*(
+            protocolo.c[campo].ilike(_padrao(termo), escape="\\") for campo, termo in termos.items()
+        ))
+    if filtros.get("status"):
+        consulta = consulta.where(protocolo.c.status == filtros["status"])
+    return consulta
+
+
+def _casamentos_sqlite(session, termos):
+    """
+    Ids dos protocolos que contêm os termos (de 3 ou mais caracteres), pela tabela
+    FTS. None quando não há termo indexável, quando a tabela ainda não foi criada
+    ou quando o termo é tão comum que passa de LIMITE_CASAMENTOS: nesse caso
+    percorrer o índice de datas filtrando as colunas acha a página mais rápido do
+    que ordenar todos os casamentos.
+    """
+    indexaveis = {campo: termo for campo, termo in termos.items() if len(termo) >= 3}
+    if not indexaveis or not _tem_indice_sqlite(session.connection()):
+        return None
+    # Com o tokenizer trigram, a frase entre aspas casa como "contém o texto"
+    expressao = " AND ".join(
+        f'{campo}:"{termo.replace(chr(34), chr(34) * 2)}"' for campo, termo in indexaveis.items()
+    )
+    ids = [
+        i for (i,) in session.execute(
+            select(protocolo_busca.c.protocolo_id)
+            .where(text("protocolo_busca MATCH :expressao").bindparams(expressao=expressao))
+            .limit(LIMITE_CASAMENTOS + 1)
+        )
+    ]
+    return ids if len(ids) <= LIMITE_CASAMENTOS else None
+
+
+# ---------------------------------------------------------------------------
+# Página da lista
+# ---------------------------------------------------------------------------
+
+def pagina_protocolos(session, filtros, antes=None, depois=None, por_pagina=POR_PAGINA):
+    """
+    Uma página de protocolos, do mais recente para o mais antigo. 'antes' continua
+    para os mais antigos a partir do cursor; 'depois' volta para os mais recentes.
+    Devolve {itens, cursor_anterior, cursor_proximo} (cursores None nas pontas).
+    """
+    consulta = _aplicar_filtros(select(*COLUNAS_LISTA), filtros, session)
+
+    chave = tuple_(protocolo.c.data_criacao, protocolo.c.id)
+    voltando = depois is not None and decodificar_cursor(depois) is not None
+    if voltando:
+        consulta = consulta.where(chave > decodificar_cursor(depois)).order_by(
+            protocolo.c.data_criacao, protocolo.c.id
+        )
+    else:
+        if antes is not None and decodificar_cursor(antes) is not None:
+            consulta = consulta.where(chave < decodificar_cursor(antes))
+        consulta = consulta.order_by(protocolo.c.data_criacao.desc(), protocolo.c.id.desc())
+
+    # Uma linha a mais só para saber se existe outra página naquela direção
+    linhas = [dict(r) for r in session.execute(consulta.limit(por_pagina + 1)).mappings()]
+    tem_mais = len(linhas) > por_pagina
+    itens = linhas[:por_pagina]
+    if voltando:
+        if not tem_mais:
+            # Voltou até o começo: mostra a primeira página completa
+            return pagina_protocolos(session, filtros, por_pagina=por_pagina)
+        itens.reverse()
+
+    if not itens:
+        return {"itens": [], "cursor_anterior": None, "cursor_proximo": None}
+    return {
+        "itens": itens,
+        "cursor_anterior": codificar_cursor(itens[0]) if voltando or antes is not None else None,
+        "cursor_proximo": codificar_cursor(itens[-1]) if voltando or tem_mais else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Tabela FTS5 do SQLite
+# ---------------------------------------------------------------------------
+
+SQL_CRIAR_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS protocolo_busca USING fts5("
+    + ", ".join(CAMPOS_BUSCA) + ", tokenize = 'trigram')"
+)
+
+
+def _documento(registro):
+    return {"protocolo_id": registro.id, **{campo: getattr(registro, campo) or "" for campo in CAMPOS_BUSCA}}
+
+
+def _tem_indice_sqlite(connection):
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'protocolo_busca'"
+    ).first() is not None
+
+
+def recriar_indice_protocolos(connection):
+    """Refaz a tabela de busca do SQLite inteira (no PostgreSQL os índices são do próprio banco)."""
+    if connection.dialect.name != "sqlite":
+        return 0
+    connection.exec_driver_sql(SQL_CRIAR_FTS)
+    connection.execute(protocolo_busca.delete())
+    linhas = [
+        _documento(registro)
+        for registro in connection.execute(select(protocolo.c.id, *(protocolo.c[c] for c in CAMPOS_BUSCA)))
+    ]
+    if linhas:
+        connection.execute(protocolo_busca.insert(), linhas)
+    return len(linhas)
+
+
+def _sincronizar(connection, remover=None, incluir=None):
+    if connection.dialect.name != "sqlite" or not _tem_indice_sqlite(connection):
+        return
+    if remover is not None:
+        connection.execute(protocolo_busca.delete().where(protocolo_busca.c.protocolo_id == remover))
+    if incluir is not None:
+        connection.execute(protocolo_busca.insert(), _documento(incluir))
+
+
+@event.listens_for(Protocolo, "after_insert")
+def _protocolo_inserido(mapper, connection, target):
+    _sincronizar(connection, incluir=target)
+
+
+@event.listens_for(Protocolo, "after_update")
+def _protocolo_editado(mapper, connection, target):
+    estado = inspect(target)
+    if not any(estado.attrs[c].history.has_changes() for c in CAMPOS_BUSCA):
+        return
+    _sincronizar(connection, remover=target.id, incluir=target)
+
+
+@event.listens_for(Protocolo, "after_delete")
+def _protocolo_excluido(mapper, connection, target):
+    _sincronizar(connection, remover=target.id)
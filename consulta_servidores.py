@@ -0,0 +1,146 @@
+# consulta_servidores.py
+# Consultas da lista de servidores (/servidores e /api/servidores).
+# A tabela é preenchida página a página pela API; o afastamento (badge de
+# status) só é calculado para os servidores da página, e as listas de função e
+# lotação dos filtros ficam em cache por secretaria, limpas quando algum
+# servidor é incluído, alterado ou excluído.
+
+import threading
+import time
+from datetime import datetime
+
+from flask import url_for, session
+from sqlalchemy import event
+
+from extensions import db
+from models import Servidor, Requerimento
+from escopo_secretaria import secretaria_do_escopo
+from busca_servidores import aplicar_busca
+
+POR_PAGINA_PADRAO = 25
+POR_PAGINA_MAXIMO = 100
+TTL_OPCOES = 300  # segundos; o cache também é limpo pelos eventos abaixo
+
+COLUNAS_ORDENAVEIS = {
+    "nome": Servidor.nome,
+    "cpf": Servidor.cpf,
+    "funcao": Servidor.funcao,
+    "lotacao": Servidor.lotacao,
+    "tipo_vinculo": Servidor.tipo_vinculo,
+}
+
+_trava = threading.Lock()
+_opcoes_cache = {}
+
+
+# ---------------------------------------------------------------------------
+# Listas dos filtros (função e lotação)
+# ---------------------------------------------------------------------------
+
+def opcoes_filtro():
+    """(funções, lotações) distintas da secretaria do escopo atual, em cache."""
+    chave = secretaria_do_escopo()
+    item = _opcoes_cache.get(chave)
+    if item and time.monotonic() - item[0] < TTL_OPCOES:
+        return item[1]
+
+    # A consulta passa pelo filtro de escopo, então só traz valores da secretaria
+    def distintos(coluna):
+        return [v for (v,) in db.session.query(coluna).filter(coluna.isnot(None), coluna != "").distinct().order_by(coluna)]
+
+    opcoes = (distintos(Servidor.funcao), distintos(Servidor.lotacao))
+    with _trava:
+        _opcoes_cache[chave] = (time.monotonic(), opcoes)
+    return opcoes
+
+
+def limpar_opcoes_filtro():
+    """Esvazia o cache (cargas feitas fora do ORM, como a importação em massa)."""
+    with _trava:
+        _opcoes_cache.clear()
+
+
+@event.listens_for(Servidor, "after_insert")
+@event.listens_for(Servidor, "after_update")
+@event.listens_for(Servidor, "after_delete")
+def _limpar_opcoes(mapper, connection, target):
+    limpar_opcoes_filtro()
+
+
+# ---------------------------------------------------------------------------
+# Página da lista
+# ---------------------------------------------------------------------------
+
+def status_afastamento(cpfs, hoje=None):
+    """{cpf: natureza} dos requerimentos aprovados em vigor, só para os CPFs informados."""
+    cpfs = [c for c in cpfs if c]
+    if not cpfs:
+        return {}
+    hoje = hoje or datetime.now().date()
+    status = {}
+    for cpf, natureza, retorno in db.session.query(
+        Requerimento.servidor_cpf, Requerimento.natureza, Requerimento.data_retorno_trabalho
+    ).filter(
+        Requerimento.servidor_cpf.in_(cpfs),
+        Requerimento.status == "Aprovado",
+        Requerimento.data_inicio_requerimento <= hoje,
+    ):
+        if not retorno or retorno > hoje:
+            status[cpf] = natureza
+    return status
+
+
+def pagina_servidores(args):
+    """
+    Uma página da lista, já no formato da API: filtros 'termo', 'funcao' e 'lotacao',
+    ordenação 'ordem' (coluna) e 'direcao' (asc/desc), 'page' e 'per_page'.
+    """
+    # A consulta já vem filtrada pela secretaria do usuário logado (escopo_secretaria.py)
+    query = Servidor.query
+
+    if args.get("funcao"):
+        query = query.filter(Servidor.funcao == args.get("funcao"))
+    if args.get("lotacao"):
+        query = query.filter(Servidor.lotacao == args.get("lotacao"))
+
+    # Com busca e sem coluna escolhida, a lista sai ordenada pela relevância
+    termo_busca = (args.get("termo") or "").strip()
+    ordem = args.get("ordem") if args.get("ordem") in COLUNAS_ORDENAVEIS else None
+    if termo_busca:
+        query = aplicar_busca(query, termo_busca, db.session, ordenar=ordem is None)
+    ordem = ordem or ("relevancia" if termo_busca else "nome")
+
+    direcao = "desc" if args.get("direcao") == "desc" else "asc"
+    if ordem in COLUNAS_ORDENAVEIS:
+        coluna = COLUNAS_ORDENAVEIS[ordem]
+        query = query.order_by(coluna.desc() if direcao == "desc" else coluna)
+    # num_contrato desempata, para a ordem ser estável entre as páginas
+    query = query.order_by(Servidor.num_contrato)
+
+    por_pagina = min(max(args.get("per_page", POR_PAGINA_PADRAO, type=int), 1), POR_PAGINA_MAXIMO)
+    paginacao = query.paginate(page=args.get("page", 1, type=int), per_page=por_pagina, error_out=False)
+
+    status = status_afastamento([s.cpf for s in paginacao.items])
+    admin = session.get("role") == "admin"
+    return {
+        "itens": [
+            {
+                "num_contrato": s.num_contrato,
+                "nome": s.nome,
+                "cpf": s.cpf,
+                "funcao": s.funcao,
+                "lotacao": s.lotacao,
+                "tipo_vinculo": s.tipo_vinculo,
+                "status": status.get(s.cpf),
+                "url_editar": url_for("editar_servidor", id=s.num_contrato),
+                "url_excluir": url_for("delete_server", id=s.num_contrato) if admin else None,
+            }
+            for s in paginacao.items
+        ],
+        "pagina": paginacao.page,
+        "paginas": paginacao.pages,
+        "por_pagina": por_pagina,
+        "total": paginacao.total,
+        "ordem": ordem,
+        "direcao": direcao,
+    }
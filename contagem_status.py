@@ -0,0 +1,79 @@
+# contagem_status.py
+# Números dos dashboards dos módulos (protocolo, merenda, transporte).
+#
+# contagem_por_status() conta todos os status de uma tabela num único
+# GROUP BY, em vez de um COUNT por status. O resultado, como o de qualquer
+# em_cache(), fica guardado por TTL_CONTAGENS segundos por secretaria do escopo
+# e é descartado quando algum registro das tabelas envolvidas é incluído,
+# alterado ou excluído pelo ORM neste processo. Nos outros workers do gunicorn
+# (e depois de UPDATEs em massa fora do ORM) o número se corrige pelo TTL.
+
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event, func
+
+from extensions import db
+from escopo_secretaria import secretaria_do_escopo
+
+TTL_CONTAGENS = 30  # segundos
+
+_trava = threading.Lock()
+_cache = {}         # (nome, secretaria) -> (momento, valor)
+_dependentes = {}   # modelo -> nomes em cache que dependem dele
+_vigiados = set()
+
+
+def em_cache(nome, modelos, calcular, ttl=TTL_CONTAGENS):
+    """
+    Valor de calcular() guardado por 'ttl' segundos para a secretaria do escopo.
+    'modelos': tabelas de que o valor depende; qualquer alteração nelas limpa o cache.
+    """
+    chave = (nome, secretaria_do_escopo())
+    item = _cache.get(chave)
+    if item and time.monotonic() - item[0] < ttl:
+        return item[1]
+
+    valor = calcular()
+    with _trava:
+        for modelo in modelos:
+            _vigiar(modelo)
+            _dependentes.setdefault(modelo, set()).add(nome)
+        _cache[chave] = (time.monotonic(), valor)
+    return valor
+
+
+def contagem_por_status(modelo, coluna="status"):
+    """
+    Counter {status: quantidade} da tabela, num único GROUP BY (status sem
+    registros dão 0). contagem.total() é o total de registros.
+    """
+    campo = getattr(modelo, coluna)
+
+    def calcular():
+        return Counter(dict(db.session.query(campo, func.count()).group_by(campo).all()))
+
+    return em_cache(f"status:{modelo.__tablename__}.{coluna}", [modelo], calcular)
+
+
+def limpar_contagens(modelo=None):
+    """Descarta do cache o que depende do modelo (ou tudo, sem modelo)."""
+    with _trava:
+        if modelo is None:
+            _cache.clear()
+            return
+        nomes = _dependentes.get(modelo, ())
+        for chave in [c for c in _cache if c[0] in nomes]:
+            del _cache[chave]
+
+
+def _vigiar(modelo):
+    # Chamado com a trava: registra os eventos do modelo na primeira vez que ele é usado
+    if modelo in _vigiados:
+        return
+    def limpar(mapper, connection, target):
+        limpar_contagens(modelo)
+    for evento in ("after_insert", "after_update", "after_delete"):
+        event.listen(modelo, evento, limpar)
+    _vigiados.add(modelo)
@@ -1,11 +1,12 @@
 # contratos_routes.py
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, make_response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, make_response, send_file
 from functools import wraps
 from app import db
 from models import Servidor, Contrato
 from datetime import datetime
 import io
+import hashlib
 import locale
 import os # <-- Adicionar import
 from flask import current_app
@@ -16,7 +17,8 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, BaseDocTemp
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT
 from num2words import num2words
-from utils import role_required
+from utils import role_required, proximo_numero
+from recursos_pdf import modelo_pagina, estilos, cabecalho_contrato, imagem, LOGO_CONTRATO
 
 try:
     locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
@@ -75,12 +77,8 @@ def get_servidor_data(cpf):
     return jsonify(servidor_dict)
 
 def gerar_numero_contrato(ano):
-    ultimo_contrato_do_ano = Contrato.query.filter_by(ano=ano).order_by(Contrato.id.desc()).first()
-    if ultimo_contrato_do_ano:
-        ultimo_num = int(ultimo_contrato_do_ano.numero.split('/')[0])
-        novo_num = ultimo_num + 1
-    else:
-        novo_num = 1
+    # Contador do ano (tabela sequencia), reservado na mesma transação que grava o contrato
+    novo_num = proximo_numero(db.session.connection(), f"contrato:{ano}")
     return f"{novo_num:03d}/{ano}"
 
 @contratos_bp.route('/gerar', methods=['POST'])
@@ -215,45 +213,100 @@ def definir_assinatura(contrato_id):
         contrato.assinatura_secretaria_dados = None
         
     db.session.commit()
+    descartar_pdf_contrato(contrato_id)
     flash('Opção de assinatura atualizada com sucesso!', 'success')
     return redirect(url_for('contratos.gerenciar_contratos'))
 # --- FIM DA ROTA ADICIONADA ---
 
-def cabecalho_rodape(canvas, doc):
-    canvas.saveState()
-    logo_path = os.path.join(current_app.static_folder, 'img_contrato.jpg')
-    if os.path.exists(logo_path):
-        canvas.drawImage(logo_path, x=2*cm, y=A4[1] - 2.5*cm, width=17*cm, height=2*cm, preserveAspectRatio=True, mask='auto')
-    else:
-        canvas.setFont('Helvetica-Bold', 10)
-        canvas.drawCentredString(A4[0] / 2, A4[1] - 1.5*cm, "Logótipo não encontrado em /static/img_contrato.jpg")
-    canvas.setFont('Helvetica', 9)
-    canvas.drawString(2*cm, 1.5*cm, f"Contrato Nº {doc.contrato_numero}")
-    canvas.drawRightString(A4[0] - 2*cm, 1.5*cm, f"Página {doc.page}")
-    canvas.restoreState()
+# Versão do layout abaixo: mude ao alterar gerar_pdf_contrato, para descartar os PDFs em cache
+VERSAO_LAYOUT_CONTRATO = 1
 
-@contratos_bp.route('/visualizar/<int:contrato_id>')
-@login_required
-@role_required('RH', 'admin')
-def visualizar_contrato_pdf(contrato_id):
-    contrato = Contrato.query.get_or_404(contrato_id)
+
+def _pasta_pdf_contratos():
+    return current_app.config.get('CONTRATOS_PDF_PASTA') or os.path.join(current_app.instance_path, 'contratos_pdf')
+
+
+def _caminho_assinatura(contrato):
+    if contrato.assinatura_secretaria_tipo == 'imagem' and contrato.assinatura_secretaria_dados:
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], 'assinaturas', contrato.assinatura_secretaria_dados)
+    return None
+
+
+def impressao_contrato(contrato):
+    """
+    Hash de tudo o que aparece no PDF do contrato: conteúdo, número, nome do
+    contratado, opção de assinatura (com a data do arquivo da imagem) e timbre.
+    Serve de nome do arquivo em cache e de ETag.
+    """
+    caminho = _caminho_assinatura(contrato)
+    try:
+        arquivo_assinatura = os.stat(caminho).st_mtime_ns if caminho else None
+    except OSError:
+        arquivo_assinatura = 'ausente'
+    logo = imagem(LOGO_CONTRATO)
+    partes = [
+        VERSAO_LAYOUT_CONTRATO, contrato.numero, contrato.conteudo, contrato.servidor.nome,
+        contrato.assinatura_secretaria_tipo, contrato.assinatura_secretaria_dados, arquivo_assinatura,
+        logo and logo.modificado,
+    ]
+    return hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()
+
+
+def descartar_pdf_contrato(contrato_id, manter=None):
+    """Apaga os PDFs em cache do contrato (menos o arquivo 'manter', se dado)."""
+    pasta = _pasta_pdf_contratos()
+    if not os.path.isdir(pasta):
+        return
+    prefixo = f'contrato_{contrato_id}_'
+    for nome in os.listdir(pasta):
+        if nome.startswith(prefixo) and nome != manter:
+            try:
+                os.remove(os.path.join(pasta, nome))
+            except OSError:
+                pass
+
+
+def pdf_contrato(contrato):
+    """
+    Caminho e ETag do PDF do contrato, gerado só se ainda não estiver em cache.
+    Na impressão em lote cada contrato é montado uma única vez.
+    """
+    etag = impressao_contrato(contrato)
+    pasta = _pasta_pdf_contratos()
+    nome = f'contrato_{contrato.id}_{etag}.pdf'
+    caminho = os.path.join(pasta, nome)
+    if not os.path.exists(caminho):
+        os.makedirs(pasta, exist_ok=True)
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        try:
+            with open(temporario, 'wb') as saida:
+                gerar_pdf_contrato(contrato, saida)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        # versões anteriores deste contrato não serão mais pedidas
+        descartar_pdf_contrato(contrato.id, manter=nome)
+    return caminho, etag
+
+
+def gerar_pdf_contrato(contrato, saida):
     servidor = contrato.servidor
     
-    buffer = io.BytesIO()
-    doc = BaseDocTemplate(buffer, pagesize=A4, leftMargin=2.5*cm, rightMargin=2.5*cm, topMargin=3.5*cm, bottomMargin=2.5*cm)
+    doc = BaseDocTemplate(saida, pagesize=A4, leftMargin=2.5*cm, rightMargin=2.5*cm, topMargin=3.5*cm, bottomMargin=2.5*cm)
     
     doc.contrato_numero = contrato.numero
     
-    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
-    template = PageTemplate(id='main', frames=[frame], onPage=cabecalho_rodape)
-    doc.addPageTemplates([template])
+    doc.addPageTemplates([modelo_pagina(doc, cabecalho_contrato, id='main')])
     
-    styles = getSampleStyleSheet()
-    style_body = ParagraphStyle(name='Body', parent=styles['Normal'], alignment=TA_JUSTIFY, fontSize=12, leading=15, spaceAfter=12)
-    style_preamble = ParagraphStyle(name='Preamble', parent=style_body, firstLineIndent=2*cm)
-    style_title = ParagraphStyle(name='Title', parent=styles['h1'], alignment=TA_CENTER, fontSize=12, leading=14, spaceAfter=8, fontName='Helvetica-Bold')
-    style_clause_title = ParagraphStyle(name='ClauseTitle', parent=styles['h2'], alignment=TA_LEFT, fontSize=12, leading=14, spaceBefore=10, spaceAfter=4, fontName='Helvetica-Bold')
-    style_signature = ParagraphStyle(name='Signature', parent=styles['Normal'], alignment=TA_CENTER, fontSize=12, spaceBefore=6)
+    # Estilos e cabeçalho vêm prontos de recursos_pdf.py (montados uma vez por processo)
+    styles = estilos()
+    style_body = styles['ContratoCorpo']
+    style_preamble = styles['ContratoPreambulo']
+    style_title = styles['ContratoTitulo']
+    style_clause_title = styles['ContratoTituloClausula']
+    style_signature = styles['ContratoAssinatura']
+    style_right_justified = styles['ContratoQuadroDireita']
     
     story = []
     
@@ -269,7 +322,6 @@ def visualizar_contrato_pdf(contrato_id):
             story.append(Paragraph(texto, style_title))
         elif linha_strip.startswith('<right_title>'):
             texto = linha_strip.replace('<right_title>', '').replace('</right_title>', '')
-            style_right_justified = ParagraphStyle(name='RightJustified', parent=styles['Normal'], alignment=TA_JUSTIFY, fontSize=10, leading=12)
             p = Paragraph(texto, style_right_justified)
             tabela = Table([[None, p]], colWidths=[7*cm, 9*cm])
             tabela.setStyle(TableStyle([('VALIGN', (0,0), (-1,-1), 'TOP')]))
@@ -291,7 +343,7 @@ def visualizar_contrato_pdf(contrato_id):
 
     # --- LÓGICA PARA ADICIONAR A IMAGEM DA ASSINATURA ---
     if contrato.assinatura_secretaria_tipo == 'imagem' and contrato.assinatura_secretaria_dados:
-        caminho_assinatura = os.path.join(current_app.config['UPLOAD_FOLDER'], 'assinaturas', contrato.assinatura_secretaria_dados)
+        caminho_assinatura = _caminho_assinatura(contrato)
         if os.path.exists(caminho_assinatura):
             # Adiciona a imagem da assinatura centralizada
             img = Image(caminho_assinatura, width=5*cm, height=2.5*cm, hAlign='CENTER')
@@ -309,11 +361,21 @@ def visualizar_contrato_pdf(contrato_id):
     story.append(Paragraph("Contratado(a)", style_signature))
 
     doc.build(story)
-    
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'inline; filename=contrato_{contrato.numero.replace("/", "-")}.pdf'
+
+
+@contratos_bp.route('/visualizar/<int:contrato_id>')
+@login_required
+@role_required('RH', 'admin')
+def visualizar_contrato_pdf(contrato_id):
+    contrato = Contrato.query.get_or_404(contrato_id)
+    caminho, etag = pdf_contrato(contrato)
+    # Com ETag e no-cache o navegador revalida a cada visualização e recebe 304 se nada mudou
+    response = send_file(
+        caminho, mimetype='application/pdf', etag=etag, conditional=True, max_age=0,
+        download_name=f'contrato_{contrato.numero.replace("/", "-")}.pdf',
+    )
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
     return response
     
 @contratos_bp.route('/excluir/<int:contrato_id>')
@@ -329,6 +391,7 @@ def excluir_contrato(contrato_id):
         
         db.session.delete(contrato_para_excluir)
         db.session.commit()
+        descartar_pdf_contrato(contrato_id)
         
         # Você pode querer registrar essa ação no seu sistema de logs, se tiver um
         # registrar_log(f'Excluiu o contrato nº {numero_contrato}.')
@@ -354,6 +417,7 @@ def editar_contrato(contrato_id):
             contrato.conteudo = request.form.get('conteudo')
             
             db.session.commit()
+            descartar_pdf_contrato(contrato_id)
             
             flash(f'Contrato nº {contrato.numero} atualizado com sucesso!', 'success')
             return redirect(url_for('contratos.gerenciar_contratos'))
@@ -0,0 +1,472 @@
+# dados_benchmark.py
+# Gera um município sintético (servidores, escolas, frota, abastecimentos, ponto,
+# merenda, protocolos, contratos, requerimentos e GAMs) para medir desempenho com
+# volume parecido com o real.
+# Usado pelo comando 'flask seed-bench'. Os dados são gravados em lotes direto
+# no driver: COPY no PostgreSQL e executemany nos demais bancos (SQLite).
+# Como a carga não passa pelo ORM, os resumos (frota e painel) são recalculados no final.
+
+import csv
+import io
+import random
+from datetime import datetime, date, time, timedelta
+
+from sqlalchemy import func, select, text
+
+from models import (
+    Secretaria, Servidor, Escola, Veiculo, Motorista, Abastecimento, Ponto,
+    ProdutoMerenda, EstoqueMovimento, Protocolo, Tramitacao, Contrato, Requerimento, GAM,
+)
+
+LOTE = 50_000
+
+# Tamanhos de um município médio; multiplicados pela escala do comando
+# (menos dias_estoque: o histórico de merenda é sempre de um ano)
+TAMANHOS_PADRAO = {
+    "servidores": 15_000,
+    "escolas": 200,
+    "veiculos": 600,
+    "motoristas": 400,
+    "abastecimentos": 2_000_000,
+    "pontos": 10_000_000,
+    "produtos": 120,
+    "dias_estoque": 365,
+    "protocolos": 50_000,
+    "contratos": 3_000,
+    "requerimentos": 5_000,
+    "gams": 500,
+}
+
+SECRETARIAS = [
+    "Secretaria Municipal de Educação", "Secretaria Municipal de Saúde",
+    "Secretaria Municipal de Administração", "Secretaria Municipal de Assistência Social",
+    "Secretaria Municipal de Infraestrutura", "Secretaria Municipal de Agricultura",
+    "Secretaria Municipal de Finanças", "Secretaria Municipal de Cultura e Esporte",
+]
+NOMES = [
+    "Ana", "Antônio", "Francisco", "Maria", "José", "Raimunda", "João", "Francisca",
+    "Carlos", "Luzia", "Pedro", "Joana", "Paulo", "Rita", "Marcos", "Teresa",
+    "Luís", "Sebastiana", "Manoel", "Cláudia", "Raimundo", "Fernanda", "Gabriel", "Juliana",
+]
+SOBRENOMES = [
+    "da Silva", "de Sousa", "Pereira", "dos Santos", "de Oliveira", "Rodrigues", "Alves",
+    "Lima", "Carvalho", "Ferreira", "Araújo", "Nascimento", "Costa", "Barbosa", "Moura",
+]
+FUNCOES = [
+    "Professor(a)", "Professor(a)", "Professor(a)", "Auxiliar de Serviços Gerais", "Vigia",
+    "Merendeira", "Agente Administrativo", "Motorista", "Agente Comunitário de Saúde",
+    "Técnico de Enfermagem", "Enfermeiro(a)", "Diretor(a)", "Coordenador(a) Pedagógico(a)",
+]
+VINCULOS = ["Efetivo", "Efetivo", "Contratado", "Comissionado"]
+MODELOS = [
+    ("Fiat Strada", "Caminhonete"), ("VW Gol", "Automóvel"), ("Toyota Hilux", "Caminhonete"),
+    ("Mercedes-Benz OF-1519", "Ônibus"), ("VW Volksbus 15.190", "Ônibus"),
+    ("Renault Master", "Micro-ônibus"), ("Chevrolet S10", "Caminhonete"), ("Fiat Uno", "Automóvel"),
+]
+COMBUSTIVEIS = [("Gasolina", 6.19), ("Diesel S10", 6.09), ("Etanol", 4.59)]
+PRODUTOS = [
+    ("Arroz", "KG", "Grãos"), ("Feijão", "KG", "Grãos"), ("Macarrão", "Pacote", "Grãos"),
+    ("Leite em pó", "Pacote", "Laticínios"), ("Carne bovina", "KG", "Proteína"),
+    ("Frango", "KG", "Proteína"), ("Banana", "KG", "Hortifrúti"), ("Cebola", "KG", "Hortifrúti"),
+    ("Óleo de soja", "Litro", "Óleos"), ("Biscoito", "Pacote", "Panificação"),
+]
+SETORES = [
+    "Protocolo Geral", "Gabinete", "Recursos Humanos", "Jurídico", "Finanças",
+    "Compras", "Educação", "Saúde", "Arquivo",
+]
+ASSUNTOS = [
+    "Solicitação de férias", "Requerimento de licença-prêmio", "Pedido de progressão",
+    "Ofício de outra secretaria", "Solicitação de material", "Denúncia", "Pedido de certidão",
+]
+NATUREZAS = ["Férias", "Licença-prêmio", "Licença para tratamento de saúde", "Progressão", "Outro"]
+STATUS_REQUERIMENTO = ["Em Análise", "Aprovado", "Aprovado", "Indeferido"]
+CIDS = ["F32.1", "F41.1", "M54.5", "J18.9", "S82.0", "I10"]
+# Cláusulas do contrato temporário, no mesmo formato marcado que a tela de contratos grava
+CLAUSULAS_CONTRATO = [
+    ("1 — DO OBJETO", "O objeto do presente contrato é a contratação de Servidor Temporário para atender "
+     "ao Excepcional Interesse Público na função de {funcao}, conforme Constituição Federal, artigo 37, inciso IX."),
+    ("2 — DO PREÇO", "O CONTRATANTE pagará ao CONTRATADO o valor mensal de R$ {remuneracao:,.2f}, estando "
+     "incluídos todos os insumos, taxas, encargos e demais despesas."),
+    ("3 — DA JORNADA DE TRABALHO", "A jornada de trabalho do CONTRATADO é de 40 (quarenta) horas semanais, "
+     "regime de dedicação exclusiva, sob pena de rescisão contratual."),
+    ("4 — DO PRAZO", "O contratado trabalhará em caráter de excepcionalidade, de 01 de março de {ano} a "
+     "20 de dezembro de {ano}, podendo o contrato ser rescindido a qualquer tempo por acordo entre as partes."),
+    ("5 — DA EXECUÇÃO DOS SERVIÇOS", "Na execução dos serviços o CONTRATADO se obriga a respeitar as normas "
+     "de higiene e segurança e os requisitos de qualidade determinados pelo CONTRATANTE."),
+    ("6 — DAS OBRIGAÇÕES DO CONTRATANTE", "Fornecer os elementos necessários à realização do objeto, receber "
+     "os serviços e efetuar a retenção da contribuição previdenciária obrigatória."),
+    ("7 — DAS OBRIGAÇÕES DO CONTRATADO", "Arcar com as despesas de locomoção, impostos e encargos, executar os "
+     "serviços com esmero e sujeitar-se à fiscalização do CONTRATANTE."),
+    ("8 — DA DOTAÇÃO ORÇAMENTÁRIA", "As despesas correrão por conta dos recursos consignados no Orçamento "
+     "Anual da Secretaria de Educação."),
+    ("9 — DAS PENALIDADES", "Aplicam-se as penalidades previstas no Estatuto dos Servidores Públicos do Município."),
+    ("10 — DA RESCISÃO", "Este contrato estará rescindido automaticamente no final do prazo estipulado ou se "
+     "o CONTRATADO incidir em qualquer das faltas arroladas no Estatuto."),
+    ("11 — DO FORO", "Fica eleito o foro da Comarca do Município, com expressa renúncia de qualquer outro."),
+]
+
+
+def tamanhos(escala=1.0, **ajustes):
+    """Tamanhos padrão multiplicados pela escala; ajustes explícitos têm prioridade."""
+    resultado = {
+        chave: valor if chave == "dias_estoque" else max(1, int(valor * escala))
+        for chave, valor in TAMANHOS_PADRAO.items()
+    }
+    resultado.update({chave: valor for chave, valor in ajustes.items() if valor is not None})
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Gravação em massa
+# ---------------------------------------------------------------------------
+
+def _lotes(linhas, tamanho=LOTE):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def inserir_em_massa(connection, modelo, colunas, linhas):
+    """
+    Grava as tuplas de 'linhas' (um gerador) na tabela do modelo, em lotes.
+    PostgreSQL: COPY ... FROM STDIN; demais bancos: executemany no cursor do driver.
+    """
+    tabela = modelo.__table__.name
+    if connection.dialect.name != "postgresql":
+        # Datas no formato que o SQLAlchemy grava/lê (no SQLite são texto)
+        # (o tipo genérico não tem processador: o do dialeto é que formata o texto)
+        processadores = [
+            modelo.__table__.c[coluna].type.dialect_impl(connection.dialect).bind_processor(connection.dialect)
+            for coluna in colunas
+        ]
+        if any(processadores):
+            linhas = (
+                tuple(p(v) if p and v is not None else v for p, v in zip(processadores, linha))
+                for linha in linhas
+            )
+    cursor = connection.connection.cursor()
+    total = 0
+    try:
+        if connection.dialect.name == "postgresql":
+            comando = f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)"
+            for lote in _lotes(linhas):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(lote)
+                buffer.seek(0)
+                cursor.copy_expert(comando, buffer)
+                total += len(lote)
+        else:
+            marcadores = ", ".join("?" if connection.dialect.paramstyle == "qmark" else "%s" for _ in colunas)
+            comando = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({marcadores})"
+            for lote in _lotes(linhas):
+                cursor.executemany(comando, lote)
+                total += len(lote)
+    finally:
+        cursor.close()
+    return total
+
+
+def _proximo_id(connection, modelo):
+    return (connection.execute(select(func.max(modelo.id))).scalar() or 0) + 1
+
+
+def _ajustar_sequencias(connection, modelos):
+    """No PostgreSQL os ids foram gravados explicitamente; a sequência precisa acompanhar."""
+    if connection.dialect.name != "postgresql":
+        return
+    for modelo in modelos:
+        tabela = modelo.__table__.name
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {tabela}), 1))"
+        ))
+
+
+# ---------------------------------------------------------------------------
+# Geração
+# ---------------------------------------------------------------------------
+
+def _nome(rnd):
+    return f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+
+
+def _texto_contrato(numero, ano, nome, cpf, funcao, remuneracao):
+    linhas = [
+        f"<title>CONTRATO DE PRESTAÇÃO DE SERVIÇOS TEMPORÁRIOS Nº {numero}</title>",
+        f"<preamble>Contrato que entre si celebram o Município e {nome}, CPF {cpf}, "
+        "doravante denominado CONTRATADO.</preamble>",
+    ]
+    for titulo, corpo in CLAUSULAS_CONTRATO:
+        linhas.append(f"<clause_title>{titulo}</clause_title>")
+        linhas.append("<clause_body>" + corpo.format(funcao=funcao, remuneracao=remuneracao, ano=ano) + "</clause_body>")
+    return "\n".join(linhas)
+
+
+def _dias_uteis(inicio, fim):
+    dia = inicio
+    while dia < fim:
+        if dia.weekday() < 5:
+            yield dia
+        dia += timedelta(days=1)
+
+
+def gerar_municipio(connection, tam, semente=42, hoje=None, progresso=print):
+    """
+    Grava um município sintético com os tamanhos de 'tam' (ver tamanhos()).
+    Devolve um dict tabela -> quantidade de linhas inseridas.
+    """
+    rnd = random.Random(semente)
+    hoje = hoje or date.today()
+    inicio_historico = hoje - timedelta(days=730)
+    contagem = {}
+
+    def registrar(nome, quantidade):
+        contagem[nome] = quantidade
+        progresso(f"  {nome}: {quantidade} registro(s)")
+
+    # Secretarias (poucas; reaproveita as que já existem pelo nome)
+    ids_secretarias = []
+    for nome in SECRETARIAS:
+        existente = connection.execute(select(Secretaria.id).where(Secretaria.nome == nome)).scalar()
+        if existente is None:
+            existente = connection.execute(
+                Secretaria.__table__.insert().values(nome=nome).returning(Secretaria.id)
+            ).scalar()
+        ids_secretarias.append(existente)
+    educacao, saude = ids_secretarias[0], ids_secretarias[1]
+
+    # Escolas
+    primeiro_id_escola = _proximo_id(connection, Escola)
+    ids_escolas = list(range(primeiro_id_escola, primeiro_id_escola + tam["escolas"]))
+    nomes_escolas = {i: f"Escola Municipal {rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {i}" for i in ids_escolas}
+    registrar("escola", inserir_em_massa(
+        connection, Escola, ["id", "nome", "latitude", "longitude", "status"],
+        ((i, nomes_escolas[i], -5.0 - rnd.random(), -42.0 - rnd.random(), "Ativa") for i in ids_escolas),
+    ))
+
+    # Servidores: metade na Educação (lotados nas escolas), o resto espalhado
+    servidores = []
+    for n in range(tam["servidores"]):
+        secretaria_id = educacao if n % 2 == 0 else rnd.choice(ids_secretarias)
+        escola_id = rnd.choice(ids_escolas) if secretaria_id == educacao else None
+        servidores.append((f"BENCH-{n:06d}", f"{70000000000 + n:011d}", secretaria_id, escola_id))
+
+    def linhas_servidores():
+        for contrato, cpf, secretaria_id, escola_id in servidores:
+            inicio = inicio_historico - timedelta(days=rnd.randint(0, 5000))
+            saida = hoje + timedelta(days=rnd.randint(-30, 400)) if rnd.random() < 0.15 else None
+            yield (
+                contrato, _nome(rnd), cpf, str(rnd.randint(1000000, 9999999)),
+                rnd.choice(VINCULOS), rnd.choice(FUNCOES),
+                nomes_escolas[escola_id] if escola_id else rnd.choice(SETORES),
+                round(rnd.uniform(1412, 9000), 2), inicio, saida, secretaria_id,
+            )
+
+    registrar("servidor", inserir_em_massa(
+        connection, Servidor,
+        ["num_contrato", "nome", "cpf", "rg", "tipo_vinculo", "funcao", "lotacao",
+         "remuneracao", "data_inicio", "data_saida", "secretaria_id"],
+        linhas_servidores(),
+    ))
+
+    # Motoristas e veículos
+    primeiro_id_motorista = _proximo_id(connection, Motorista)
+    ids_motoristas = list(range(primeiro_id_motorista, primeiro_id_motorista + tam["motoristas"]))
+    registrar("motorista", inserir_em_massa(
+        connection, Motorista, ["id", "nome", "cpf", "tipo_vinculo"],
+        ((i, _nome(rnd), f"{80000000000 + i:011d}", rnd.choice(VINCULOS)) for i in ids_motoristas),
+    ))
+
+    veiculos = []
+    for n in range(tam["veiculos"]):
+        modelo, tipo = rnd.choice(MODELOS)
+        combustivel = COMBUSTIVEIS[1] if tipo in ("Ônibus", "Micro-ônibus") else rnd.choice(COMBUSTIVEIS)
+        veiculos.append((f"BNC{n:04d}", modelo, tipo, combustivel, rnd.choice(ids_secretarias)))
+    registrar("veiculo", inserir_em_massa(
+        connection, Veiculo,
+        ["placa", "modelo", "tipo", "ano_fabricacao", "ano_modelo", "orgao", "secretaria_id"],
+        ((placa, modelo, tipo, ano, ano + 1, "Prefeitura Municipal", sec)
+         for placa, modelo, tipo, _, sec in veiculos for ano in [rnd.randint(2010, 2024)]),
+    ))
+
+    # Abastecimentos: cada veículo com odômetro crescente ao longo de dois anos
+    def linhas_abastecimentos():
+        proximo_id = _proximo_id(connection, Abastecimento)
+        por_veiculo, sobra = divmod(tam["abastecimentos"], len(veiculos))
+        intervalo = timedelta(days=730)
+        for indice, (placa, _, tipo, (combustivel, preco), _) in enumerate(veiculos):
+            quantidade = por_veiculo + (1 if indice < sobra else 0)
+            km = rnd.uniform(5_000, 80_000)
+            passo = intervalo / max(quantidade, 1)
+            for k in range(quantidade):
+                km += rnd.uniform(40, 400)
+                litros = round(rnd.uniform(20, 120 if tipo == "Ônibus" else 55), 2)
+                valor_litro = round(preco * rnd.uniform(0.95, 1.05), 2)
+                yield (
+                    proximo_id, datetime.combine(inicio_historico, time(7)) + passo * k,
+                    round(km, 1), combustivel, litros, valor_litro, round(litros * valor_litro, 2),
+                    placa, rnd.choice(ids_motoristas),
+                )
+                proximo_id += 1
+
+    registrar("abastecimento", inserir_em_massa(
+        connection, Abastecimento,
+        ["id", "data", "quilometragem", "tipo_combustivel", "litros", "valor_litro",
+         "valor_total", "veiculo_placa", "motorista_id"],
+        linhas_abastecimentos(),
+    ))
+
+    # Ponto: entrada e saída por dia útil, dos dias mais recentes para trás
+    def linhas_pontos():
+        proximo_id = _proximo_id(connection, Ponto)
+        restantes = tam["pontos"]
+        dias = sorted(_dias_uteis(inicio_historico, hoje), reverse=True)
+        for dia in dias:
+            for _, cpf, _, escola_id in servidores:
+                if restantes <= 0:
+                    return
+                entrada = datetime.combine(dia, time(7)) + timedelta(minutes=rnd.randint(-20, 40))
+                saida = entrada + timedelta(hours=rnd.choice((4, 6, 8)), minutes=rnd.randint(-15, 15))
+                for tipo, momento in (("Entrada", entrada), ("Saída", saida)):
+                    yield (proximo_id, cpf, momento, tipo, escola_id)
+                    proximo_id += 1
+                restantes -= 2
+
+    registrar("ponto", inserir_em_massa(
+        connection, Ponto, ["id", "servidor_cpf", "timestamp", "tipo", "escola_id"], linhas_pontos(),
+    ))
+
+    # Merenda: produtos e um ano de movimentações de estoque
+    primeiro_id_produto = _proximo_id(connection, ProdutoMerenda)
+    ids_produtos = list(range(primeiro_id_produto, primeiro_id_produto + tam["produtos"]))
+    registrar("produto_merenda", inserir_em_massa(
+        connection, ProdutoMerenda, ["id", "nome", "unidade_medida", "categoria", "estoque_atual"],
+        ((i, f"{nome} {i}", unidade, categoria, 0.0)
+         for i in ids_produtos for nome, unidade, categoria in [rnd.choice(PRODUTOS)]),
+    ))
+
+    def linhas_estoque():
+        proximo_id = _proximo_id(connection, EstoqueMovimento)
+        for deslocamento in range(tam["dias_estoque"]):
+            dia = datetime.combine(hoje - timedelta(days=deslocamento), time(9))
+            for produto_id in ids_produtos:
+                if rnd.random() < 0.15:
+                    yield (proximo_id, produto_id, "Entrada", round(rnd.uniform(50, 500), 1), dia,
+                           "Fornecedor Local LTDA", f"L{proximo_id}", "almoxarifado")
+                    proximo_id += 1
+                if rnd.random() < 0.6:
+                    yield (proximo_id, produto_id, "Saída", round(rnd.uniform(1, 40), 1),
+                           dia + timedelta(hours=rnd.randint(1, 7)), None, None, "almoxarifado")
+                    proximo_id += 1
+
+    registrar("estoque_movimento", inserir_em_massa(
+        connection, EstoqueMovimento,
+        ["id", "produto_id", "tipo", "quantidade", "data_movimento", "fornecedor", "lote",
+         "usuario_responsavel"],
+        linhas_estoque(),
+    ))
+
+    # Protocolos com as tramitações de cada um
+    primeiro_id_protocolo = _proximo_id(connection, Protocolo)
+    tramitacoes = []
+    sequencia_mes = {}
+
+    def linhas_protocolos():
+        intervalo = timedelta(days=730) / tam["protocolos"]
+        for n in range(tam["protocolos"]):
+            protocolo_id = primeiro_id_protocolo + n
+            criacao = datetime.combine(inicio_historico, time(8)) + intervalo * n
+            chave = (criacao.year, criacao.month)
+            sequencia_mes[chave] = sequencia_mes.get(chave, 0) + 1
+            numero = f"{criacao.year}-{criacao.month:02d}-{sequencia_mes[chave]:03d}"
+            setor = "Protocolo Geral"
+            envio = criacao
+            quantidade = rnd.choice((0, 1, 2, 3, 3, 4, 5, 6))
+            for _ in range(quantidade):
+                destino = rnd.choice([s for s in SETORES if s != setor])
+                envio += timedelta(hours=rnd.randint(2, 240))
+                tramitacoes.append((protocolo_id, setor, destino, envio, "Encaminhado para análise.", "protocolo"))
+                setor = destino
+            status = "Aberto" if quantidade == 0 else rnd.choice(("Em Tramitação", "Em Tramitação", "Finalizado"))
+            yield (protocolo_id, numero, rnd.choice(ASSUNTOS), "Requerimento", _nome(rnd),
+                   "Protocolo Geral", setor, criacao, status)
+
+    registrar("protocolo", inserir_em_massa(
+        connection, Protocolo,
+        ["id", "numero_protocolo", "assunto", "tipo_documento", "interessado", "setor_origem",
+         "setor_atual", "data_criacao", "status"],
+        linhas_protocolos(),
+    ))
+    primeiro_id_tramitacao = _proximo_id(connection, Tramitacao)
+    registrar("tramitacao", inserir_em_massa(
+        connection, Tramitacao,
+        ["id", "protocolo_id", "setor_origem", "setor_destino", "data_envio", "despacho",
+         "usuario_responsavel"],
+        ((primeiro_id_tramitacao + i, *t) for i, t in enumerate(tramitacoes)),
+    ))
+
+    # Documentos do RH: contratos (números 'NNN/AAAA' por ano), requerimentos e GAMs
+    def linhas_contratos():
+        proximo_id = _proximo_id(connection, Contrato)
+        por_ano = {}
+        for _ in range(tam["contratos"]):
+            _, cpf, _, _ = rnd.choice(servidores)
+            ano = rnd.randint(hoje.year - 1, hoje.year)
+            por_ano[ano] = por_ano.get(ano, 0) + 1
+            numero = f"{por_ano[ano]:03d}/{ano}"
+            texto = _texto_contrato(numero, ano, _nome(rnd), cpf, rnd.choice(FUNCOES), rnd.uniform(1412, 3000))
+            yield (proximo_id, numero, ano, cpf, texto, "manual",
+                   datetime.combine(date(ano, 2, 1), time(9)) + timedelta(minutes=proximo_id))
+            proximo_id += 1
+
+    registrar("contrato", inserir_em_massa(
+        connection, Contrato,
+        ["id", "numero", "ano", "servidor_cpf", "conteudo", "assinatura_secretaria_tipo", "data_geracao"],
+        linhas_contratos(),
+    ))
+
+    def linhas_requerimentos():
+        proximo_id = _proximo_id(connection, Requerimento)
+        for _ in range(tam["requerimentos"]):
+            _, cpf, _, _ = rnd.choice(servidores)
+            inicio = hoje - timedelta(days=rnd.randint(0, 700))
+            yield (proximo_id, "Secretário(a) Municipal", cpf, rnd.choice(NATUREZAS), inicio,
+                   f"{rnd.choice((15, 30, 60, 90))} dias", datetime.combine(inicio, time(10)),
+                   rnd.choice(STATUS_REQUERIMENTO))
+            proximo_id += 1
+
+    registrar("requerimento", inserir_em_massa(
+        connection, Requerimento,
+        ["id", "autoridade_dirigida", "servidor_cpf", "natureza", "data_inicio_requerimento", "duracao",
+         "data_criacao", "status"],
+        linhas_requerimentos(),
+    ))
+
+    def linhas_gams():
+        proximo_id = _proximo_id(connection, GAM)
+        for _ in range(tam["gams"]):
+            contrato, _, _, _ = rnd.choice(servidores)
+            laudo = hoje - timedelta(days=rnd.randint(1, 700))
+            yield (proximo_id, contrato, "O(A) servidor(a) é efetivo(a) e encontra-se em exercício.", laudo,
+                   f"Dr(a). {_nome(rnd)}", rnd.choice((15, 30, 60, 90)),
+                   "Apresenta quadro clínico que impede o exercício das atividades.", rnd.choice(CIDS),
+                   datetime.combine(laudo, time(11)), "Emitida")
+            proximo_id += 1
+
+    registrar("gam", inserir_em_massa(
+        connection, GAM,
+        ["id", "servidor_num_contrato", "texto_inicial_observacoes", "data_laudo", "medico_laudo",
+         "dias_afastamento_laudo", "justificativa_laudo", "cid10", "data_emissao", "status"],
+        linhas_gams(),
+    ))
+
+    _ajustar_sequencias(connection, [
+        Escola, Motorista, Abastecimento, Ponto, ProdutoMerenda, EstoqueMovimento, Protocolo, Tramitacao,
+        Contrato, Requerimento, GAM,
+    ])
+    return contagem
@@ -0,0 +1,103 @@
+# escopo_secretaria.py
+# Filtro automático por secretaria (multi-tenant) para as consultas do ORM.
+# Em toda consulta feita durante uma requisição de usuário logado, Servidor,
+# Veiculo, Abastecimento e Manutencao só trazem registros da secretaria do
+# usuário. Abastecimentos e manutenções são filtrados por uma subconsulta nos
+# veículos da secretaria, sem precisar carregar a lista de placas no Python.
+#
+# O admin não é filtrado: vê todas as secretarias, como antes do filtro. Nas
+# rotas marcadas com @escopo_admin ele pode escolher uma secretaria em
+# ?secretaria_id= (painel, extrato e relatório TCE-PI de combustível). Rotas
+# marcadas com @escopo_da_sessao restringem também o admin à secretaria em que
+# ele está logado; hoje são só a lista de servidores (lista_servidores e
+# api_servidores), que já era filtrada assim para todos os perfis.
+
+from functools import wraps
+
+from flask import g, session, request, has_request_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from models import Servidor, Veiculo, Abastecimento, Manutencao
+
+# Valor guardado em g quando o admin amplia para todas as secretarias
+TODAS_AS_SECRETARIAS = "todas"
+
+
+def secretaria_do_escopo():
+    """
+    ID da secretaria que filtra as consultas da requisição atual, ou None quando não
+    há filtro (fora de requisição, usuário não logado ou admin sem escopo restrito).
+    """
+    if not has_request_context():
+        return None
+    escopo = g.get("escopo_secretaria")
+    if escopo == TODAS_AS_SECRETARIAS:
+        return None
+    if escopo is not None:
+        return escopo
+    if not session.get("logged_in") or session.get("role") == "admin":
+        return None
+    return session.get("secretaria_id")
+
+
+def ampliar_escopo(secretaria_id=None):
+    """
+    Permite ao admin consultar todas as secretarias (secretaria_id=None) ou outra
+    secretaria específica. Para os demais perfis não faz nada.
+    """
+    if session.get("role") != "admin":
+        return secretaria_do_escopo()
+    g.escopo_secretaria = secretaria_id or TODAS_AS_SECRETARIAS
+    return secretaria_id
+
+
+def escopo_admin(f):
+    """Decorador: nas rotas marcadas, o admin vê só a secretaria escolhida em ?secretaria_id= (sem ela, todas)."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        ampliar_escopo(request.values.get("secretaria_id", type=int))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def escopo_da_sessao(f):
+    """Decorador: nas rotas marcadas, também o admin só vê a secretaria em que está logado."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get("role") == "admin" and session.get("secretaria_id"):
+            g.escopo_secretaria = session["secretaria_id"]
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _aplicar_escopo(execute_state):
+    if not execute_state.is_select or execute_state.execution_options.get("sem_escopo"):
+        return
+    secretaria_id = secretaria_do_escopo()
+    if secretaria_id is None:
+        return
+
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(
+            Servidor, lambda cls: cls.secretaria_id == secretaria_id, include_aliases=True
+        ),
+        with_loader_criteria(
+            Veiculo, lambda cls: cls.secretaria_id == secretaria_id, include_aliases=True
+        ),
+        with_loader_criteria(
+            Abastecimento,
+            lambda cls: cls.veiculo_placa.in_(
+                select(Veiculo.placa).where(Veiculo.secretaria_id == secretaria_id)
+            ),
+            include_aliases=True,
+        ),
+        with_loader_criteria(
+            Manutencao,
+            lambda cls: cls.veiculo_placa.in_(
+                select(Veiculo.placa).where(Veiculo.secretaria_id == secretaria_id)
+            ),
+            include_aliases=True,
+        ),
+    )
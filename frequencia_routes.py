@@ -3,7 +3,7 @@ from flask import Blueprint, render_template
 from sqlalchemy import func
 from models import Escola, Ponto, Servidor
 from utils import login_required
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta
 from app import db
 from utils import role_required
 
@@ -23,11 +23,12 @@ def dashboard_frequencia():
     hoje = date.today()
     data_inicio = hoje - timedelta(days=6)
     
+    # Filtra por intervalo de timestamp (e não por date(timestamp)) para usar o índice
     pontos_por_dia = db.session.query(
         func.date(Ponto.timestamp).label('dia'),
         func.count(Ponto.id).label('total')
     ).filter(
-        func.date(Ponto.timestamp) >= data_inicio
+        Ponto.timestamp >= datetime.combine(data_inicio, time.min)
     ).group_by('dia').order_by('dia').all()
     
     # Prepara os dados para o Chart.js
@@ -42,7 +43,10 @@ def dashboard_frequencia():
 
     # --- LÓGICA PARA SERVIDORES FALTOSOS HOJE ---
     # Atenção: Esta lógica assume que o campo 'lotacao' do Servidor corresponde ao 'nome' da Escola.
-    servidores_presentes_cpf = [r.servidor_cpf for r in db.session.query(Ponto.servidor_cpf).filter(func.date(Ponto.timestamp) == hoje).distinct()]
+    inicio_hoje = datetime.combine(hoje, time.min)
+    servidores_presentes_cpf = [r.servidor_cpf for r in db.session.query(Ponto.servidor_cpf).filter(
+        Ponto.timestamp >= inicio_hoje, Ponto.timestamp < inicio_hoje + timedelta(days=1)
+    ).distinct()]
     
     # Busca servidores que não estão na lista de presentes
     servidores_faltosos = Servidor.query.filter(
@@ -0,0 +1,385 @@
+# importacao_servidores.py
+# Importação em massa de servidores a partir de CSV ou XLSX (modelo em
+# /baixar_modelo_csv).
+#
+# A rota só salva o arquivo e enfileira a importação; um worker em segundo plano
+# lê o arquivo em blocos de LOTE linhas, valida cada linha (CPF, datas, valores)
+# e grava o bloco com um único INSERT ... ON CONFLICT (num_contrato) DO UPDATE.
+# O andamento fica num arquivo JSON ao lado do upload, para que qualquer worker
+# do gunicorn consiga responder à consulta de progresso, e as linhas recusadas
+# ficam num relatório de erros.
+#
+# Como a gravação não passa pelo ORM, no final são refeitos o painel, a busca de
+# servidores e o cache dos filtros da lista.
+
+import csv
+import json
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import select
+
+from extensions import db
+from models import Servidor
+from utils import upsert_em_lote
+from busca_servidores import normalizar, recriar_indice_busca
+from painel_indicadores import recalcular_painel
+from consulta_servidores import limpar_opcoes_filtro
+from tarefas_pdf import marcar_alteracao
+
+# O openpyxl é opcional: sem ele só CSV é aceito
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+LOTE = 1000
+MAXIMO_ERROS_NO_STATUS = 200  # o relatório CSV tem todos; o JSON só os primeiros
+EXTENSOES = (".csv", ".xlsx") if load_workbook else (".csv",)
+
+# Cabeçalho do modelo -> coluna do Servidor (os nomes são comparados sem acento)
+CABECALHO_MODELO = [
+    "Nº CONTRATO", "NOME", "CPF", "FUNÇÃO", "LOTAÇÃO", "VÍNCULO",
+    "CARGA HORÁRIA", "REMUNERAÇÃO", "VIGÊNCIA",
+]
+COLUNAS = {
+    "n contrato": "num_contrato",
+    "no contrato": "num_contrato",
+    "nome": "nome",
+    "cpf": "cpf",
+    "funcao": "funcao",
+    "lotacao": "lotacao",
+    "vinculo": "tipo_vinculo",
+    "carga horaria": "carga_horaria",
+    "remuneracao": "remuneracao",
+    "vigencia": "vigencia",
+}
+
+# Campo da tabela -> coluna do arquivo de onde ele vem, quando os nomes diferem
+ORIGEM = {"data_inicio": "vigencia", "data_saida": "vigencia"}
+
+# Uma importação por vez: cargas simultâneas só disputariam o mesmo banco
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="importacao")
+
+
+class LinhaInvalida(ValueError):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Validação
+# ---------------------------------------------------------------------------
+
+def cpf_valido(cpf):
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+    for tamanho in (9, 10):
+        soma = sum(int(d) * peso for d, peso in zip(cpf[:tamanho], range(tamanho + 1, 1, -1)))
+        digito = (soma * 10) % 11 % 10
+        if digito != int(cpf[tamanho]):
+            return False
+    return True
+
+
+def _data(texto):
+    texto = texto.strip()
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise LinhaInvalida(f"data inválida: '{texto}'")
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))  # células numéricas do Excel (nº do contrato, CPF)
+    return str(valor).strip()
+
+
+def _numero(valor):
+    """
+    Valor monetário da planilha. Células numéricas do Excel já vêm como número;
+    no texto, o ponto só é separador de milhar quando há vírgula decimal
+    ("1.500,00") ou quando só separa milhares ("1.500"); senão é o ponto decimal.
+    """
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = valor.replace("R$", "").replace(" ", "").strip()
+    if not texto:
+        return None
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(\.\d{3})+", texto):
+        texto = texto.replace(".", "")
+    return float(texto)
+
+
+def validar_linha(registro, secretaria_id):
+    """Converte uma linha do arquivo num dicionário da tabela servidor (ou LinhaInvalida)."""
+    num_contrato = registro.get("num_contrato", "")
+    nome = registro.get("nome", "")
+    if not num_contrato:
+        raise LinhaInvalida("Nº CONTRATO vazio")
+    if not nome:
+        raise LinhaInvalida("NOME vazio")
+
+    cpf = re.sub(r"\D", "", registro.get("cpf", "")) or None
+    if cpf and len(cpf) < 11:
+        cpf = cpf.zfill(11)  # célula numérica do Excel perde os zeros à esquerda
+    if cpf and not cpf_valido(cpf):
+        raise LinhaInvalida(f"CPF inválido: '{registro['cpf']}'")
+
+    try:
+        remuneracao = _numero(registro.get("remuneracao", ""))
+    except ValueError:
+        raise LinhaInvalida(f"remuneração inválida: '{registro['remuneracao']}'")
+
+    data_inicio = data_saida = None
+    vigencia = registro.get("vigencia", "")
+    if vigencia:
+        partes = vigencia.split(" a ")
+        if len(partes) != 2:
+            raise LinhaInvalida(f"vigência deve ser 'dd/mm/aaaa a dd/mm/aaaa': '{vigencia}'")
+        data_inicio, data_saida = _data(partes[0]), _data(partes[1])
+        if data_saida < data_inicio:
+            raise LinhaInvalida("vigência termina antes de começar")
+
+    linha = {
+        "num_contrato": num_contrato[:50],
+        "nome": nome[:200],
+        "cpf": cpf,
+        "funcao": registro.get("funcao") or None,
+        "lotacao": registro.get("lotacao") or None,
+        "tipo_vinculo": registro.get("tipo_vinculo") or None,
+        "carga_horaria": registro.get("carga_horaria") or None,
+        "remuneracao": remuneracao,
+        "data_inicio": data_inicio,
+        "data_saida": data_saida,
+        "secretaria_id": secretaria_id,
+    }
+    # Colunas ausentes do arquivo não apagam o que já está cadastrado
+    return {
+        campo: valor for campo, valor in linha.items()
+        if campo in ("num_contrato", "nome", "secretaria_id") or ORIGEM.get(campo, campo) in registro
+    }
+
+
+# ---------------------------------------------------------------------------
+# Leitura do arquivo em blocos
+# ---------------------------------------------------------------------------
+
+class _PontoEVirgula(csv.excel):
+    delimiter = ";"
+
+
+def _linhas_csv(caminho):
+    with open(caminho, "rb") as arquivo:
+        inicio = arquivo.read(64 * 1024)
+    try:
+        inicio.decode("utf-8")
+        codificacao = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacao = "latin-1"  # CSV salvo pelo Excel em português
+
+    with open(caminho, encoding=codificacao, newline="") as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+        except csv.Error:
+            dialeto = _PontoEVirgula
+        yield from csv.reader(arquivo, dialeto)
+
+
+def _linhas_xlsx(caminho):
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        for linha in livro.worksheets[0].iter_rows(values_only=True):
+            yield list(linha)
+    finally:
+        livro.close()
+
+
+def _celula(coluna, valor):
+    # A remuneração numérica do Excel segue como número (ver _numero); o resto vira texto
+    if coluna == "remuneracao" and isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return valor
+    return _texto(valor)
+
+
+def ler_registros(caminho):
+    """Gera (nº da linha no arquivo, {coluna: texto}) sem carregar o arquivo inteiro."""
+    linhas = _linhas_xlsx(caminho) if caminho.lower().endswith(".xlsx") else _linhas_csv(caminho)
+    cabecalho = None
+    for numero, linha in enumerate(linhas, start=1):
+        if cabecalho is None:
+            cabecalho = [COLUNAS.get(re.sub(r"[^a-z ]", "", normalizar(_texto(c))).strip()) for c in linha]
+            if "num_contrato" not in cabecalho or "nome" not in cabecalho:
+                raise LinhaInvalida("cabeçalho sem as colunas 'Nº CONTRATO' e 'NOME' (use o modelo)")
+            continue
+        if not any(_texto(v) for v in linha):
+            continue
+        # Linhas curtas completam com vazio: todas as linhas do lote precisam das mesmas chaves
+        yield numero, {c: _celula(c, linha[i]) if i < len(linha) else "" for i, c in enumerate(cabecalho) if c}
+
+
+# ---------------------------------------------------------------------------
+# Status (arquivo JSON compartilhado entre os workers)
+# ---------------------------------------------------------------------------
+
+def pasta_importacoes(app):
+    return os.path.join(app.config["UPLOAD_FOLDER"], "importacoes")
+
+
+def _caminho_status(pasta, importacao_id):
+    return os.path.join(pasta, f"{importacao_id}.json")
+
+
+def _caminho_erros(pasta, importacao_id):
+    return os.path.join(pasta, f"{importacao_id}_erros.csv")
+
+
+def _gravar_status(pasta, importacao_id, status):
+    temporario = _caminho_status(pasta, importacao_id) + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(status, arquivo, ensure_ascii=False)
+    os.replace(temporario, _caminho_status(pasta, importacao_id))
+
+
+def status_importacao(app, importacao_id):
+    """Status da importação, ou None se o id não existir."""
+    if not re.fullmatch(r"[0-9a-f]{32}", importacao_id or ""):
+        return None
+    try:
+        with open(_caminho_status(pasta_importacoes(app), importacao_id), encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def caminho_relatorio_erros(app, importacao_id):
+    if not re.fullmatch(r"[0-9a-f]{32}", importacao_id or ""):
+        return None
+    caminho = _caminho_erros(pasta_importacoes(app), importacao_id)
+    return caminho if os.path.exists(caminho) else None
+
+
+# ---------------------------------------------------------------------------
+# Importação
+# ---------------------------------------------------------------------------
+
+def iniciar_importacao(app, arquivo, secretaria_id, usuario):
+    """Salva o upload e agenda a importação. Devolve o id para acompanhar o progresso."""
+    extensao = os.path.splitext(arquivo.filename)[1].lower()
+    if extensao not in EXTENSOES:
+        raise LinhaInvalida(f"formato não suportado; envie {' ou '.join(EXTENSOES)}")
+
+    pasta = pasta_importacoes(app)
+    os.makedirs(pasta, exist_ok=True)
+    importacao_id = uuid.uuid4().hex
+    caminho = os.path.join(pasta, importacao_id + extensao)
+    arquivo.save(caminho)
+
+    _gravar_status(pasta, importacao_id, {
+        "id": importacao_id, "arquivo": arquivo.filename, "usuario": usuario,
+        "situacao": "na fila", "linhas": 0, "inseridos": 0, "atualizados": 0,
+        "total_erros": 0, "erros": [], "mensagem": None,
+        "inicio": datetime.now().isoformat(timespec="seconds"), "fim": None,
+    })
+    _executor.submit(_executar, app, pasta, importacao_id, caminho, secretaria_id)
+    return importacao_id
+
+
+def _executar(app, pasta, importacao_id, caminho, secretaria_id):
+    status = status_importacao(app, importacao_id)
+    status["situacao"] = "processando"
+    _gravar_status(pasta, importacao_id, status)
+
+    with app.app_context(), open(_caminho_erros(pasta, importacao_id), "w", encoding="utf-8-sig", newline="") as saida:
+        relatorio = csv.writer(saida, delimiter=";")
+        relatorio.writerow(["LINHA", "Nº CONTRATO", "ERRO"])
+
+        def erro(numero, num_contrato, mensagem):
+            relatorio.writerow([numero, num_contrato, mensagem])
+            status["total_erros"] += 1
+            if len(status["erros"]) < MAXIMO_ERROS_NO_STATUS:
+                status["erros"].append({"linha": numero, "num_contrato": num_contrato, "erro": mensagem})
+
+        try:
+            vistos_contrato, vistos_cpf = {}, {}
+            lote = []
+            for numero, registro in ler_registros(caminho):
+                status["linhas"] += 1
+                try:
+                    linha = validar_linha(registro, secretaria_id)
+                    if linha["num_contrato"] in vistos_contrato:
+                        raise LinhaInvalida(f"Nº CONTRATO repetido (linha {vistos_contrato[linha['num_contrato']]})")
+                    if linha.get("cpf") and linha["cpf"] in vistos_cpf:
+                        raise LinhaInvalida(f"CPF repetido (linha {vistos_cpf[linha['cpf']]})")
+                except LinhaInvalida as e:
+                    erro(numero, registro.get("num_contrato", ""), str(e))
+                    continue
+                vistos_contrato[linha["num_contrato"]] = numero
+                if linha.get("cpf"):
+                    vistos_cpf[linha["cpf"]] = numero
+                lote.append((numero, linha))
+                if len(lote) >= LOTE:
+                    _gravar_lote(lote, status, erro)
+                    lote = []
+                    _gravar_status(pasta, importacao_id, status)
+            _gravar_lote(lote, status, erro)
+
+            with db.engine.begin() as connection:
+                recalcular_painel(connection)
+                recriar_indice_busca(connection)
+                marcar_alteracao(connection, "servidor")
+            limpar_opcoes_filtro()
+            status["situacao"] = "concluída"
+        except Exception as e:
+            status["situacao"] = "falhou"
+            status["mensagem"] = str(e)
+        finally:
+            status["fim"] = datetime.now().isoformat(timespec="seconds")
+            _gravar_status(pasta, importacao_id, status)
+            os.remove(caminho)
+
+
+def _gravar_lote(lote, status, erro):
+    """Grava um bloco validado numa transação: um SELECT para conferir, um INSERT em lote."""
+    if not lote:
+        return
+    tabela = Servidor.__table__
+    with db.engine.begin() as connection:
+        contratos = [linha["num_contrato"] for _, linha in lote]
+        cpfs = [linha["cpf"] for _, linha in lote if linha.get("cpf")]
+        existentes = dict(connection.execute(
+            select(tabela.c.num_contrato, tabela.c.secretaria_id).where(tabela.c.num_contrato.in_(contratos))
+        ).all())
+        dono_do_cpf = dict(connection.execute(
+            select(tabela.c.cpf, tabela.c.num_contrato).where(tabela.c.cpf.in_(cpfs))
+        ).all()) if cpfs else {}
+
+        linhas = []
+        for numero, linha in lote:
+            if linha["num_contrato"] in existentes and existentes[linha["num_contrato"]] != linha["secretaria_id"]:
+                erro(numero, linha["num_contrato"], "vínculo cadastrado em outra secretaria")
+                continue
+            dono = dono_do_cpf.get(linha.get("cpf"))
+            if dono and dono != linha["num_contrato"]:
+                erro(numero, linha["num_contrato"], f"CPF já cadastrado no vínculo {dono}")
+                continue
+            linhas.append(linha)
+
+        # Célula vazia não apaga o que já estava cadastrado
+        upsert_em_lote(connection, tabela, ["num_contrato"], linhas, manter_existentes=True)
+    atualizados = sum(1 for linha in linhas if linha["num_contrato"] in existentes)
+    status["atualizados"] += atualizados
+    status["inseridos"] += len(linhas) - atualizados
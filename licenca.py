@@ -0,0 +1,65 @@
+# licenca.py
+# Cache, por processo, da data de expiração da licença usada por @check_license.
+# A licença muda raramente (admin_licenca / renovar_licenca), então cada worker
+# guarda a data em memória e só volta ao banco quando:
+#   - o cache passou de LICENCA_TTL segundos, ou
+#   - o carimbo de versão (arquivo LICENCA_CARIMBO) mudou, o que acontece quando
+#     qualquer worker chama invalidar_licenca() depois de alterar a licença.
+# Conferir o carimbo é um os.stat(), sem ida ao banco. O TTL cobre o caso de
+# workers em máquinas diferentes, que não enxergam o mesmo arquivo.
+
+import os
+import threading
+import time
+
+from flask import current_app
+
+from models import License
+
+TTL_PADRAO = 60  # segundos
+
+_trava = threading.Lock()
+_cache = {"expiracao": None, "carregado_em": None, "versao": None}
+
+
+def _caminho_carimbo():
+    return current_app.config.get("LICENCA_CARIMBO") or os.path.join(current_app.instance_path, "licenca.versao")
+
+
+def _versao_atual():
+    try:
+        return os.stat(_caminho_carimbo()).st_mtime_ns
+    except OSError:
+        return None
+
+
+def expiracao_licenca():
+    """Data de expiração da licença (None se não houver licença cadastrada)."""
+    ttl = current_app.config.get("LICENCA_TTL", TTL_PADRAO)
+    versao = _versao_atual()
+    carregado_em = _cache["carregado_em"]
+    if carregado_em is not None and time.monotonic() - carregado_em < ttl and _cache["versao"] == versao:
+        return _cache["expiracao"]
+
+    with _trava:
+        licenca = License.query.first()
+        _cache.update({
+            "expiracao": licenca.expiration_date if licenca else None,
+            "carregado_em": time.monotonic(),
+            "versao": versao,
+        })
+        return _cache["expiracao"]
+
+
+def invalidar_licenca():
+    """Chame depois de gravar a licença: limpa o cache deste processo e avisa os demais workers."""
+    _cache["carregado_em"] = None
+    caminho = _caminho_carimbo()
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, "a"):
+            pass
+        agora = time.time_ns()
+        os.utime(caminho, ns=(agora, agora))
+    except OSError as e:
+        print(f"Erro ao atualizar o carimbo da licença: {e}")
@@ -0,0 +1,239 @@
+# logs_auditoria.py
+# Consulta e arquivamento da tabela log.
+#
+# A tela de logs pagina por cursor (keyset) em (timestamp, id): cada página
+# continua de onde a anterior parou usando o índice ix_log_timestamp_id, sem
+# COUNT(*) nem OFFSET, então o custo não cresce com o tamanho da tabela.
+#
+# 'flask arquivar-logs' move os logs mais antigos que LOGS_RETENCAO_DIAS para
+# arquivos mensais compactados (log-AAAA-MM.jsonl.gz) em LOGS_PASTA_ARQUIVO, que
+# continuam pesquisáveis pela mesma tela.
+
+import gzip
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta, time
+
+from sqlalchemy import select, delete, func, tuple_
+
+from extensions import db
+from models import Log, User
+
+log = Log.__table__
+
+RETENCAO_PADRAO_DIAS = 180
+POR_PAGINA = 25
+PADRAO_ARQUIVO = re.compile(r"^log-(\d{4})-(\d{2})\.jsonl\.gz$")
+
+
+# ---------------------------------------------------------------------------
+# Filtros e cursor
+# ---------------------------------------------------------------------------
+
+def filtros_da_requisicao(args):
+    """Lê usuário, texto da ação e período (AAAA-MM-DD) dos parâmetros da URL."""
+    def data(nome):
+        try:
+            return datetime.strptime(args.get(nome, ""), "%Y-%m-%d").date()
+        except ValueError:
+            return None
+
+    return {
+        "usuario": (args.get("usuario") or "").strip(),
+        "texto": (args.get("texto") or "").strip(),
+        "data_inicio": data("data_inicio"),
+        "data_fim": data("data_fim"),
+    }
+
+
+def _intervalo(filtros):
+    inicio = datetime.combine(filtros["data_inicio"], time.min) if filtros.get("data_inicio") else None
+    fim = datetime.combine(filtros["data_fim"] + timedelta(days=1), time.min) if filtros.get("data_fim") else None
+    return inicio, fim
+
+
+def codificar_cursor(registro):
+    return f"{registro['timestamp'].isoformat()}_{registro['id']}"
+
+
+def decodificar_cursor(cursor):
+    try:
+        timestamp, id_ = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(timestamp), int(id_)
+    except (AttributeError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Logs no banco (paginação por cursor)
+# ---------------------------------------------------------------------------
+
+def pagina_logs(filtros, antes=None, depois=None, por_pagina=POR_PAGINA):
+    """
+    Uma página de logs, do mais recente para o mais antigo. 'antes' continua para
+    os mais antigos a partir do cursor; 'depois' volta para os mais recentes.
+    Devolve {itens, cursor_anterior, cursor_proximo} (cursores None nas pontas).
+    """
+    consulta = select(log)
+    if filtros.get("usuario"):
+        consulta = consulta.where(log.c.username == filtros["usuario"])
+    if filtros.get("texto"):
+        consulta = consulta.where(log.c.action.ilike(f"%{filtros['texto']}%"))
+    inicio, fim = _intervalo(filtros)
+    if inicio:
+        consulta = consulta.where(log.c.timestamp >= inicio)
+    if fim:
+        consulta = consulta.where(log.c.timestamp < fim)
+
+    chave = tuple_(log.c.timestamp, log.c.id)
+    voltando = depois is not None and decodificar_cursor(depois) is not None
+    if voltando:
+        consulta = consulta.where(chave > decodificar_cursor(depois)).order_by(log.c.timestamp, log.c.id)
+    else:
+        if antes is not None and decodificar_cursor(antes) is not None:
+            consulta = consulta.where(chave < decodificar_cursor(antes))
+        consulta = consulta.order_by(log.c.timestamp.desc(), log.c.id.desc())
+
+    # Uma linha a mais só para saber se existe outra página naquela direção
+    linhas = [dict(r) for r in db.session.execute(consulta.limit(por_pagina + 1)).mappings()]
+    tem_mais = len(linhas) > por_pagina
+    itens = linhas[:por_pagina]
+    if voltando:
+        if not tem_mais:
+            # Voltou até o começo: mostra a primeira página completa
+            return pagina_logs(filtros, por_pagina=por_pagina)
+        itens.reverse()
+
+    if not itens:
+        return {"itens": [], "cursor_anterior": None, "cursor_proximo": None}
+    return {
+        "itens": itens,
+        "cursor_anterior": codificar_cursor(itens[0]) if voltando or antes is not None else None,
+        "cursor_proximo": codificar_cursor(itens[-1]) if voltando or tem_mais else None,
+    }
+
+
+def usuarios_do_filtro(selecionado=""):
+    """
+    Nomes da lista de usuários do filtro, lidos da tabela de usuários (pequena)
+    em vez de um DISTINCT sobre a tabela log inteira. O usuário já filtrado entra
+    na lista mesmo que não exista mais, para a seleção não se perder.
+    """
+    nomes = list(db.session.execute(select(User.username).order_by(User.username)).scalars())
+    if selecionado and selecionado not in nomes:
+        nomes = sorted(nomes + [selecionado])
+    return nomes
+
+
+# ---------------------------------------------------------------------------
+# Arquivamento
+# ---------------------------------------------------------------------------
+
+def pasta_arquivo(app):
+    return app.config.get("LOGS_PASTA_ARQUIVO") or os.path.join(app.root_path, "arquivo_logs")
+
+
+def _nome_arquivo(ano, mes):
+    return f"log-{ano:04d}-{mes:02d}.jsonl.gz"
+
+
+def meses_arquivados(pasta):
+    """[(ano, mes)] dos arquivos existentes, do mais recente para o mais antigo."""
+    if not os.path.isdir(pasta):
+        return []
+    meses = [tuple(int(x) for x in m.groups()) for m in map(PADRAO_ARQUIVO.match, os.listdir(pasta)) if m]
+    return sorted(meses, reverse=True)
+
+
+def _ler_arquivo(caminho):
+    with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            registro = json.loads(linha)
+            registro["timestamp"] = datetime.fromisoformat(registro["timestamp"])
+            yield registro
+
+
+def arquivar_logs(connection, pasta, dias=RETENCAO_PADRAO_DIAS, agora=None, lote=5000):
+    """
+    Move os logs com mais de 'dias' dias para os arquivos mensais. Cada mês é escrito
+    num arquivo temporário (junto com o que já estava arquivado daquele mês), as
+    linhas são apagadas do banco e só depois do commit o arquivo substitui o antigo.
+    Devolve {(ano, mes): quantidade}.
+    """
+    limite = (agora or datetime.utcnow()) - timedelta(days=dias)
+    os.makedirs(pasta, exist_ok=True)
+
+    ano = func.extract("year", log.c.timestamp)
+    mes = func.extract("month", log.c.timestamp)
+    meses = [
+        (int(a), int(m)) for a, m in connection.execute(
+            select(ano, mes).where(log.c.timestamp < limite).group_by(ano, mes).order_by(ano, mes)
+        )
+    ]
+
+    movidos = {}
+    for a, m in meses:
+        inicio = datetime(a, m, 1)
+        fim = min(datetime(a + m // 12, m % 12 + 1, 1), limite)
+        filtro = (log.c.timestamp >= inicio, log.c.timestamp < fim)
+        destino = os.path.join(pasta, _nome_arquivo(a, m))
+
+        descritor, temporario = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+        os.close(descritor)
+        try:
+            quantidade = 0
+            with gzip.open(temporario, "wt", encoding="utf-8") as saida:
+                if os.path.exists(destino):
+                    with gzip.open(destino, "rt", encoding="utf-8") as anterior:
+                        for linha in anterior:
+                            saida.write(linha)
+                resultado = connection.execution_options(yield_per=lote).execute(
+                    select(log).where(*filtro).order_by(log.c.timestamp, log.c.id)
+                )
+                for registro in resultado.mappings():
+                    saida.write(json.dumps({
+                        "id": registro["id"], "timestamp": registro["timestamp"].isoformat(),
+                        "username": registro["username"], "action": registro["action"],
+                        "ip_address": registro["ip_address"],
+                    }, ensure_ascii=False) + "\n")
+                    quantidade += 1
+            connection.execute(delete(log).where(*filtro))
+            connection.commit()
+            os.replace(temporario, destino)
+        except Exception:
+            connection.rollback()
+            os.remove(temporario)
+            raise
+        movidos[(a, m)] = quantidade
+    return movidos
+
+
+def pagina_arquivo(pasta, ano, mes, filtros, pagina=1, por_pagina=POR_PAGINA):
+    """
+    Busca num arquivo mensal, com os mesmos filtros da tela. Os arquivos são lidos
+    por inteiro (são dados frios, consultados raramente), do mais recente ao mais antigo.
+    Devolve {itens, pagina, tem_anterior, tem_proxima}.
+    """
+    caminho = os.path.join(pasta, _nome_arquivo(ano, mes))
+    if not os.path.exists(caminho):
+        return {"itens": [], "pagina": 1, "tem_anterior": False, "tem_proxima": False}
+
+    inicio, fim = _intervalo(filtros)
+    texto = filtros.get("texto", "").lower()
+    encontrados = [
+        r for r in _ler_arquivo(caminho)
+        if (not filtros.get("usuario") or r["username"] == filtros["usuario"])
+        and (not texto or texto in r["action"].lower())
+        and (not inicio or r["timestamp"] >= inicio)
+        and (not fim or r["timestamp"] < fim)
+    ]
+    encontrados.sort(key=lambda r: (r["timestamp"], r["id"]), reverse=True)
+    pagina = max(pagina, 1)
+    return {
+        "itens": encontrados[(pagina - 1) * por_pagina:pagina * por_pagina],
+        "pagina": pagina,
+        "tem_anterior": pagina > 1,
+        "tem_proxima": len(encontrados) > pagina * por_pagina,
+    }
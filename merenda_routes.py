@@ -10,6 +10,10 @@ from app import db
 # Importe todos os novos modelos aqui
 from models import Escola, ProdutoMerenda, EstoqueMovimento, SolicitacaoMerenda, SolicitacaoItem, Cardapio, PratoDiario, HistoricoCardapio, Servidor
 from utils import login_required, registrar_log
+from pdf_tabular import Coluna, desenhar_tabela_pdf
+from recursos_pdf import cabecalho_moderno
+from tarefas_pdf import relatorio_pdf, especificacao, resposta_pdf
+from contagem_status import contagem_por_status, em_cache
 from sqlalchemy import or_, func
 from datetime import datetime
 from datetime import date, timedelta
@@ -26,9 +30,10 @@ merenda_bp = Blueprint('merenda', __name__, url_prefix='/merenda')
 @login_required
 def dashboard():
     # --- Indicadores Rápidos (KPIs) ---
-    total_escolas_ativas = Escola.query.filter_by(status='Ativa').count()
-    total_produtos = ProdutoMerenda.query.count()
-    solicitacoes_pendentes = SolicitacaoMerenda.query.filter_by(status='Pendente').count()
+    # Contagens por status num único GROUP BY cada, com cache curto (contagem_status.py)
+    total_escolas_ativas = contagem_por_status(Escola)['Ativa']
+    total_produtos = em_cache('merenda:produtos', [ProdutoMerenda], ProdutoMerenda.query.count)
+    solicitacoes_pendentes = contagem_por_status(SolicitacaoMerenda)['Pendente']
 
     # --- Gráfico: Top 5 Escolas por Quantidade Total de Produtos Consumidos ---
     top_escolas_query = db.session.query(
@@ -515,28 +520,11 @@ def relatorio_saidas():
 
     resultados = []
     if escola_id and data_inicio_str and data_fim_str:
-        data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d')
-        # Adiciona um dia e subtrai um segundo para incluir o dia final inteiro na busca
-        data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d') + timedelta(days=1, seconds=-1)
-
-        # Busca os movimentos de saída que correspondem aos filtros
-        resultados = db.session.query(
-                EstoqueMovimento.data_movimento,
-                ProdutoMerenda.nome,
-                EstoqueMovimento.quantidade,
-                ProdutoMerenda.unidade_medida
-            ).join(ProdutoMerenda).join(SolicitacaoMerenda).filter(
-                SolicitacaoMerenda.escola_id == escola_id,
-                EstoqueMovimento.tipo == 'Saída',
-                EstoqueMovimento.data_movimento.between(data_inicio, data_fim)
-            ).order_by(EstoqueMovimento.data_movimento.asc()).all()
-        
-        # Se o botão de PDF foi clicado, gera o PDF
+        # Se o botão de PDF foi clicado, o PDF é gerado em segundo plano (tarefas_pdf.py)
         if gerar_pdf:
-            escola = Escola.query.get(escola_id)
-            titulo = f"Relatório de Saídas para {escola.nome}"
-            periodo = f"Período: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
-            return gerar_pdf_saidas(titulo, periodo, resultados)
+            spec = especificacao('merenda_saidas', escola_id=escola_id, data_inicio=data_inicio_str, data_fim=data_fim_str)
+            return resposta_pdf(spec, 'relatorio_saidas.pdf')
+        resultados = consultar_saidas(escola_id, data_inicio_str, data_fim_str).all()
 
     return render_template('merenda/relatorio_saidas.html', 
                            escolas=escolas, 
@@ -545,72 +533,59 @@ def relatorio_saidas():
                            data_inicio=data_inicio_str,
                            data_fim=data_fim_str)
 
-def gerar_pdf_saidas(titulo, periodo, dados):
+def consultar_saidas(escola_id, data_inicio_str, data_fim_str):
     """
-    Função que gera o PDF do relatório de saídas.
+    Movimentos de saída da escola no período (datas no formato AAAA-MM-DD).
     """
-    # --- IMPORTAÇÕES CORRIGIDAS E COMPLETAS ---
-    from .utils import cabecalho_e_rodape_moderno
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.pagesizes import A4 # <-- Importação que faltava
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-    from reportlab.lib import colors
-    from reportlab.lib.units import cm
-    from flask import make_response
-    import io
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=3*cm, bottomMargin=2*cm)
-    
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
-    styles.add(ParagraphStyle(name='Left', alignment=TA_LEFT))
+    data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d')
+    # Adiciona um dia e subtrai um segundo para incluir o dia final inteiro na busca
+    data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d') + timedelta(days=1, seconds=-1)
 
-    story = []
-    
-    # Adiciona o título e o período
-    story.append(Paragraph(titulo, styles['h1']))
-    story.append(Paragraph(periodo, styles['Center']))
-    story.append(Spacer(1, 1*cm))
+    # Busca os movimentos de saída que correspondem aos filtros
+    return db.session.query(
+            EstoqueMovimento.data_movimento,
+            ProdutoMerenda.nome,
+            EstoqueMovimento.quantidade,
+            ProdutoMerenda.unidade_medida
+        ).join(ProdutoMerenda).join(SolicitacaoMerenda).filter(
+            SolicitacaoMerenda.escola_id == escola_id,
+            EstoqueMovimento.tipo == 'Saída',
+            EstoqueMovimento.data_movimento.between(data_inicio, data_fim)
+        ).order_by(EstoqueMovimento.data_movimento.asc())
 
-    # Prepara os dados da tabela
-    table_data = [['Data/Hora da Saída', 'Produto', 'Quantidade']]
-    
-    for item in dados:
-        data_formatada = item.data_movimento.strftime('%d/%m/%Y %H:%M')
-        quantidade_formatada = f"{item.quantidade} {item.unidade_medida}"
-        table_data.append([data_formatada, item.nome, quantidade_formatada])
-
-    # Cria a tabela
-    t = Table(table_data, colWidths=[5*cm, 8*cm, 4*cm])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004d40')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(t)
-    story.append(Spacer(1, 2*cm))
-    
-    # Linhas de assinatura
-    story.append(Paragraph("________________________________________", styles['Center']))
-    story.append(Paragraph("Responsável pelo Almoxarifado", styles['Center']))
-    
-    doc.build(story, onFirstPage=lambda canvas, doc: cabecalho_e_rodape_moderno(canvas, doc, "Relatório de Saídas"), 
-                     onLaterPages=lambda canvas, doc: cabecalho_e_rodape_moderno(canvas, doc, "Relatório de Saídas"))
-    
-    buffer.seek(0)
-    
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'inline; filename=relatorio_saidas.pdf'
-    
-    return response                       
+
+@relatorio_pdf('merenda_saidas', ['estoque_movimento', 'produto_merenda', 'solicitacao_merenda', 'escola'], papeis=['Merenda Escolar'])
+def pdf_saidas(parametros, saida):
+    escola = Escola.query.get(parametros['escola_id'])
+    titulo = f"Relatório de Saídas para {escola.nome}"
+    inicio = datetime.strptime(parametros['data_inicio'], '%Y-%m-%d')
+    fim = datetime.strptime(parametros['data_fim'], '%Y-%m-%d')
+    periodo = f"Período: {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"
+    dados = consultar_saidas(parametros['escola_id'], parametros['data_inicio'], parametros['data_fim'])
+    gerar_pdf_saidas(titulo, periodo, dados, saida)
+
+
+def gerar_pdf_saidas(titulo, periodo, dados, saida):
+    """
+    Função que gera o PDF do relatório de saídas.
+    """
+    linhas = (
+        [
+            item.data_movimento.strftime('%d/%m/%Y %H:%M'),
+            item.nome,
+            f"{item.quantidade} {item.unidade_medida}",
+        ]
+        for item in dados
+    )
+    desenhar_tabela_pdf(
+        saida, titulo,
+        [Coluna('Data/Hora da Saída', 5), Coluna('Produto', 8), Coluna('Quantidade', 4)],
+        linhas,
+        subtitulo=periodo,
+        cabecalho=cabecalho_moderno("Relatório de Saídas"),
+        fundo_linhas=colors.beige,
+        fecho=["________________________________________", "Responsável pelo Almoxarifado"],
+    )
     
     
 @merenda_bp.route('/relatorios/consumo-mensal', methods=['GET'])
@@ -622,27 +597,13 @@ def relatorio_consolidado_mensal():
     ano_selecionado = request.args.get('ano', hoje.year, type=int)
     gerar_pdf = request.args.get('gerar_pdf')
 
-    # Define o primeiro e o último dia do mês selecionado
-    primeiro_dia = date(ano_selecionado, mes_selecionado, 1)
-    ultimo_dia = date(ano_selecionado, mes_selecionado, calendar.monthrange(ano_selecionado, mes_selecionado)[1])
-    
-    # Busca e agrupa os dados de saída para o mês inteiro
-    resultados = db.session.query(
-            ProdutoMerenda.nome,
-            ProdutoMerenda.unidade_medida,
-            func.sum(EstoqueMovimento.quantidade).label('total_quantidade')
-        ).join(ProdutoMerenda).filter(
-            EstoqueMovimento.tipo == 'Saída',
-            func.date(EstoqueMovimento.data_movimento).between(primeiro_dia, ultimo_dia)
-        ).group_by(ProdutoMerenda.nome, ProdutoMerenda.unidade_medida)\
-         .order_by(ProdutoMerenda.nome).all()
-
-    # Se o botão de PDF foi clicado, chama a função que gera o PDF
+    # Se o botão de PDF foi clicado, o PDF é gerado em segundo plano (tarefas_pdf.py)
     if gerar_pdf:
-        titulo = "Relatório Consolidado de Consumo Mensal"
-        periodo = f"Mês/Ano: {mes_selecionado:02d}/{ano_selecionado}"
-        return gerar_pdf_consolidado(titulo, periodo, resultados)
-    
+        spec = especificacao('merenda_consolidado', ano=ano_selecionado, mes=mes_selecionado)
+        return resposta_pdf(spec, 'relatorio_consolidado_mensal.pdf')
+
+    resultados = consultar_consolidado(ano_selecionado, mes_selecionado).all()
+
     # Gera uma lista de meses e anos para os filtros do formulário
     meses_pt = {
         1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril", 5: "Maio", 6: "Junho",
@@ -659,61 +620,43 @@ def relatorio_consolidado_mensal():
 
 
 
-def gerar_pdf_consolidado(titulo, periodo, dados):
+def consultar_consolidado(ano, mes):
     """
-    Função que gera o PDF do relatório consolidado mensal.
+    Saídas do mês agrupadas por produto.
     """
-    from .utils import cabecalho_e_rodape_moderno
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.enums import TA_CENTER
-    from reportlab.lib import colors
-    from reportlab.lib.units import cm
-    from flask import make_response
-    import io
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=3*cm, bottomMargin=2*cm)
-    
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
+    # Define o primeiro e o último dia do mês selecionado
+    primeiro_dia = date(ano, mes, 1)
+    ultimo_dia = date(ano, mes, calendar.monthrange(ano, mes)[1])
 
-    story = []
-    
-    story.append(Paragraph(titulo, styles['h1']))
-    story.append(Paragraph(periodo, styles['Center']))
-    story.append(Spacer(1, 1*cm))
+    # Busca e agrupa os dados de saída para o mês inteiro
+    return db.session.query(
+            ProdutoMerenda.nome,
+            ProdutoMerenda.unidade_medida,
+            func.sum(EstoqueMovimento.quantidade).label('total_quantidade')
+        ).join(ProdutoMerenda).filter(
+            EstoqueMovimento.tipo == 'Saída',
+            func.date(EstoqueMovimento.data_movimento).between(primeiro_dia, ultimo_dia)
+        ).group_by(ProdutoMerenda.nome, ProdutoMerenda.unidade_medida)\
+         .order_by(ProdutoMerenda.nome)
 
-    # Prepara os dados da tabela
-    table_data = [['Produto', 'Quantidade Total Consumida']]
-    
-    for item in dados:
-        quantidade_formatada = f"{item.total_quantidade:.2f} {item.unidade_medida}"
-        table_data.append([item.nome, quantidade_formatada])
-
-    # Cria a tabela
-    t = Table(table_data, colWidths=[12*cm, 5*cm])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004d40')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(t)
-    
-    doc.build(story, onFirstPage=lambda canvas, doc: cabecalho_e_rodape_moderno(canvas, doc, "Relatório Consolidado"), 
-                     onLaterPages=lambda canvas, doc: cabecalho_e_rodape_moderno(canvas, doc, "Relatório Consolidado"))
-    
-    buffer.seek(0)
-    
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'inline; filename=relatorio_consolidado_mensal.pdf'
-    
-    return response
\ No newline at end of file
+
+@relatorio_pdf('merenda_consolidado', ['estoque_movimento', 'produto_merenda'], papeis=['Merenda Escolar'])
+def pdf_consolidado(parametros, saida):
+    titulo = "Relatório Consolidado de Consumo Mensal"
+    periodo = f"Mês/Ano: {parametros['mes']:02d}/{parametros['ano']}"
+    gerar_pdf_consolidado(titulo, periodo, consultar_consolidado(parametros['ano'], parametros['mes']), saida)
+
+
+def gerar_pdf_consolidado(titulo, periodo, dados, saida):
+    """
+    Função que gera o PDF do relatório consolidado mensal.
+    """
+    linhas = ([item.nome, f"{item.total_quantidade:.2f} {item.unidade_medida}"] for item in dados)
+    desenhar_tabela_pdf(
+        saida, titulo,
+        [Coluna('Produto', 12), Coluna('Quantidade Total Consumida', 5)],
+        linhas,
+        subtitulo=periodo,
+        cabecalho=cabecalho_moderno("Relatório Consolidado"),
+        fundo_linhas=colors.beige,
+    )
\ No newline at end of file
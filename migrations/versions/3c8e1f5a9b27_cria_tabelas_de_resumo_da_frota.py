@@ -0,0 +1,122 @@
+"""Cria tabelas de resumo da frota (totais por veiculo e por mes)
+
+Revision ID: 3c8e1f5a9b27
+Revises: a509493719df
+Create Date: 2025-09-22 09:14:37.512406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e1f5a9b27'
+down_revision = 'a509493719df'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resumo_veiculo',
+    sa.Column('veiculo_placa', sa.String(length=10), nullable=False),
+    sa.Column('qtd_abastecimentos', sa.Integer(), nullable=False),
+    sa.Column('total_litros', sa.Float(), nullable=False),
+    sa.Column('gasto_combustivel', sa.Float(), nullable=False),
+    sa.Column('qtd_manutencoes', sa.Integer(), nullable=False),
+    sa.Column('gasto_manutencao', sa.Float(), nullable=False),
+    sa.Column('km_inicial', sa.Float(), nullable=True),
+    sa.Column('km_final', sa.Float(), nullable=True),
+    sa.Column('litros_ultimo', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['veiculo_placa'], ['veiculo.placa'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('veiculo_placa')
+    )
+    op.create_table('resumo_veiculo_mensal',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('veiculo_placa', sa.String(length=10), nullable=False),
+    sa.Column('ano', sa.Integer(), nullable=False),
+    sa.Column('mes', sa.Integer(), nullable=False),
+    sa.Column('qtd_abastecimentos', sa.Integer(), nullable=False),
+    sa.Column('litros', sa.Float(), nullable=False),
+    sa.Column('gasto_combustivel', sa.Float(), nullable=False),
+    sa.Column('gasto_manutencao', sa.Float(), nullable=False),
+    sa.Column('km_min', sa.Float(), nullable=True),
+    sa.Column('km_max', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['veiculo_placa'], ['veiculo.placa'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('veiculo_placa', 'ano', 'mes', name='_veiculo_ano_mes_uc')
+    )
+    # Resumos do histórico já existente; daqui em diante os eventos de resumo_frota.py
+    # somam cada abastecimento/manutenção. Mesmo resultado do 'flask recalcular-resumo-frota',
+    # mas sem importar o código da aplicação, que muda depois desta revisão.
+    _preencher_resumos(op.get_bind())
+
+
+def _preencher_resumos(bind):
+    veiculo = sa.table('veiculo', sa.column('placa'))
+    abastecimento = sa.table(
+        'abastecimento', sa.column('id'), sa.column('veiculo_placa'), sa.column('data'),
+        sa.column('quilometragem'), sa.column('litros'), sa.column('valor_total'),
+    )
+    manutencao = sa.table('manutencao', sa.column('veiculo_placa'), sa.column('data'), sa.column('custo'))
+
+    def do_veiculo(tabela):
+        return tabela.c.veiculo_placa == veiculo.c.placa
+
+    def escalar(coluna, tabela):
+        return sa.select(coluna).where(do_veiculo(tabela)).scalar_subquery()
+
+    colunas = ['veiculo_placa', 'qtd_abastecimentos', 'total_litros', 'gasto_combustivel',
+               'qtd_manutencoes', 'gasto_manutencao', 'km_inicial', 'km_final', 'litros_ultimo']
+    bind.execute(sa.table('resumo_veiculo', *map(sa.column, colunas)).insert().from_select(
+        colunas,
+        sa.select(
+            veiculo.c.placa,
+            escalar(sa.func.count(), abastecimento),
+            escalar(sa.func.coalesce(sa.func.sum(abastecimento.c.litros), 0.0), abastecimento),
+            escalar(sa.func.coalesce(sa.func.sum(abastecimento.c.valor_total), 0.0), abastecimento),
+            escalar(sa.func.count(), manutencao),
+            escalar(sa.func.coalesce(sa.func.sum(manutencao.c.custo), 0.0), manutencao),
+            escalar(sa.func.min(abastecimento.c.quilometragem), abastecimento),
+            escalar(sa.func.max(abastecimento.c.quilometragem), abastecimento),
+            sa.select(abastecimento.c.litros).where(do_veiculo(abastecimento))
+            .order_by(abastecimento.c.quilometragem.desc(), abastecimento.c.id.desc())
+            .limit(1).scalar_subquery(),
+        ),
+    ))
+
+    def mes_de(tabela):
+        return (
+            sa.cast(sa.extract('year', tabela.c.data), sa.Integer).label('ano'),
+            sa.cast(sa.extract('month', tabela.c.data), sa.Integer).label('mes'),
+        )
+
+    # Abastecimentos e manutenções na mesma lista, agrupados por veículo e mês
+    lancamentos = sa.union_all(
+        sa.select(
+            abastecimento.c.veiculo_placa, *mes_de(abastecimento),
+            sa.literal(1).label('qtd'), abastecimento.c.litros.label('litros'),
+            abastecimento.c.valor_total.label('combustivel'), sa.literal(0.0).label('manutencao'),
+            abastecimento.c.quilometragem.label('km'),
+        ),
+        sa.select(
+            manutencao.c.veiculo_placa, *mes_de(manutencao),
+            sa.literal(0), sa.literal(0.0), sa.literal(0.0), manutencao.c.custo,
+            sa.null(),
+        ),
+    ).subquery('lancamentos')
+    colunas = ['veiculo_placa', 'ano', 'mes', 'qtd_abastecimentos', 'litros', 'gasto_combustivel',
+               'gasto_manutencao', 'km_min', 'km_max']
+    bind.execute(sa.table('resumo_veiculo_mensal', *map(sa.column, colunas)).insert().from_select(
+        colunas,
+        sa.select(
+            lancamentos.c.veiculo_placa, lancamentos.c.ano, lancamentos.c.mes,
+            sa.func.sum(lancamentos.c.qtd), sa.func.sum(lancamentos.c.litros),
+            sa.func.sum(lancamentos.c.combustivel), sa.func.sum(lancamentos.c.manutencao),
+            sa.func.min(lancamentos.c.km), sa.func.max(lancamentos.c.km),
+        ).group_by(lancamentos.c.veiculo_placa, lancamentos.c.ano, lancamentos.c.mes),
+    ))
+
+
+def downgrade():
+    op.drop_table('resumo_veiculo_mensal')
+    op.drop_table('resumo_veiculo')
@@ -0,0 +1,42 @@
+"""Adiciona indices das consultas frequentes
+
+Revision ID: 5e0a7c3d2b81
+Revises: 7d2b94e0c6f1
+Create Date: 2025-09-24 10:41:19.630275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0a7c3d2b81'
+down_revision = '7d2b94e0c6f1'
+branch_labels = None
+depends_on = None
+
+
+# (nome do índice, tabela, colunas) - conferidos com 'flask verificar-indices'
+INDICES = [
+    ('ix_abastecimento_placa_data', 'abastecimento', ['veiculo_placa', 'data']),
+    ('ix_abastecimento_placa_km', 'abastecimento', ['veiculo_placa', 'quilometragem']),
+    ('ix_manutencao_placa_data', 'manutencao', ['veiculo_placa', 'data']),
+    ('ix_veiculo_secretaria_id', 'veiculo', ['secretaria_id']),
+    ('ix_servidor_secretaria_id', 'servidor', ['secretaria_id']),
+    ('ix_ponto_servidor_timestamp', 'ponto', ['servidor_cpf', 'timestamp']),
+    ('ix_ponto_escola_timestamp', 'ponto', ['escola_id', 'timestamp']),
+    ('ix_estoque_movimento_tipo_data', 'estoque_movimento', ['tipo', 'data_movimento']),
+    ('ix_protocolo_data_criacao', 'protocolo', ['data_criacao']),
+    ('ix_log_timestamp', 'log', ['timestamp']),
+    ('ix_requerimento_status_data_inicio', 'requerimento', ['status', 'data_inicio_requerimento']),
+]
+
+
+def upgrade():
+    for nome, tabela, colunas in INDICES:
+        op.create_index(nome, tabela, colunas, unique=False)
+
+
+def downgrade():
+    for nome, tabela, colunas in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela)
@@ -0,0 +1,75 @@
+"""Cria tabela painel_indicador (indicadores do dashboard por secretaria)
+
+Revision ID: 7d2b94e0c6f1
+Revises: 3c8e1f5a9b27
+Create Date: 2025-09-23 15:02:48.227931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b94e0c6f1'
+down_revision = '3c8e1f5a9b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('painel_indicador',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('secretaria_id', sa.Integer(), nullable=False),
+    sa.Column('indicador', sa.String(length=20), nullable=False),
+    sa.Column('ano', sa.Integer(), nullable=False),
+    sa.Column('mes', sa.Integer(), nullable=False),
+    sa.Column('rotulo', sa.String(length=100), nullable=False),
+    sa.Column('quantidade', sa.Integer(), nullable=False),
+    sa.Column('soma', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('secretaria_id', 'indicador', 'ano', 'mes', 'rotulo', name='_painel_indicador_uc')
+    )
+    # Indicadores do histórico já existente; daqui em diante os eventos de
+    # painel_indicadores.py mantêm a tabela. Mesmo resultado do 'flask recalcular-painel',
+    # mas sem importar o código da aplicação, que muda depois desta revisão.
+    _preencher_painel(op.get_bind())
+
+
+def _preencher_painel(bind):
+    colunas = ['secretaria_id', 'indicador', 'ano', 'mes', 'rotulo', 'quantidade', 'soma']
+    painel = sa.table('painel_indicador', *map(sa.column, colunas))
+    servidor = sa.table(
+        'servidor', sa.column('secretaria_id'), sa.column('funcao'),
+        sa.column('lotacao'), sa.column('remuneracao'),
+    )
+    veiculo = sa.table('veiculo', sa.column('placa'), sa.column('secretaria_id'))
+    abastecimento = sa.table(
+        'abastecimento', sa.column('id'), sa.column('veiculo_placa'), sa.column('data'), sa.column('litros'),
+    )
+    secretaria = sa.func.coalesce(servidor.c.secretaria_id, 0)
+
+    def agrupar(indicador, soma, rotulo=None, *filtros):
+        agrupamento = [secretaria] if rotulo is None else [secretaria, rotulo]
+        bind.execute(painel.insert().from_select(colunas, sa.select(
+            secretaria, sa.literal(indicador), sa.literal(0), sa.literal(0),
+            rotulo if rotulo is not None else sa.literal(''),
+            sa.func.count(), sa.func.coalesce(soma, 0.0),
+        ).where(*filtros).group_by(*agrupamento)))
+
+    agrupar('servidores', sa.literal(0.0))
+    agrupar('remuneracao', sa.func.sum(servidor.c.remuneracao), None, servidor.c.remuneracao.isnot(None))
+    agrupar('funcao', sa.literal(0.0), sa.func.coalesce(servidor.c.funcao, ''))
+    agrupar('lotacao', sa.literal(0.0), sa.func.coalesce(servidor.c.lotacao, ''))
+
+    ano = sa.cast(sa.extract('year', abastecimento.c.data), sa.Integer)
+    mes = sa.cast(sa.extract('month', abastecimento.c.data), sa.Integer)
+    bind.execute(painel.insert().from_select(colunas, sa.select(
+        sa.func.coalesce(veiculo.c.secretaria_id, 0), sa.literal('litros'), ano, mes, sa.literal(''),
+        sa.func.count(abastecimento.c.id), sa.func.coalesce(sa.func.sum(abastecimento.c.litros), 0.0),
+    ).select_from(abastecimento)
+        .join(veiculo, veiculo.c.placa == abastecimento.c.veiculo_placa)
+        .group_by(veiculo.c.secretaria_id, ano, mes)))
+
+
+def downgrade():
+    op.drop_table('painel_indicador')
@@ -0,0 +1,25 @@
+"""Indice de status do protocolo
+
+Revision ID: a9d3e5f7b1c4
+Revises: f8c2d4e6a1b3
+Create Date: 2025-10-06 09:18:44.120573
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e5f7b1c4'
+down_revision = 'f8c2d4e6a1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O GROUP BY status do dashboard (contagem_status.py) lê só o índice
+    op.create_index('ix_protocolo_status', 'protocolo', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_protocolo_status', table_name='protocolo')
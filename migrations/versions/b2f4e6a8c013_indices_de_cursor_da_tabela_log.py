@@ -0,0 +1,29 @@
+"""Indices de cursor da tabela log
+
+Revision ID: b2f4e6a8c013
+Revises: 5e0a7c3d2b81
+Create Date: 2025-09-26 15:12:07.418302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f4e6a8c013'
+down_revision = '5e0a7c3d2b81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (timestamp, id) é a chave da paginação por cursor da tela de logs
+    op.drop_index('ix_log_timestamp', table_name='log')
+    op.create_index('ix_log_timestamp_id', 'log', ['timestamp', 'id'], unique=False)
+    op.create_index('ix_log_username_timestamp_id', 'log', ['username', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_log_username_timestamp_id', table_name='log')
+    op.drop_index('ix_log_timestamp_id', table_name='log')
+    op.create_index('ix_log_timestamp', 'log', ['timestamp'], unique=False)
@@ -0,0 +1,106 @@
+"""Cria tabela permanencia_setor
+
+Revision ID: b6e2f4a8c0d3
+Revises: a9d3e5f7b1c4
+Create Date: 2025-10-07 10:42:09.517306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e2f4a8c0d3'
+down_revision = 'a9d3e5f7b1c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_tramitacao_protocolo_id_data_envio', 'tramitacao', ['protocolo_id', 'data_envio'], unique=False)
+    op.create_table('permanencia_setor',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('protocolo_id', sa.Integer(), nullable=False),
+    sa.Column('setor', sa.String(length=150), nullable=False),
+    sa.Column('entrada', sa.DateTime(), nullable=False),
+    sa.Column('saida', sa.DateTime(), nullable=True),
+    sa.Column('segundos', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['protocolo_id'], ['protocolo.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_permanencia_setor_protocolo_id', 'permanencia_setor', ['protocolo_id'], unique=False)
+    op.create_index('ix_permanencia_setor_saida_entrada', 'permanencia_setor', ['saida', 'entrada'], unique=False)
+
+    # Histórico: passagens calculadas com LEAD() sobre as tramitações já existentes.
+    # Mesmo resultado do 'flask recalcular-permanencias', mas sem importar o código
+    # da aplicação, que muda depois desta revisão.
+    _preencher_permanencias(op.get_bind())
+
+
+def _preencher_permanencias(bind):
+    protocolo = sa.table(
+        'protocolo', sa.column('id'), sa.column('setor_origem'),
+        sa.column('data_criacao'), sa.column('status'),
+    )
+    tramitacao = sa.table(
+        'tramitacao', sa.column('id'), sa.column('protocolo_id'),
+        sa.column('setor_destino'), sa.column('data_envio'),
+    )
+    colunas = ['protocolo_id', 'setor', 'entrada', 'saida', 'segundos']
+    permanencia = sa.table('permanencia_setor', *map(sa.column, colunas))
+    mudanca_status = 'N/A (Mudança de Status)'
+
+    def segundos_entre(inicio, fim):
+        if bind.dialect.name == 'postgresql':
+            return sa.cast(sa.extract('epoch', fim - inicio), sa.Integer)
+        return sa.cast(sa.func.round((sa.func.julianday(fim) - sa.func.julianday(inicio)) * 86400), sa.Integer)
+
+    chegadas = sa.union_all(
+        sa.select(
+            protocolo.c.id.label('protocolo_id'), protocolo.c.setor_origem.label('setor'),
+            protocolo.c.data_criacao.label('entrada'), sa.literal(0).label('ordem'),
+        ),
+        sa.select(
+            tramitacao.c.protocolo_id, tramitacao.c.setor_destino,
+            tramitacao.c.data_envio, tramitacao.c.id,
+        ).where(tramitacao.c.setor_destino != mudanca_status),
+    ).subquery('chegadas')
+    passagens = sa.select(
+        chegadas.c.protocolo_id, chegadas.c.setor, chegadas.c.entrada,
+        sa.func.lead(chegadas.c.entrada).over(
+            partition_by=chegadas.c.protocolo_id, order_by=(chegadas.c.entrada, chegadas.c.ordem),
+        ).label('saida'),
+    ).where(chegadas.c.entrada.is_not(None)).subquery('passagens')
+    bind.execute(permanencia.insert().from_select(colunas, sa.select(
+        passagens.c.protocolo_id, passagens.c.setor, passagens.c.entrada, passagens.c.saida,
+        segundos_entre(passagens.c.entrada, passagens.c.saida),
+    )))
+
+    # Finalizados/cancelados: a passagem que ficou aberta termina na última mudança de status
+    ultima_mudanca = (
+        sa.select(sa.func.max(tramitacao.c.data_envio))
+        .where(
+            tramitacao.c.protocolo_id == permanencia.c.protocolo_id,
+            tramitacao.c.setor_destino == mudanca_status,
+            tramitacao.c.data_envio >= permanencia.c.entrada,
+        )
+        .scalar_subquery()
+    )
+    encerrados = sa.select(protocolo.c.id).where(protocolo.c.status.in_(['Finalizado', 'Cancelado']))
+    bind.execute(
+        permanencia.update()
+        .where(permanencia.c.saida.is_(None), permanencia.c.protocolo_id.in_(encerrados))
+        .values(saida=sa.func.coalesce(ultima_mudanca, permanencia.c.entrada))
+    )
+    bind.execute(
+        permanencia.update()
+        .where(permanencia.c.saida.is_not(None), permanencia.c.segundos.is_(None))
+        .values(segundos=segundos_entre(permanencia.c.entrada, permanencia.c.saida))
+    )
+
+
+def downgrade():
+    op.drop_index('ix_permanencia_setor_saida_entrada', table_name='permanencia_setor')
+    op.drop_index('ix_permanencia_setor_protocolo_id', table_name='permanencia_setor')
+    op.drop_table('permanencia_setor')
+    op.drop_index('ix_tramitacao_protocolo_id_data_envio', table_name='tramitacao')
@@ -0,0 +1,25 @@
+"""Indice de data da tabela ponto
+
+Revision ID: c3e5a7b9d1f4
+Revises: b6e2f4a8c0d3
+Create Date: 2025-10-08 14:05:31.862417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d1f4'
+down_revision = 'b6e2f4a8c0d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O painel de frequência filtra os pontos só pelo período (últimos 7 dias, hoje)
+    op.create_index('ix_ponto_timestamp', 'ponto', ['timestamp'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_ponto_timestamp', table_name='ponto')
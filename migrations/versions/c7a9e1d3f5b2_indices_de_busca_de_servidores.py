@@ -0,0 +1,85 @@
+"""Indices de busca de servidores
+
+Revision ID: c7a9e1d3f5b2
+Revises: b2f4e6a8c013
+Create Date: 2025-09-29 11:26:53.904117
+
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a9e1d3f5b2'
+down_revision = 'b2f4e6a8c013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        # unaccent() não é IMMUTABLE; o invólucro permite usá-la em índice
+        op.execute(
+            "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+            "AS $$ SELECT public.unaccent('public.unaccent', $1) $$"
+        )
+        op.execute(
+            'CREATE INDEX ix_servidor_nome_trgm ON servidor '
+            'USING gin (f_unaccent(lower(nome)) gin_trgm_ops)'
+        )
+        op.execute(
+            "CREATE INDEX ix_servidor_cpf_digitos_trgm ON servidor "
+            "USING gin (regexp_replace(cpf, '[^0-9]', '', 'g') gin_trgm_ops)"
+        )
+        op.execute(
+            'CREATE INDEX ix_servidor_num_contrato_trgm ON servidor '
+            'USING gin (num_contrato gin_trgm_ops)'
+        )
+    elif bind.dialect.name == 'sqlite':
+        # Preenchida aqui e mantida pelos eventos de busca_servidores.py; os documentos
+        # seguem o mesmo formato do 'flask recriar-busca-servidores'
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS servidor_busca USING fts5("
+            "num_contrato UNINDEXED, nome, documentos, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS servidor_busca_vocab USING fts5vocab(servidor_busca, col)")
+        _preencher_busca(bind)
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+def _preencher_busca(bind):
+    servidor = sa.table('servidor', sa.column('num_contrato'), sa.column('nome'), sa.column('cpf'))
+    busca = sa.table('servidor_busca', sa.column('num_contrato'), sa.column('nome'), sa.column('documentos'))
+    linhas = [
+        {
+            'num_contrato': num_contrato,
+            'nome': _normalizar(nome),
+            'documentos': ' '.join(filter(None, [cpf, re.sub(r'\D', '', cpf or ''), num_contrato])),
+        }
+        for num_contrato, nome, cpf in bind.execute(sa.select(servidor))
+    ]
+    if linhas:
+        bind.execute(busca.insert(), linhas)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_servidor_num_contrato_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_servidor_cpf_digitos_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_servidor_nome_trgm')
+        op.execute('DROP FUNCTION IF EXISTS f_unaccent(text)')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS servidor_busca_vocab')
+        op.execute('DROP TABLE IF EXISTS servidor_busca')
@@ -0,0 +1,29 @@
+"""Cria tabela versao_dados (versão dos dados dos PDFs em cache)
+
+Revision ID: d4b8f2a6c9e1
+Revises: c7a9e1d3f5b2
+Create Date: 2025-09-30 09:41:53.806214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8f2a6c9e1'
+down_revision = 'c7a9e1d3f5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('versao_dados',
+    sa.Column('tabela', sa.String(length=50), nullable=False),
+    sa.Column('versao', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('tabela')
+    )
+    # As linhas são criadas na primeira alteração de cada tabela (tarefas_pdf.py)
+
+
+def downgrade():
+    op.drop_table('versao_dados')
@@ -0,0 +1,47 @@
+"""Cria tabela sequencia (contadores de protocolo e contrato)
+
+Revision ID: e5a1c3b7d9f2
+Revises: d4b8f2a6c9e1
+Create Date: 2025-10-02 10:12:37.519804
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c3b7d9f2'
+down_revision = 'd4b8f2a6c9e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    sequencia = op.create_table('sequencia',
+    sa.Column('escopo', sa.String(length=50), nullable=False),
+    sa.Column('ultimo', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('escopo')
+    )
+
+    # Os contadores partem do maior número já emitido em cada mês/ano (mesma regra
+    # de utils.ajustar_sequencias, copiada para não depender do código da aplicação)
+    bind = op.get_bind()
+    ultimos = {}
+    for (numero,) in bind.execute(sa.text("SELECT numero_protocolo FROM protocolo")):
+        encontrado = re.fullmatch(r"(\d{4})-(\d{2})-(\d+)", numero or "")
+        if encontrado:
+            escopo = f"protocolo:{encontrado.group(1)}-{encontrado.group(2)}"
+            ultimos[escopo] = max(ultimos.get(escopo, 0), int(encontrado.group(3)))
+    for numero, ano in bind.execute(sa.text("SELECT numero, ano FROM contrato")):
+        encontrado = re.fullmatch(r"(\d+)/\d{4}", numero or "")
+        if encontrado:
+            escopo = f"contrato:{ano}"
+            ultimos[escopo] = max(ultimos.get(escopo, 0), int(encontrado.group(1)))
+    if ultimos:
+        op.bulk_insert(sequencia, [{"escopo": escopo, "ultimo": ultimo} for escopo, ultimo in ultimos.items()])
+
+
+def downgrade():
+    op.drop_table('sequencia')
@@ -0,0 +1,55 @@
+"""Indices da lista de protocolos
+
+Revision ID: f8c2d4e6a1b3
+Revises: e5a1c3b7d9f2
+Create Date: 2025-10-03 14:05:21.338190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8c2d4e6a1b3'
+down_revision = 'e5a1c3b7d9f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (data_criacao, id) é a chave da paginação por cursor; substitui o índice só de data
+    op.create_index('ix_protocolo_data_criacao_id', 'protocolo', ['data_criacao', 'id'], unique=False)
+    op.drop_index('ix_protocolo_data_criacao', table_name='protocolo')
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for coluna in ('numero_protocolo', 'interessado', 'assunto'):
+            op.execute(
+                f'CREATE INDEX ix_protocolo_{coluna}_trgm ON protocolo '
+                f'USING gin ({coluna} gin_trgm_ops)'
+            )
+    elif bind.dialect.name == 'sqlite':
+        # Preenchida aqui (rowid = id do protocolo, como no 'flask recriar-busca-protocolos')
+        # e mantida pelos eventos de consulta_protocolos.py
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS protocolo_busca USING fts5("
+            "numero_protocolo, interessado, assunto, tokenize = 'trigram')"
+        )
+        op.execute(
+            "INSERT INTO protocolo_busca (rowid, numero_protocolo, interessado, assunto) "
+            "SELECT id, COALESCE(numero_protocolo, ''), COALESCE(interessado, ''), COALESCE(assunto, '') "
+            "FROM protocolo"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for coluna in ('numero_protocolo', 'interessado', 'assunto'):
+            op.execute(f'DROP INDEX IF EXISTS ix_protocolo_{coluna}_trgm')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS protocolo_busca')
+
+    op.create_index('ix_protocolo_data_criacao', 'protocolo', ['data_criacao'], unique=False)
+    op.drop_index('ix_protocolo_data_criacao_id', table_name='protocolo')
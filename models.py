@@ -14,6 +14,11 @@ class Log(db.Model):
     action = db.Column(db.String(255), nullable=False)
     ip_address = db.Column(db.String(45))
 
+    __table_args__ = (
+        db.Index("ix_log_timestamp_id", "timestamp", "id"),
+        db.Index("ix_log_username_timestamp_id", "username", "timestamp", "id"),
+    )
+
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -68,6 +73,10 @@ class Servidor(db.Model):
         "Documento", backref="servidor", lazy=True, cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        db.Index("ix_servidor_secretaria_id", "secretaria_id"),
+    )
+
 
 class Veiculo(db.Model):
     placa = db.Column(db.String(10), primary_key=True)
@@ -96,6 +105,10 @@ class Veiculo(db.Model):
     data_emissao_tacografo = db.Column(db.Date, nullable=True)
     validade_tacografo = db.Column(db.Date, nullable=True)
 
+    __table_args__ = (
+        db.Index("ix_veiculo_secretaria_id", "secretaria_id"),
+    )
+
 
 class Abastecimento(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -116,6 +129,11 @@ class Abastecimento(db.Model):
         "Motorista", backref=db.backref("abastecimentos", lazy=True)
     )
 
+    __table_args__ = (
+        db.Index("ix_abastecimento_placa_data", "veiculo_placa", "data"),
+        db.Index("ix_abastecimento_placa_km", "veiculo_placa", "quilometragem"),
+    )
+
 
 class Manutencao(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -129,6 +147,90 @@ class Manutencao(db.Model):
         db.String(10), db.ForeignKey("veiculo.placa"), nullable=False
     )
 
+    __table_args__ = (
+        db.Index("ix_manutencao_placa_data", "veiculo_placa", "data"),
+    )
+
+
+class ResumoVeiculo(db.Model):
+    """Totais acumulados de cada veículo, atualizados a cada abastecimento/manutenção (ver resumo_frota.py)."""
+    __tablename__ = "resumo_veiculo"
+    veiculo_placa = db.Column(
+        db.String(10), db.ForeignKey("veiculo.placa", ondelete="CASCADE"), primary_key=True
+    )
+    qtd_abastecimentos = db.Column(db.Integer, nullable=False, default=0)
+    total_litros = db.Column(db.Float, nullable=False, default=0.0)
+    gasto_combustivel = db.Column(db.Float, nullable=False, default=0.0)
+    qtd_manutencoes = db.Column(db.Integer, nullable=False, default=0)
+    gasto_manutencao = db.Column(db.Float, nullable=False, default=0.0)
+    km_inicial = db.Column(db.Float, nullable=True)  # Menor odômetro registrado
+    km_final = db.Column(db.Float, nullable=True)  # Último (maior) odômetro registrado
+    litros_ultimo = db.Column(db.Float, nullable=True)  # Litros do abastecimento de maior km (fica fora da média)
+
+
+class ResumoVeiculoMensal(db.Model):
+    __tablename__ = "resumo_veiculo_mensal"
+    id = db.Column(db.Integer, primary_key=True)
+    veiculo_placa = db.Column(
+        db.String(10), db.ForeignKey("veiculo.placa", ondelete="CASCADE"), nullable=False
+    )
+    ano = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+    qtd_abastecimentos = db.Column(db.Integer, nullable=False, default=0)
+    litros = db.Column(db.Float, nullable=False, default=0.0)
+    gasto_combustivel = db.Column(db.Float, nullable=False, default=0.0)
+    gasto_manutencao = db.Column(db.Float, nullable=False, default=0.0)
+    km_min = db.Column(db.Float, nullable=True)
+    km_max = db.Column(db.Float, nullable=True)
+
+    # Um registro por veículo em cada mês/ano
+    __table_args__ = (
+        db.UniqueConstraint("veiculo_placa", "ano", "mes", name="_veiculo_ano_mes_uc"),
+    )
+
+
+
+class PainelIndicador(db.Model):
+    """
+    Indicadores do dashboard já agregados por secretaria (ver painel_indicadores.py).
+    'indicador' diz o que a linha guarda: servidores, remuneracao, funcao, lotacao ou litros.
+    ano/mes ficam 0 nos indicadores sem período; 'rotulo' é a função/lotação (ou vazio).
+    """
+    __tablename__ = "painel_indicador"
+    id = db.Column(db.Integer, primary_key=True)
+    secretaria_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = sem secretaria
+    indicador = db.Column(db.String(20), nullable=False)
+    ano = db.Column(db.Integer, nullable=False, default=0)
+    mes = db.Column(db.Integer, nullable=False, default=0)
+    rotulo = db.Column(db.String(100), nullable=False, default="")
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    soma = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "secretaria_id", "indicador", "ano", "mes", "rotulo", name="_painel_indicador_uc"
+        ),
+    )
+
+class VersaoDados(db.Model):
+    """
+    Contador de alterações por tabela, usado como "versão dos dados" na chave dos
+    PDFs em cache (tarefas_pdf.py): cada flush que grava na tabela soma 1.
+    """
+    __tablename__ = "versao_dados"
+    tabela = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Sequencia(db.Model):
+    """
+    Último número emitido em cada sequência (ex.: "protocolo:2025-09",
+    "contrato:2025"). Incrementado por utils.proximo_numero.
+    """
+    __tablename__ = "sequencia"
+    escopo = db.Column(db.String(50), primary_key=True)
+    ultimo = db.Column(db.Integer, nullable=False, default=0)
+
 
 class Requerimento(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -152,6 +254,10 @@ class Requerimento(db.Model):
     data_criacao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     status = db.Column(db.String(50), nullable=False, default="Em Análise")
 
+    __table_args__ = (
+        db.Index("ix_requerimento_status_data_inicio", "status", "data_inicio_requerimento"),
+    )
+
 
 class Nota(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -199,6 +305,12 @@ class Ponto(db.Model):
     )
     escola = db.relationship("Escola", backref=db.backref("pontos", lazy=True))
 
+    __table_args__ = (
+        db.Index("ix_ponto_servidor_timestamp", "servidor_cpf", "timestamp"),
+        db.Index("ix_ponto_escola_timestamp", "escola_id", "timestamp"),
+        db.Index("ix_ponto_timestamp", "timestamp"),
+    )
+
 
 class RotaTransporte(db.Model):
     __tablename__ = "rota_transporte"
@@ -297,6 +409,13 @@ class Protocolo(db.Model):
         "Anexo", backref="protocolo", lazy=True, cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        # (data_criacao, id) é a chave da paginação por cursor da lista de protocolos
+        db.Index("ix_protocolo_data_criacao_id", "data_criacao", "id"),
+        # Contagem por status do dashboard (GROUP BY só no índice)
+        db.Index("ix_protocolo_status", "status"),
+    )
+
 
 class Tramitacao(db.Model):
     __tablename__ = "tramitacao"
@@ -308,6 +427,30 @@ class Tramitacao(db.Model):
     despacho = db.Column(db.Text, nullable=True)
     usuario_responsavel = db.Column(db.String(100))
 
+    __table_args__ = (
+        # Histórico de um protocolo em ordem (detalhes e recalculo das permanências)
+        db.Index("ix_tramitacao_protocolo_id_data_envio", "protocolo_id", "data_envio"),
+    )
+
+
+class PermanenciaSetor(db.Model):
+    """
+    Cada passagem de um protocolo por um setor: da chegada (abertura ou tramitação)
+    até a saída (próxima tramitação ou encerramento). Mantida por permanencia_setores.py.
+    """
+    __tablename__ = "permanencia_setor"
+    id = db.Column(db.Integer, primary_key=True)
+    protocolo_id = db.Column(db.Integer, db.ForeignKey("protocolo.id"), nullable=False, index=True)
+    setor = db.Column(db.String(150), nullable=False)
+    entrada = db.Column(db.DateTime, nullable=False)
+    saida = db.Column(db.DateTime, nullable=True)  # None enquanto o protocolo está no setor
+    segundos = db.Column(db.Integer, nullable=True)  # saida - entrada, já calculado para as médias
+
+    __table_args__ = (
+        # Passagens abertas (saida IS NULL) por ordem de chegada e filtro de período
+        db.Index("ix_permanencia_setor_saida_entrada", "saida", "entrada"),
+    )
+
 
 class Anexo(db.Model):
     __tablename__ = "anexo"
@@ -455,6 +598,10 @@ class EstoqueMovimento(db.Model):
     produto = db.relationship("ProdutoMerenda", backref="movimentos")
     solicitacao = db.relationship("SolicitacaoMerenda")
 
+    __table_args__ = (
+        db.Index("ix_estoque_movimento_tipo_data", "tipo", "data_movimento"),
+    )
+
 
 class SolicitacaoMerenda(db.Model):
     __tablename__ = "solicitacao_merenda"
@@ -0,0 +1,210 @@
+# painel_indicadores.py
+# Indicadores do dashboard principal já agregados na tabela painel_indicador.
+# Os eventos abaixo somam/subtraem cada servidor e cada abastecimento no
+# indicador da sua secretaria, na mesma transação; o dashboard faz uma única leitura.
+
+from datetime import datetime
+
+from sqlalchemy import event, func, select, delete, inspect, literal
+
+from extensions import db
+from utils import upsert
+from models import Servidor, Abastecimento, Veiculo, PainelIndicador
+
+painel = PainelIndicador.__table__
+servidor = Servidor.__table__
+abastecimento = Abastecimento.__table__
+veiculo = Veiculo.__table__
+
+def _somar(connection, secretaria_id, indicador, quantidade, soma=0.0, ano=0, mes=0, rotulo=""):
+    chaves = {
+        "secretaria_id": secretaria_id or 0, "indicador": indicador,
+        "ano": ano, "mes": mes, "rotulo": (rotulo or "")[:100],
+    }
+    upsert(
+        connection, painel, chaves,
+        {"quantidade": quantidade, "soma": soma},
+        {"quantidade": painel.c.quantidade + quantidade, "soma": painel.c.soma + soma},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Servidores
+# ---------------------------------------------------------------------------
+
+def _aplicar_servidor(connection, secretaria_id, funcao, lotacao, remuneracao, sinal):
+    _somar(connection, secretaria_id, "servidores", sinal)
+    _somar(connection, secretaria_id, "funcao", sinal, rotulo=funcao)
+    _somar(connection, secretaria_id, "lotacao", sinal, rotulo=lotacao)
+    if remuneracao is not None:
+        # Só conta quem tem remuneração, como o AVG() do banco
+        _somar(connection, secretaria_id, "remuneracao", sinal, sinal * remuneracao)
+
+
+def _valor_anterior(estado, campo):
+    historico = estado.attrs[campo].history
+    return historico.deleted[0] if historico.deleted else getattr(estado.object, campo)
+
+
+CAMPOS_SERVIDOR = ("secretaria_id", "funcao", "lotacao", "remuneracao")
+
+
+@event.listens_for(Servidor, "after_insert")
+def _servidor_inserido(mapper, connection, target):
+    _aplicar_servidor(connection, *(getattr(target, c) for c in CAMPOS_SERVIDOR), 1)
+
+
+@event.listens_for(Servidor, "after_delete")
+def _servidor_excluido(mapper, connection, target):
+    _aplicar_servidor(connection, *(getattr(target, c) for c in CAMPOS_SERVIDOR), -1)
+
+
+@event.listens_for(Servidor, "after_update")
+def _servidor_editado(mapper, connection, target):
+    estado = inspect(target)
+    if not any(estado.attrs[c].history.has_changes() for c in CAMPOS_SERVIDOR):
+        return
+    _aplicar_servidor(connection, *(_valor_anterior(estado, c) for c in CAMPOS_SERVIDOR), -1)
+    _aplicar_servidor(connection, *(getattr(target, c) for c in CAMPOS_SERVIDOR), 1)
+
+
+# ---------------------------------------------------------------------------
+# Abastecimentos (a secretaria vem do veículo)
+# ---------------------------------------------------------------------------
+
+def _secretaria_do_veiculo(connection, placa):
+    return connection.execute(
+        select(veiculo.c.secretaria_id).where(veiculo.c.placa == placa)
+    ).scalar()
+
+
+def _aplicar_abastecimento(connection, placa, data, litros, sinal):
+    _somar(
+        connection, _secretaria_do_veiculo(connection, placa), "litros",
+        sinal, sinal * litros, ano=data.year, mes=data.month,
+    )
+
+
+@event.listens_for(Abastecimento, "after_insert")
+def _abastecimento_inserido(mapper, connection, target):
+    _aplicar_abastecimento(connection, target.veiculo_placa, target.data, target.litros, 1)
+
+
+@event.listens_for(Abastecimento, "after_delete")
+def _abastecimento_excluido(mapper, connection, target):
+    _aplicar_abastecimento(connection, target.veiculo_placa, target.data, target.litros, -1)
+
+
+@event.listens_for(Abastecimento, "after_update")
+def _abastecimento_editado(mapper, connection, target):
+    estado = inspect(target)
+    campos = ("veiculo_placa", "data", "litros")
+    if not any(estado.attrs[c].history.has_changes() for c in campos):
+        return
+    _aplicar_abastecimento(connection, *(_valor_anterior(estado, c) for c in campos), -1)
+    _aplicar_abastecimento(connection, *(getattr(target, c) for c in campos), 1)
+
+
+@event.listens_for(Veiculo, "after_update")
+def _veiculo_trocou_de_secretaria(mapper, connection, target):
+    historico = inspect(target).attrs.secretaria_id.history
+    if not historico.deleted:
+        return
+    ano = func.extract("year", abastecimento.c.data)
+    mes = func.extract("month", abastecimento.c.data)
+    for a, m, qtd, litros in connection.execute(
+        select(ano, mes, func.count(abastecimento.c.id), func.sum(abastecimento.c.litros))
+        .where(abastecimento.c.veiculo_placa == target.placa)
+        .group_by(ano, mes)
+    ):
+        _somar(connection, historico.deleted[0], "litros", -qtd, -litros, ano=int(a), mes=int(m))
+        _somar(connection, target.secretaria_id, "litros", qtd, litros, ano=int(a), mes=int(m))
+
+
+# ---------------------------------------------------------------------------
+# Recalculo completo (carga inicial e depois de alterações em massa)
+# ---------------------------------------------------------------------------
+
+def recalcular_painel(connection):
+    """Refaz a tabela painel_indicador inteira a partir de servidores e abastecimentos."""
+    secretaria = func.coalesce(servidor.c.secretaria_id, 0)
+    linhas = []
+
+    def agrupar(indicador, soma, rotulo=None, *filtros):
+        colunas = [secretaria, rotulo if rotulo is not None else literal(""), func.count(), soma]
+        agrupamento = [secretaria] if rotulo is None else [secretaria, rotulo]
+        for sec, rot, qtd, total in connection.execute(
+            select(*colunas).where(*filtros).group_by(*agrupamento)
+        ):
+            linhas.append({
+                "secretaria_id": sec, "indicador": indicador, "ano": 0, "mes": 0,
+                "rotulo": rot or "", "quantidade": qtd, "soma": total or 0.0,
+            })
+
+    agrupar("servidores", literal(0.0))
+    agrupar("remuneracao", func.sum(servidor.c.remuneracao), None, servidor.c.remuneracao.isnot(None))
+    agrupar("funcao", literal(0.0), func.coalesce(servidor.c.funcao, ""))
+    agrupar("lotacao", literal(0.0), func.coalesce(servidor.c.lotacao, ""))
+
+    ano = func.extract("year", abastecimento.c.data)
+    mes = func.extract("month", abastecimento.c.data)
+    for sec, a, m, qtd, litros in connection.execute(
+        select(veiculo.c.secretaria_id, ano, mes, func.count(abastecimento.c.id), func.sum(abastecimento.c.litros))
+        .select_from(abastecimento)
+        .join(veiculo, veiculo.c.placa == abastecimento.c.veiculo_placa)
+        .group_by(veiculo.c.secretaria_id, ano, mes)
+    ):
+        linhas.append({
+            "secretaria_id": sec or 0, "indicador": "litros", "ano": int(a), "mes": int(m),
+            "rotulo": "", "quantidade": qtd, "soma": litros or 0.0,
+        })
+
+    connection.execute(delete(painel))
+    if linhas:
+        connection.execute(painel.insert(), linhas)
+    return len(linhas)
+
+
+# ---------------------------------------------------------------------------
+# Leitura (dashboard)
+# ---------------------------------------------------------------------------
+
+def indicadores_painel(secretaria_id=None, ano=None):
+    """
+    Todos os números do dashboard em uma consulta. secretaria_id=None soma todas as
+    secretarias (visão geral do admin).
+    """
+    ano = ano or datetime.now().year
+    consulta = (
+        db.session.query(
+            PainelIndicador.indicador, PainelIndicador.mes, PainelIndicador.rotulo,
+            func.sum(PainelIndicador.quantidade), func.sum(PainelIndicador.soma),
+        )
+        .filter(PainelIndicador.ano.in_((0, ano)))
+        .group_by(PainelIndicador.indicador, PainelIndicador.mes, PainelIndicador.rotulo)
+    )
+    if secretaria_id is not None:
+        consulta = consulta.filter(PainelIndicador.secretaria_id == secretaria_id)
+    linhas = consulta.all()
+
+    resultado = {
+        "total_servidores": 0, "remuneracao_media": 0, "total_litros_ano": 0,
+        "funcao": [], "lotacao": [], "litros_mes": [0] * 12,
+    }
+    for indicador, mes, rotulo, quantidade, soma in linhas:
+        if quantidade <= 0:
+            continue
+        if indicador == "servidores":
+            resultado["total_servidores"] = quantidade
+        elif indicador == "remuneracao":
+            resultado["remuneracao_media"] = soma / quantidade
+        elif indicador in ("funcao", "lotacao"):
+            resultado[indicador].append((rotulo or "Não Especificado", quantidade))
+        elif indicador == "litros":
+            resultado["litros_mes"][mes - 1] = soma
+            resultado["total_litros_ano"] += soma
+
+    resultado["funcao"].sort(key=lambda item: item[1], reverse=True)
+    resultado["lotacao"].sort(key=lambda item: item[1], reverse=True)
+    return resultado
+
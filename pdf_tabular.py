@@ -0,0 +1,249 @@
+# pdf_tabular.py
+# Relatórios em PDF no formato "uma linha por registro" (servidores, saídas e
+# consumo da merenda...). Em vez de um Paragraph por célula e de uma Table
+# gigante, que o layout do platypus mede e divide de forma cada vez mais lenta,
+# as linhas são desenhadas direto no canvas: as larguras das colunas são
+# calculadas uma vez, cada linha é medida com stringWidth e a página é
+# encerrada quando a próxima linha não cabe. As linhas podem vir de um gerador
+# (query com yield_per), então nem os registros nem os flowables ficam na memória.
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas as canvas_lib
+
+from recursos_pdf import cabecalho_e_rodape
+
+# largura em cm (proporcional: as colunas são ajustadas à largura útil da página)
+Coluna = namedtuple("Coluna", "titulo largura alinhamento", defaults=("CENTER",))
+
+COR_CABECALHO = colors.HexColor("#004d40")
+FONTE = "Helvetica"
+FONTE_NEGRITO = "Helvetica-Bold"
+TAMANHO_FONTE = 8
+TAMANHO_FONTE_CABECALHO = 9
+ENTRELINHA = 10
+ESPACAMENTO = 3          # pontos entre o texto e a borda da célula
+MAXIMO_LINHAS_CELULA = 3  # textos maiores são cortados com "…"
+LIMITE_MEDIDAS = 50000    # textos já medidos guardados por relatório
+
+
+class _Documento:
+    """
+    O mínimo de um DocTemplate que os cabeçalhos de utils.py usam
+    (margens, largura útil e número da página).
+    """
+
+    def __init__(self, pagesize, margens):
+        self.pagesize = pagesize
+        self.leftMargin, self.rightMargin, self.topMargin, self.bottomMargin = margens
+        self.width = pagesize[0] - self.leftMargin - self.rightMargin
+        self.height = pagesize[1] - self.topMargin - self.bottomMargin
+        self.page = 1
+
+
+def _quebrar(texto, fonte, tamanho, largura):
+    """Linhas do texto na largura da célula, cada uma com a sua largura medida."""
+    medida = stringWidth(texto, fonte, tamanho)
+    if medida <= largura:
+        return [(texto, medida)]
+    linhas = simpleSplit(texto, fonte, tamanho, largura) or [""]
+    if len(linhas) > MAXIMO_LINHAS_CELULA:
+        ultima = " ".join(linhas[MAXIMO_LINHAS_CELULA - 1:])
+        while ultima and stringWidth(ultima + "…", fonte, tamanho) > largura:
+            ultima = ultima[:-1]
+        linhas = linhas[:MAXIMO_LINHAS_CELULA - 1] + [ultima.rstrip() + "…"]
+    return [(linha, stringWidth(linha, fonte, tamanho)) for linha in linhas]
+
+
+@contextmanager
+def _sem_ascii85():
+    # Os streams comprimidos saem em binário em vez de ASCII85: o PDF fica ~25%
+    # menor e a codificação em Python puro deixa de pesar no tempo total
+    anterior = rl_config.useA85
+    rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = anterior
+
+
+class _Tabela:
+    def __init__(self, c, doc, colunas, cabecalho, fundo_linhas):
+        self.c = c
+        self.doc = doc
+        self.cabecalho = cabecalho
+        self.fundo_linhas = fundo_linhas
+
+        fator = doc.width / sum(coluna.largura for coluna in colunas)
+        self.larguras = [coluna.largura * fator for coluna in colunas]
+        self.posicoes = [doc.leftMargin + sum(self.larguras[:i]) for i in range(len(colunas))]
+        self.alinhamentos = [coluna.alinhamento for coluna in colunas]
+        self.titulos = [
+            _quebrar(coluna.titulo, FONTE_NEGRITO, TAMANHO_FONTE_CABECALHO, largura - 2 * ESPACAMENTO)
+            for coluna, largura in zip(colunas, self.larguras)
+        ]
+        self.altura_titulos = max(len(t) for t in self.titulos) * ENTRELINHA + 2 * ESPACAMENTO + 4
+        self.medidas = {}
+        self.inicio_tabela = None
+        self.y = None
+
+    # --- páginas ---
+
+    def abrir_pagina(self):
+        self.cabecalho(self.c, self.doc)
+        self.y = self.doc.pagesize[1] - self.doc.topMargin
+        self.inicio_tabela = None
+        # Um único objeto de texto e um único caminho (linhas da grade) por página
+        self.texto = None
+        self.grade = self.c.beginPath()
+
+    def fechar_pagina(self):
+        self._fechar_grade()
+        self.c.showPage()
+        self.doc.page += 1
+
+    def garantir_espaco(self, altura):
+        if self.y - altura < self.doc.bottomMargin:
+            self.fechar_pagina()
+            self.abrir_pagina()
+
+    # --- tabela ---
+
+    def _linha_de_titulos(self):
+        c = self.c
+        altura = self.altura_titulos
+        self.inicio_tabela = self.y
+        c.setFillColor(COR_CABECALHO)
+        c.rect(self.doc.leftMargin, self.y - altura, self.doc.width, altura, fill=1, stroke=0)
+        self.texto = c.beginText()
+        self.texto.setFillColor(colors.whitesmoke)
+        self.texto.setFont(FONTE_NEGRITO, TAMANHO_FONTE_CABECALHO)
+        self._textos(self.titulos, altura, ["CENTER"] * len(self.titulos))
+        self.texto.setFillColor(colors.black)
+        self.texto.setFont(FONTE, TAMANHO_FONTE)
+        c.setFillColor(colors.black)
+        self.y -= altura
+
+    def _textos(self, celulas, altura, alinhamentos):
+        texto = self.texto
+        for linhas, x, largura, alinhamento in zip(celulas, self.posicoes, self.larguras, alinhamentos):
+            # centraliza o bloco de texto na altura da linha
+            base = self.y - (altura - len(linhas) * ENTRELINHA) / 2 - ENTRELINHA + 2.5
+            for conteudo, medida in linhas:
+                if not conteudo:
+                    continue
+                if alinhamento == "LEFT":
+                    texto.setTextOrigin(x + ESPACAMENTO, base)
+                elif alinhamento == "RIGHT":
+                    texto.setTextOrigin(x + largura - ESPACAMENTO - medida, base)
+                else:
+                    texto.setTextOrigin(x + (largura - medida) / 2, base)
+                texto.textOut(conteudo)
+                base -= ENTRELINHA
+
+    def _fechar_grade(self):
+        if self.inicio_tabela is None:
+            return
+        c = self.c
+        esquerda, direita = self.doc.leftMargin, self.doc.leftMargin + self.doc.width
+        self.grade.rect(esquerda, self.y, self.doc.width, self.inicio_tabela - self.y)
+        for x in self.posicoes[1:]:
+            self.grade.moveTo(x, self.inicio_tabela)
+            self.grade.lineTo(x, self.y)
+        c.setStrokeColor(colors.black)
+        c.drawPath(self.grade, stroke=1, fill=0)
+        c.drawText(self.texto)
+        self.grade = c.beginPath()
+        self.inicio_tabela = None
+
+    def _celula(self, coluna, valor):
+        # Função, lotação, vínculo... se repetem muito: cada texto é medido uma vez por coluna
+        chave = (coluna, valor)
+        linhas = self.medidas.get(chave)
+        if linhas is None:
+            texto = "" if valor is None else str(valor)
+            linhas = _quebrar(texto, FONTE, TAMANHO_FONTE, self.larguras[coluna] - 2 * ESPACAMENTO)
+            if len(self.medidas) < LIMITE_MEDIDAS:
+                self.medidas[chave] = linhas
+        return linhas
+
+    def linha(self, valores):
+        celulas = [self._celula(i, v) for i, v in enumerate(valores)]
+        altura = max(len(linhas) for linhas in celulas) * ENTRELINHA + 2 * ESPACAMENTO
+        # a linha de títulos se repete no topo de cada página
+        self.garantir_espaco(altura + (self.altura_titulos if self.inicio_tabela is None else 0))
+        if self.inicio_tabela is None:
+            self._linha_de_titulos()
+        # separador acima da linha (o da primeira é a borda de baixo dos títulos)
+        self.grade.moveTo(self.doc.leftMargin, self.y)
+        self.grade.lineTo(self.doc.leftMargin + self.doc.width, self.y)
+        if self.fundo_linhas is not None:
+            c = self.c
+            c.setFillColor(self.fundo_linhas)
+            c.rect(self.doc.leftMargin, self.y - altura, self.doc.width, altura, fill=1, stroke=0)
+            c.setFillColor(colors.black)
+        self._textos(celulas, altura, self.alinhamentos)
+        self.y -= altura
+
+    def terminar(self):
+        self._fechar_grade()
+
+
+def desenhar_tabela_pdf(
+    saida, titulo, colunas, linhas, subtitulo=None, paisagem=False,
+    margens=(2 * cm, 2 * cm, 3 * cm, 2 * cm), cabecalho=cabecalho_e_rodape,
+    fundo_linhas=None, fecho=None, vazio="Nenhum registro encontrado.",
+):
+    """
+    Desenha o relatório em 'saida' (arquivo ou BytesIO) e devolve a quantidade de linhas.
+
+    colunas: lista de Coluna; linhas: iterável de listas/tuplas na ordem das colunas.
+    margens: (esquerda, direita, topo, base). cabecalho: função (canvas, doc) chamada
+    em cada página, como o onPage do platypus. fecho: linhas de texto centralizadas
+    depois da tabela (ex.: assinatura).
+    """
+    with _sem_ascii85():
+        pagesize = landscape(A4) if paisagem else A4
+        doc = _Documento(pagesize, margens)
+        c = canvas_lib.Canvas(saida, pagesize=pagesize)
+        c.setTitle(titulo)
+        tabela = _Tabela(c, doc, colunas, cabecalho, fundo_linhas)
+
+        tabela.abrir_pagina()
+        c.setFont(FONTE_NEGRITO, 16)
+        tabela.y -= 20
+        c.drawString(doc.leftMargin, tabela.y, titulo)
+        if subtitulo:
+            tabela.y -= 18
+            c.setFont(FONTE, 10)
+            c.drawCentredString(doc.leftMargin + doc.width / 2, tabela.y, subtitulo)
+        tabela.y -= 1 * cm
+
+        total = 0
+        for valores in linhas:
+            tabela.linha(valores)
+            total += 1
+        tabela.terminar()
+
+        c.setFont(FONTE, 10)
+        if not total:
+            c.drawString(doc.leftMargin, tabela.y - 12, vazio)
+        if fecho:
+            tabela.y -= 2 * cm
+            tabela.garantir_espaco(len(fecho) * 14)
+            c.setFont(FONTE, 10)
+            for texto in fecho:
+                c.drawCentredString(doc.leftMargin + doc.width / 2, tabela.y, texto)
+                tabela.y -= 14
+
+        c.showPage()
+        c.save()
+    return total
+
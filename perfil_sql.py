@@ -0,0 +1,200 @@
+# perfil_sql.py
+# Perfil de SQL por requisição. Os eventos do SQLAlchemy contam cada comando
+# enviado ao banco e medem seu tempo; os ganchos do Flask medem a requisição e
+# a renderização dos templates. Cada requisição vira um registro num buffer
+# circular em memória (as mais antigas saem sozinhas), exibido em /admin/desempenho.
+# O EXPLAIN dos comandos mais lentos só é executado quando a página é aberta,
+# para não pesar nas requisições medidas.
+
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CAPACIDADE_PADRAO = 500      # requisições guardadas no buffer
+LENTAS_POR_REQUISICAO = 5    # comandos mais lentos guardados de cada requisição
+ENDPOINTS_IGNORADOS = {"static", "ver_desempenho"}
+
+_registros = deque(maxlen=CAPACIDADE_PADRAO)
+
+
+def iniciar_perfil_sql(app):
+    """Liga o perfil na aplicação. Desligue com PERFIL_SQL_ATIVO = False."""
+    global _registros
+    if not app.config.get("PERFIL_SQL_ATIVO", True):
+        return
+    _registros = deque(maxlen=app.config.get("PERFIL_SQL_CAPACIDADE", CAPACIDADE_PADRAO))
+    app.before_request(_inicio_requisicao)
+    app.after_request(_fim_requisicao)
+    before_render_template.connect(_inicio_render, app)
+    template_rendered.connect(_fim_render, app)
+    if not event.contains(Engine, "before_cursor_execute", _antes_do_comando):
+        event.listen(Engine, "before_cursor_execute", _antes_do_comando)
+        event.listen(Engine, "after_cursor_execute", _depois_do_comando)
+        event.listen(Engine, "handle_error", _erro_no_comando)
+
+
+def _perfil_atual():
+    return g.get("perfil_sql") if has_request_context() else None
+
+
+# ---------------------------------------------------------------------------
+# Ganchos do Flask
+# ---------------------------------------------------------------------------
+
+def _inicio_requisicao():
+    if request.endpoint in ENDPOINTS_IGNORADOS or request.endpoint is None:
+        return
+    g.perfil_sql = {
+        "inicio": time.perf_counter(), "consultas": 0, "tempo_banco": 0.0,
+        "tempo_render": 0.0, "render_inicio": None, "lentas": [],
+    }
+
+
+def _inicio_render(sender, template, context, **extra):
+    perfil = _perfil_atual()
+    if perfil is not None:
+        perfil["render_inicio"] = time.perf_counter()
+
+
+def _fim_render(sender, template, context, **extra):
+    perfil = _perfil_atual()
+    if perfil is not None and perfil["render_inicio"] is not None:
+        perfil["tempo_render"] += time.perf_counter() - perfil["render_inicio"]
+        perfil["render_inicio"] = None
+
+
+def _fim_requisicao(response):
+    perfil = g.pop("perfil_sql", None)
+    if perfil is None:
+        return response
+    # Respostas em streaming (CSV) só contam até aqui: o corpo é gerado depois
+    _registros.append({
+        "quando": datetime.now(),
+        "endpoint": request.endpoint,
+        "metodo": request.method,
+        "caminho": request.path,
+        "status": response.status_code,
+        "tempo_total_ms": (time.perf_counter() - perfil["inicio"]) * 1000,
+        "tempo_banco_ms": perfil["tempo_banco"] * 1000,
+        "tempo_render_ms": perfil["tempo_render"] * 1000,
+        "consultas": perfil["consultas"],
+        "lentas": sorted(perfil["lentas"], key=lambda c: c["tempo_ms"], reverse=True),
+    })
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Eventos do SQLAlchemy
+# ---------------------------------------------------------------------------
+
+def _antes_do_comando(conn, cursor, statement, parameters, context, executemany):
+    if _perfil_atual() is not None:
+        conn.info.setdefault("perfil_sql_inicio", []).append(time.perf_counter())
+
+
+def _depois_do_comando(conn, cursor, statement, parameters, context, executemany):
+    perfil = _perfil_atual()
+    pilha = conn.info.get("perfil_sql_inicio")
+    if perfil is None or not pilha:
+        return
+    decorrido = time.perf_counter() - pilha.pop()
+    perfil["consultas"] += 1
+    perfil["tempo_banco"] += decorrido
+
+    lentas = perfil["lentas"]
+    if len(lentas) < LENTAS_POR_REQUISICAO or decorrido * 1000 > min(c["tempo_ms"] for c in lentas):
+        if len(lentas) >= LENTAS_POR_REQUISICAO:
+            lentas.remove(min(lentas, key=lambda c: c["tempo_ms"]))
+        lentas.append({
+            "sql": statement,
+            "parametros": None if executemany else parameters,
+            "tempo_ms": decorrido * 1000,
+            "plano": None,
+        })
+
+
+def _erro_no_comando(contexto):
+    # Comando que falhou não chega ao after_cursor_execute: tira o início da pilha
+    # para o próximo comando da mesma conexão não herdar um tempo errado
+    conn = contexto.connection
+    pilha = conn.info.get("perfil_sql_inicio") if conn is not None else None
+    if pilha:
+        pilha.pop()
+
+
+# ---------------------------------------------------------------------------
+# Leitura (página /admin/desempenho)
+# ---------------------------------------------------------------------------
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def resumo_por_endpoint():
+    """Agrega o buffer por endpoint, do que mais consome banco para o que menos."""
+    grupos = {}
+    for r in list(_registros):
+        grupos.setdefault(r["endpoint"], []).append(r)
+
+    resumo = []
+    for endpoint, lista in grupos.items():
+        n = len(lista)
+        resumo.append({
+            "endpoint": endpoint,
+            "requisicoes": n,
+            "consultas_media": sum(r["consultas"] for r in lista) / n,
+            "consultas_max": max(r["consultas"] for r in lista),
+            "tempo_total_medio_ms": sum(r["tempo_total_ms"] for r in lista) / n,
+            "tempo_total_p95_ms": _percentil([r["tempo_total_ms"] for r in lista], 95),
+            "tempo_banco_medio_ms": sum(r["tempo_banco_ms"] for r in lista) / n,
+            "tempo_render_medio_ms": sum(r["tempo_render_ms"] for r in lista) / n,
+            "ultima": max(r["quando"] for r in lista),
+        })
+    resumo.sort(key=lambda e: e["tempo_banco_medio_ms"] * e["requisicoes"], reverse=True)
+    return resumo
+
+
+def comandos_mais_lentos(connection=None, limite=10):
+    """
+    Os comandos mais lentos de todo o buffer. Com uma conexão, preenche o plano
+    (EXPLAIN) dos SELECTs que ainda não foram explicados.
+    """
+    comandos = []
+    for r in list(_registros):
+        for c in r["lentas"]:
+            comandos.append((c, r))
+    comandos.sort(key=lambda item: item[0]["tempo_ms"], reverse=True)
+    comandos = comandos[:limite]
+
+    if connection is not None:
+        for comando, _ in comandos:
+            if comando["plano"] is None:
+                comando["plano"] = _explicar(connection, comando["sql"], comando["parametros"])
+    return [
+        {**comando, "endpoint": r["endpoint"], "caminho": r["caminho"], "quando": r["quando"]}
+        for comando, r in comandos
+    ]
+
+
+def _explicar(connection, sql, parametros):
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return "EXPLAIN só é executado para consultas SELECT."
+    prefixo = {"postgresql": "EXPLAIN", "sqlite": "EXPLAIN QUERY PLAN"}.get(connection.dialect.name)
+    if prefixo is None:
+        return f"EXPLAIN não suportado para o banco '{connection.dialect.name}'."
+    try:
+        linhas = connection.exec_driver_sql(f"{prefixo} {sql}", parametros or ()).fetchall()
+        return "\n".join(str(linha[-1]) for linha in linhas)
+    except Exception as e:
+        return f"Não foi possível obter o plano: {e}"
+    finally:
+        connection.rollback()
+
+
+def limpar():
+    _registros.clear()
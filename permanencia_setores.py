@@ -0,0 +1,232 @@
+# permanencia_setores.py
+# Quanto tempo os protocolos ficam parados em cada setor.
+#
+# A tabela permanencia_setor guarda uma linha por passagem de um protocolo por
+# um setor: entra na abertura (setor de origem) ou numa tramitação (setor de
+# destino) e sai na tramitação seguinte ou quando o protocolo é finalizado ou
+# cancelado. Os eventos do SQLAlchemy abaixo fecham a passagem aberta e abrem a
+# próxima dentro da mesma transação da tramitação, então o painel de gargalos
+# só agrupa essa tabela, sem ler as tramitações nem fazer contas no Python.
+#
+# As mudanças de status (tramitação com setor_destino = SETOR_MUDANCA_STATUS)
+# não mudam o protocolo de setor: só encerram (ou reabrem) a passagem atual.
+#
+# recalcular_permanencias() refaz a tabela a partir do histórico com LEAD():
+# usado na migração e pelo comando 'flask recalcular-permanencias'.
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import Integer, and_, case, cast, delete, event, func, inspect, literal, select, union_all, update
+
+from extensions import db
+from models import PermanenciaSetor, Protocolo, Tramitacao
+
+permanencia = PermanenciaSetor.__table__
+protocolo = Protocolo.__table__
+tramitacao = Tramitacao.__table__
+
+SETOR_MUDANCA_STATUS = "N/A (Mudança de Status)"
+STATUS_ENCERRADOS = ("Finalizado", "Cancelado")
+
+
+# ---------------------------------------------------------------------------
+# Passagens (dentro da transação da tramitação)
+# ---------------------------------------------------------------------------
+
+def _abrir(connection, protocolo_id, setor, instante):
+    connection.execute(permanencia.insert().values(protocolo_id=protocolo_id, setor=setor, entrada=instante))
+
+
+def _fechar(connection, protocolo_id, instante):
+    aberta = connection.execute(
+        select(permanencia.c.id, permanencia.c.entrada)
+        .where(permanencia.c.protocolo_id == protocolo_id, permanencia.c.saida.is_(None))
+    ).first()
+    if aberta is None:
+        return
+    connection.execute(
+        update(permanencia)
+        .where(permanencia.c.id == aberta.id)
+        .values(saida=instante, segundos=max(int((instante - aberta.entrada).total_seconds()), 0))
+    )
+
+
+def registrar_chegadas(connection, protocolo_ids, setor, instante):
+    """
+    Versão em lote do evento de tramitação, para quem grava as tramitações sem o
+    ORM (tramitação em lote): fecha as passagens abertas com um UPDATE e abre as
+    novas com um executemany.
+    """
+    if not protocolo_ids:
+        return
+    connection.execute(
+        update(permanencia)
+        .where(permanencia.c.protocolo_id.in_(protocolo_ids), permanencia.c.saida.is_(None))
+        .values(saida=instante, segundos=_segundos_entre(connection, permanencia.c.entrada, literal(instante)))
+    )
+    connection.execute(
+        permanencia.insert(),
+        [{"protocolo_id": i, "setor": setor, "entrada": instante} for i in protocolo_ids],
+    )
+
+
+@event.listens_for(Protocolo, "after_insert")
+def _protocolo_aberto(mapper, connection, target):
+    _abrir(connection, target.id, target.setor_atual, target.data_criacao or datetime.utcnow())
+
+
+@event.listens_for(Tramitacao, "after_insert")
+def _tramitacao_registrada(mapper, connection, target):
+    if target.setor_destino == SETOR_MUDANCA_STATUS:
+        return  # o encerramento, se houver, vem da mudança de status do protocolo
+    instante = target.data_envio or datetime.utcnow()
+    _fechar(connection, target.protocolo_id, instante)
+    _abrir(connection, target.protocolo_id, target.setor_destino, instante)
+
+
+@event.listens_for(Protocolo, "after_update")
+def _status_alterado(mapper, connection, target):
+    estado = inspect(target)
+    historico = estado.attrs.status.history
+    if not historico.has_changes():
+        return
+    estava_encerrado = any(s in STATUS_ENCERRADOS for s in historico.deleted)
+    encerrado = target.status in STATUS_ENCERRADOS
+    if encerrado and not estava_encerrado:
+        _fechar(connection, target.id, datetime.utcnow())
+    elif estava_encerrado and not encerrado and not estado.attrs.setor_atual.history.has_changes():
+        # Reaberto no mesmo setor; quando muda de setor, a tramitação abre a passagem
+        _abrir(connection, target.id, target.setor_atual, datetime.utcnow())
+
+
+@event.listens_for(Protocolo, "before_delete")
+def _protocolo_excluido(mapper, connection, target):
+    connection.execute(delete(permanencia).where(permanencia.c.protocolo_id == target.id))
+
+
+# ---------------------------------------------------------------------------
+# Recalculo completo (carga inicial e correções)
+# ---------------------------------------------------------------------------
+
+def _segundos_entre(connection, inicio, fim):
+    if connection.dialect.name == "postgresql":
+        return cast(func.extract("epoch", fim - inicio), Integer)
+    return cast(func.round((func.julianday(fim) - func.julianday(inicio)) * 86400), Integer)
+
+
+def recalcular_permanencias(connection):
+    """
+    Refaz a tabela inteira a partir dos protocolos e tramitações: a saída de cada
+    passagem é a chegada seguinte do mesmo protocolo, LEAD() sobre a sequência
+    (abertura, tramitações). Protocolos finalizados/cancelados têm a última passagem
+    fechada na última mudança de status. Devolve quantas passagens gravou.
+    """
+    chegadas = union_all(
+        select(
+            protocolo.c.id.label("protocolo_id"), protocolo.c.setor_origem.label("setor"),
+            protocolo.c.data_criacao.label("entrada"), literal(0).label("ordem"),
+        ),
+        select(
+            tramitacao.c.protocolo_id, tramitacao.c.setor_destino,
+            tramitacao.c.data_envio, tramitacao.c.id,
+        ).where(tramitacao.c.setor_destino != SETOR_MUDANCA_STATUS),
+    ).subquery("chegadas")
+    passagens = select(
+        chegadas.c.protocolo_id, chegadas.c.setor, chegadas.c.entrada,
+        func.lead(chegadas.c.entrada).over(
+            partition_by=chegadas.c.protocolo_id, order_by=(chegadas.c.entrada, chegadas.c.ordem),
+        ).label("saida"),
+    ).where(chegadas.c.entrada.is_not(None)).subquery("passagens")
+
+    connection.execute(delete(permanencia))
+    connection.execute(permanencia.insert().from_select(
+        ["protocolo_id", "setor", "entrada", "saida", "segundos"],
+        select(
+            passagens.c.protocolo_id, passagens.c.setor, passagens.c.entrada, passagens.c.saida,
+            _segundos_entre(connection, passagens.c.entrada, passagens.c.saida),
+        ),
+    ))
+
+    # Encerrados: a passagem que ficou aberta termina na última mudança de status
+    ultima_mudanca = (
+        select(func.max(tramitacao.c.data_envio))
+        .where(
+            tramitacao.c.protocolo_id == permanencia.c.protocolo_id,
+            tramitacao.c.setor_destino == SETOR_MUDANCA_STATUS,
+            tramitacao.c.data_envio >= permanencia.c.entrada,
+        )
+        .scalar_subquery()
+    )
+    encerrados = select(protocolo.c.id).where(protocolo.c.status.in_(STATUS_ENCERRADOS))
+    connection.execute(
+        update(permanencia)
+        .where(permanencia.c.saida.is_(None), permanencia.c.protocolo_id.in_(encerrados))
+        .values(saida=func.coalesce(ultima_mudanca, permanencia.c.entrada))
+    )
+    connection.execute(
+        update(permanencia)
+        .where(permanencia.c.saida.is_not(None), permanencia.c.segundos.is_(None))
+        .values(segundos=_segundos_entre(connection, permanencia.c.entrada, permanencia.c.saida))
+    )
+    return connection.execute(select(func.count()).select_from(permanencia)).scalar()
+
+
+# ---------------------------------------------------------------------------
+# Leitura (painel de gargalos)
+# ---------------------------------------------------------------------------
+
+def gargalos_por_setor(dias=None):
+    """
+    Uma linha por setor, num único GROUP BY: passagens concluídas (no período de
+    'dias', pela data de saída), tempo médio e máximo, e quantos protocolos estão
+    parados lá agora e desde quando. Ordenado pelo maior tempo médio.
+    """
+    aberta = permanencia.c.saida.is_(None)
+    no_periodo = permanencia.c.saida.is_not(None)
+    if dias:
+        no_periodo = and_(no_periodo, permanencia.c.saida >= datetime.utcnow() - timedelta(days=dias))
+    segundos = case((no_periodo, permanencia.c.segundos))
+
+    consulta = (
+        select(
+            permanencia.c.setor,
+            func.count(segundos).label("passagens"),
+            func.avg(segundos).label("media"),
+            func.max(segundos).label("maximo"),
+            func.count(case((aberta, 1))).label("parados"),
+            func.min(case((aberta, permanencia.c.entrada))).label("parado_desde"),
+        )
+        .where(aberta | no_periodo)
+        .group_by(permanencia.c.setor)
+    )
+    linhas = [dict(r) for r in db.session.execute(consulta).mappings()]
+    linhas.sort(key=lambda linha: linha["media"] or 0, reverse=True)
+    return linhas
+
+
+def parados_ha_mais_tempo(limite=10):
+    """Protocolos parados há mais tempo no setor atual (pelo índice saida+entrada)."""
+    return db.session.execute(
+        select(
+            protocolo.c.id, protocolo.c.numero_protocolo, protocolo.c.assunto,
+            permanencia.c.setor, permanencia.c.entrada,
+        )
+        .join(protocolo, protocolo.c.id == permanencia.c.protocolo_id)
+        .where(permanencia.c.saida.is_(None))
+        .order_by(permanencia.c.entrada)
+        .limit(limite)
+    ).mappings().all()
+
+
+def formatar_duracao(segundos):
+    """'3 d 4 h', '5 h 20 min', '12 min'."""
+    if segundos is None:
+        return "-"
+    minutos = int(segundos) // 60
+    dias, minutos = divmod(minutos, 1440)
+    horas, minutos = divmod(minutos, 60)
+    if dias:
+        return f"{dias} d {horas} h"
+    if horas:
+        return f"{horas} h {minutos} min"
+    return f"{minutos} min"
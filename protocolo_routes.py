@@ -13,9 +13,15 @@ from datetime import datetime
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import cm
+from sqlalchemy import select, update
 from sqlalchemy.orm import joinedload
 from flask import send_from_directory
-from utils import role_required
+from utils import role_required, proximo_numero
+from consulta_protocolos import filtros_da_requisicao, pagina_protocolos
+from contagem_status import contagem_por_status, em_cache, limpar_contagens
+from permanencia_setores import (
+    SETOR_MUDANCA_STATUS, gargalos_por_setor, parados_ha_mais_tempo, formatar_duracao, registrar_chegadas,
+)
 
 # Criação do Blueprint (sem alterações)
 protocolo_bp = Blueprint(
@@ -25,6 +31,9 @@ protocolo_bp = Blueprint(
     url_prefix='/protocolo'
 )
 
+# Setores para onde os protocolos podem ser tramitados
+SETORES = ["Gabinete do Secretário", "Recursos Humanos", "Departamento Pedagógico", "Transporte Escolar", "Almoxarifado", "Financeiro", "Arquivo", "Administracao"]
+
 # Decorator de login (sem alterações)
 def login_required(f):
     @wraps(f)
@@ -41,19 +50,14 @@ def gerar_numero_protocolo():
     """
     Gera um número de protocolo único no formato ANO-MÊS-SEQUENCIAL.
     Ex: 2025-09-001
+    O sequencial vem do contador do mês (tabela sequencia), reservado na mesma
+    transação que grava o protocolo.
     """
     now = datetime.now()
     ano = now.year
     mes = now.month
 
-    # Conta quantos protocolos já existem neste mês e ano
-    ultimo_protocolo_do_mes = Protocolo.query.filter(
-        db.extract('year', Protocolo.data_criacao) == ano,
-        db.extract('month', Protocolo.data_criacao) == mes
-    ).count()
-
-    # O próximo número será a contagem + 1
-    proximo_sequencial = ultimo_protocolo_do_mes + 1
+    proximo_sequencial = proximo_numero(db.session.connection(), f"protocolo:{ano}-{mes:02d}")
     
     # Formata o número final (ex: 2025-09-001)
     numero_formatado = f"{ano}-{mes:02d}-{proximo_sequencial:03d}"
@@ -65,10 +69,12 @@ def gerar_numero_protocolo():
 @login_required
 @role_required('RH', 'admin')
 def dashboard():
-    total_protocolos = Protocolo.query.count()
-    protocolos_em_tramitacao = Protocolo.query.filter(Protocolo.status == 'Em Tramitação').count()
-    protocolos_abertos = Protocolo.query.filter(Protocolo.status == 'Aberto').count()
-    protocolos_finalizados = Protocolo.query.filter(Protocolo.status == 'Finalizado').count()
+    # Todos os status num único GROUP BY, com cache curto (contagem_status.py)
+    contagem = contagem_por_status(Protocolo)
+    total_protocolos = contagem.total()
+    protocolos_em_tramitacao = contagem['Em Tramitação']
+    protocolos_abertos = contagem['Aberto']
+    protocolos_finalizados = contagem['Finalizado']
 
     return render_template('protocolo_dashboard.html',
                            total_protocolos=total_protocolos,
@@ -76,40 +82,43 @@ def dashboard():
                            protocolos_abertos=protocolos_abertos,
                            protocolos_finalizados=protocolos_finalizados)
 
+# Tempo de permanência dos protocolos em cada setor (permanencia_setores.py)
+@protocolo_bp.route('/gargalos')
+@login_required
+@role_required('RH', 'admin')
+def gargalos_setores():
+    dias = request.args.get('dias', default=90, type=int)
+    setores = em_cache(f'protocolo:gargalos:{dias}', [Protocolo, Tramitacao],
+                       lambda: gargalos_por_setor(dias))
+    return render_template('protocolo_gargalos.html',
+                           setores=setores,
+                           parados=parados_ha_mais_tempo(),
+                           dias=dias,
+                           agora=datetime.utcnow(),
+                           duracao=formatar_duracao)
+
 # Rota para listar todos os protocolos - sem alterações
 @protocolo_bp.route('/')
 @login_required
 @role_required('RH', 'admin')
 def listar_protocolos():
     # Pega os parâmetros de pesquisa da URL
-    q_numero = request.args.get('q_numero', '')
-    q_interessado = request.args.get('q_interessado', '')
-    q_assunto = request.args.get('q_assunto', '')
-    q_status = request.args.get('q_status', '')
-    
-    # Começa com a query base
-    query = Protocolo.query
-
-    # Aplica os filtros se os campos de pesquisa forem preenchidos
-    if q_numero:
-        query = query.filter(Protocolo.numero_protocolo.ilike(f'%{q_numero}%'))
-    if q_interessado:
-        query = query.filter(Protocolo.interessado.ilike(f'%{q_interessado}%'))
-    if q_assunto:
-        query = query.filter(Protocolo.assunto.ilike(f'%{q_assunto}%'))
-    if q_status:
-        query = query.filter(Protocolo.status == q_status)
-
-    # Executa a query final
-    protocolos = query.order_by(Protocolo.data_criacao.desc()).all()
+    filtros = filtros_da_requisicao(request.args)
+
+    # Uma página por vez (cursor), só com as colunas da tabela (consulta_protocolos.py)
+    pagina = pagina_protocolos(
+        db.session, filtros, antes=request.args.get('antes'), depois=request.args.get('depois')
+    )
     
     # Envia os termos da pesquisa de volta para o template para manter os campos preenchidos
     return render_template('listar_protocolos.html', 
-                           protocolos=protocolos,
-                           q_numero=q_numero,
-                           q_interessado=q_interessado,
-                           q_assunto=q_assunto,
-                           q_status=q_status)
+                           protocolos=pagina['itens'],
+                           pagina=pagina,
+                           q_numero=filtros['numero_protocolo'],
+                           q_interessado=filtros['interessado'],
+                           q_assunto=filtros['assunto'],
+                           q_status=filtros['status'],
+                           setores=SETORES)
 
 # Rota para criar um novo protocolo (com a chamada à nova função)
 @protocolo_bp.route('/novo', methods=['GET', 'POST'])
@@ -234,7 +243,7 @@ def mudar_status_protocolo():
         nova_tramitacao = Tramitacao(
             protocolo_id=protocolo.id,
             setor_origem=protocolo.setor_atual,
-            setor_destino="N/A (Mudança de Status)",
+            setor_destino=SETOR_MUDANCA_STATUS,
             usuario_responsavel=session.get('username', 'Sistema'),
             despacho=f"Status alterado de '{status_antigo}' para '{novo_status}'.\nMotivo: {motivo if motivo else 'N/A'}"
         )
@@ -249,6 +258,59 @@ def mudar_status_protocolo():
     return redirect(url_for('protocolo.listar_protocolos'))
     
     
+# Tramitação de vários protocolos de uma vez (ex.: o Gabinete despachando um lote)
+@protocolo_bp.route('/tramitar-lote', methods=['POST'])
+@login_required
+@role_required('RH', 'admin')
+def tramitar_em_lote():
+    ids = request.form.getlist('protocolo_ids', type=int)
+    setor_destino = request.form.get('setor_destino')
+    despacho = request.form.get('despacho')
+
+    if not ids or not setor_destino:
+        flash('Selecione ao menos um protocolo e o setor de destino.', 'warning')
+        return redirect(request.referrer or url_for('protocolo.listar_protocolos'))
+
+    try:
+        # Core em vez do ORM: um SELECT, um executemany e um UPDATE para o lote inteiro,
+        # sem carregar anexos e tramitações de cada protocolo
+        connection = db.session.connection()
+        tabela = Protocolo.__table__
+        origens = connection.execute(
+            select(tabela.c.id, tabela.c.setor_atual).where(tabela.c.id.in_(ids))
+        ).all()
+        if not origens:
+            flash('Nenhum dos protocolos selecionados foi encontrado.', 'warning')
+            return redirect(request.referrer or url_for('protocolo.listar_protocolos'))
+
+        agora = datetime.utcnow()
+        usuario = session.get('username', 'Sistema')
+        connection.execute(Tramitacao.__table__.insert(), [
+            {
+                'protocolo_id': protocolo_id, 'setor_origem': setor_atual, 'setor_destino': setor_destino,
+                'data_envio': agora, 'despacho': despacho, 'usuario_responsavel': usuario,
+            }
+            for protocolo_id, setor_atual in origens
+        ])
+        encontrados = [protocolo_id for protocolo_id, _ in origens]
+        connection.execute(
+            update(tabela).where(tabela.c.id.in_(encontrados))
+            .values(setor_atual=setor_destino, status='Em Tramitação')
+        )
+        # Sem o ORM os eventos não disparam: permanências e contagens são atualizadas aqui
+        registrar_chegadas(connection, encontrados, setor_destino, agora)
+        db.session.commit()
+        limpar_contagens(Protocolo)
+        limpar_contagens(Tramitacao)
+
+        flash(f'{len(encontrados)} protocolo(s) enviado(s) para o setor "{setor_destino}" com sucesso!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ocorreu um erro ao tramitar os protocolos: {e}', 'danger')
+
+    return redirect(request.referrer or url_for('protocolo.listar_protocolos'))
+
+
 # NOVA ROTA: Para ver os detalhes de um protocolo e fazer a tramitação
 @protocolo_bp.route('/detalhes/<int:protocolo_id>', methods=['GET', 'POST'])
 @login_required
@@ -294,10 +356,7 @@ def detalhes_protocolo(protocolo_id):
 
         return redirect(url_for('protocolo.detalhes_protocolo', protocolo_id=protocolo_id))
 
-    # --- ALTERAÇÃO APLICADA AQUI ---
-    # 2. Adiciona "Administracao" à lista de setores para tramitação
-    setores = ["Gabinete do Secretário", "Recursos Humanos", "Departamento Pedagógico", "Transporte Escolar", "Almoxarifado", "Financeiro", "Arquivo", "Administracao"]
-    return render_template('protocolo_detalhes.html', protocolo=protocolo, setores=setores)
+    return render_template('protocolo_detalhes.html', protocolo=protocolo, setores=SETORES)
 
 # NOVA ROTA: Para fazer o download dos ficheiros anexados
 @protocolo_bp.route('/anexo/download/<int:anexo_id>')
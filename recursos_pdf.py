@@ -0,0 +1,232 @@
+# recursos_pdf.py
+# Recursos compartilhados pelos geradores de PDF (relatórios, GAM, contratos,
+# ficha do aluno), carregados uma vez por processo em vez de a cada requisição
+# ou a cada página:
+#   - imagens do /static (timbre, logo do contrato): existência e tamanho ficam
+#     em cache e só são conferidos de novo a cada RECHECAR_IMAGENS segundos;
+#   - folha de estilos: getSampleStyleSheet() + os estilos próprios dos
+#     documentos, montada uma única vez (os estilos não são alterados no build);
+#   - cabeçalhos/rodapés: a parte fixa (timbre, título, faixa do rodapé) vira um
+#     form XObject desenhado uma vez por documento e repetido em cada página com
+#     doForm; só a data e o número da página são desenhados página a página.
+# Os PageTemplates/Frames continuam sendo criados por documento (modelo_pagina),
+# porque o Frame guarda o estado do layout durante o build.
+# Só as fontes padrão (família Helvetica) são usadas; as métricas delas já ficam
+# em cache no próprio ReportLab, então não há fontes para registrar aqui.
+
+import os
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Frame, PageTemplate
+
+PASTA_ESTATICA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+TIMBRE = "timbre.jpg"
+LOGO_CONTRATO = "img_contrato.jpg"
+COR_PRINCIPAL = colors.HexColor("#004d40")
+RECHECAR_IMAGENS = 60  # segundos; troca do timbre no /static aparece depois disso
+
+# modificado: mtime do arquivo, entra na chave dos PDFs em cache (ex.: contratos)
+Imagem = namedtuple("Imagem", "caminho largura altura modificado")
+
+_trava = threading.Lock()
+_imagens = {}
+
+
+# ---------------------------------------------------------------------------
+# Imagens
+# ---------------------------------------------------------------------------
+
+def imagem(nome):
+    """
+    Imagem do /static (caminho, tamanho em pixels e mtime), ou None se não existir.
+    Ela é desenhada pelo caminho: o ReportLab embute o JPEG uma vez por documento
+    e reaproveita nas outras páginas.
+    """
+    agora = time.monotonic()
+    item = _imagens.get(nome)
+    if item and agora - item[0] < RECHECAR_IMAGENS:
+        return item[1]
+
+    caminho = os.path.join(PASTA_ESTATICA, nome)
+    try:
+        modificado = os.stat(caminho).st_mtime_ns
+    except OSError:
+        resultado = None
+    else:
+        if item and item[1] and item[1].modificado == modificado:
+            resultado = item[1]
+        else:
+            largura, altura = ImageReader(caminho).getSize()
+            resultado = Imagem(caminho, largura, altura, modificado)
+    with _trava:
+        _imagens[nome] = (agora, resultado)
+    return resultado
+
+
+def limpar_imagens():
+    with _trava:
+        _imagens.clear()
+
+
+# ---------------------------------------------------------------------------
+# Estilos
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def estilos():
+    """Folha de estilos de todos os PDFs. Compartilhada: não altere os estilos."""
+    folha = getSampleStyleSheet()
+    normal = folha["Normal"]
+
+    # Relatórios
+    folha.add(ParagraphStyle(name="Centro", parent=normal, alignment=TA_CENTER))
+    folha.add(ParagraphStyle(name="Esquerda", parent=normal, alignment=TA_LEFT))
+
+    # GAM
+    folha.add(ParagraphStyle(name="GamCorpo", fontName="Helvetica", fontSize=10.5, alignment=TA_JUSTIFY, leading=13))
+    folha.add(ParagraphStyle(name="GamNegrito", parent=folha["GamCorpo"], fontName="Helvetica-Bold"))
+    folha.add(ParagraphStyle(name="GamAssinatura", fontName="Helvetica", fontSize=9, alignment=TA_CENTER))
+
+    # Contratos
+    folha.add(ParagraphStyle(name="ContratoCorpo", parent=normal, alignment=TA_JUSTIFY, fontSize=12, leading=15, spaceAfter=12))
+    folha.add(ParagraphStyle(name="ContratoPreambulo", parent=folha["ContratoCorpo"], firstLineIndent=2 * cm))
+    folha.add(ParagraphStyle(
+        name="ContratoTitulo", parent=folha["h1"], alignment=TA_CENTER, fontSize=12, leading=14,
+        spaceAfter=8, fontName="Helvetica-Bold",
+    ))
+    folha.add(ParagraphStyle(
+        name="ContratoTituloClausula", parent=folha["h2"], alignment=TA_LEFT, fontSize=12, leading=14,
+        spaceBefore=10, spaceAfter=4, fontName="Helvetica-Bold",
+    ))
+    folha.add(ParagraphStyle(name="ContratoAssinatura", parent=normal, alignment=TA_CENTER, fontSize=12, spaceBefore=6))
+    folha.add(ParagraphStyle(name="ContratoQuadroDireita", parent=normal, alignment=TA_JUSTIFY, fontSize=10, leading=12))
+    return folha
+
+
+# ---------------------------------------------------------------------------
+# Modelos de página e cabeçalhos
+# ---------------------------------------------------------------------------
+
+def modelo_pagina(doc, cabecalho, id="main_template"):
+    """PageTemplate de um quadro só, ocupando a área entre as margens do doc."""
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id="normal")
+    return PageTemplate(id=id, frames=[frame], onPage=cabecalho)
+
+
+def _forma(canvas, nome, desenhar):
+    # O form é registrado no documento na primeira página e só referenciado nas demais
+    if not canvas.hasForm(nome):
+        canvas.beginForm(nome)
+        desenhar(canvas)
+        canvas.endForm()
+    canvas.doForm(nome)
+
+
+def _nome_forma(prefixo, *partes):
+    return f"{prefixo}{zlib.crc32(repr(partes).encode()):08x}"
+
+
+def emitido_em(doc):
+    """Data de emissão do documento, a mesma em todas as páginas."""
+    if not hasattr(doc, "emitido_em"):
+        doc.emitido_em = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    return doc.emitido_em
+
+
+def desenhar_timbre(canvas, x, y, largura=17 * cm, altura=2.2 * cm, nome=TIMBRE):
+    """Desenha a imagem do /static na caixa dada; devolve False se ela não existir."""
+    img = imagem(nome)
+    if img is None:
+        return False
+    canvas.drawImage(img.caminho, x, y, width=largura, height=altura, preserveAspectRatio=True, mask="auto")
+    return True
+
+
+def cabecalho_e_rodape(canvas, doc):
+    """Timbre na primeira página; data de emissão e número da página em todas."""
+    canvas.saveState()
+    canvas.setFont("Helvetica", 9)
+    canvas.drawString(2 * cm, 1.5 * cm, f"Emitido em: {emitido_em(doc)}")
+    canvas.drawRightString(doc.width + doc.leftMargin, 1.5 * cm, f"Página {doc.page}")
+    if doc.page == 1:
+        desenhar_timbre(canvas, 2 * cm, A4[1] - 2.5 * cm)
+    canvas.restoreState()
+
+
+def cabecalho_e_rodape_moderno(canvas, doc, titulo_doc="Relatório"):
+    """Logo e título no topo, faixa verde no rodapé com data e página."""
+    canvas.saveState()
+
+    def parte_fixa(c):
+        topo = A4[1] - doc.topMargin
+        largura_logo = 0
+        img = imagem(TIMBRE)
+        if img is not None:
+            largura_logo = 5 * cm
+            altura_logo = largura_logo * img.altura / float(img.largura)
+            c.drawImage(
+                img.caminho, doc.leftMargin, topo + 1.2 * cm - altura_logo,
+                width=largura_logo, height=altura_logo, mask="auto",
+            )
+        c.setFont("Helvetica-Bold", 18)
+        c.setFillColor(colors.black)
+        c.drawString(doc.leftMargin + largura_logo + 0.5 * cm, topo + 0.8 * cm, titulo_doc)
+        c.setFillColor(COR_PRINCIPAL)
+        c.rect(doc.leftMargin, doc.bottomMargin - 0.5 * cm, doc.width, 0.3 * cm, fill=1, stroke=0)
+
+    _forma(canvas, _nome_forma("Moderno", titulo_doc, doc.leftMargin, doc.width, doc.topMargin, doc.bottomMargin), parte_fixa)
+
+    canvas.setFont("Helvetica", 8)
+    canvas.setFillColor(colors.grey)
+    canvas.drawString(doc.leftMargin, doc.bottomMargin - 0.4 * cm, f"SysEduca | Emitido em: {emitido_em(doc)}")
+    canvas.drawRightString(doc.width + doc.leftMargin, doc.bottomMargin - 0.4 * cm, f"Página {doc.page}")
+    canvas.restoreState()
+
+
+def cabecalho_moderno(titulo_doc):
+    """cabecalho_e_rodape_moderno com o título fixo, no formato (canvas, doc) do onPage."""
+    def desenhar(canvas, doc):
+        cabecalho_e_rodape_moderno(canvas, doc, titulo_doc)
+    return desenhar
+
+
+def cabecalho_gam(canvas, doc):
+    """Timbre e títulos da Guia de Atendimento Médico."""
+    def parte_fixa(c):
+        desenhar_timbre(c, 2 * cm, A4[1] - 3 * cm)
+        posicao_y_texto = A4[1] - 3.7 * cm
+        c.setFont("Helvetica-Bold", 12)
+        c.drawCentredString(10.5 * cm, posicao_y_texto, "GUIA PARA ATENDIMENTO MÉDICO - GAM")
+        c.setFont("Helvetica-Bold", 11)
+        c.drawCentredString(10.5 * cm, posicao_y_texto - 0.5 * cm, "PREFEITURA MUNICIPAL DE VALENÇA DO PIAUÍ")
+
+    canvas.saveState()
+    _forma(canvas, "CabecalhoGam", parte_fixa)
+    canvas.restoreState()
+
+
+def cabecalho_contrato(canvas, doc):
+    """Logo do contrato no topo de cada página; nº do contrato e página no rodapé."""
+    def parte_fixa(c):
+        if not desenhar_timbre(c, 2 * cm, A4[1] - 2.5 * cm, altura=2 * cm, nome=LOGO_CONTRATO):
+            c.setFont("Helvetica-Bold", 10)
+            c.drawCentredString(A4[0] / 2, A4[1] - 1.5 * cm, f"Logótipo não encontrado em /static/{LOGO_CONTRATO}")
+        c.setFont("Helvetica", 9)
+        c.drawString(2 * cm, 1.5 * cm, f"Contrato Nº {doc.contrato_numero}")
+
+    canvas.saveState()
+    _forma(canvas, "CabecalhoContrato", parte_fixa)
+    canvas.setFont("Helvetica", 9)
+    canvas.drawRightString(A4[0] - 2 * cm, 1.5 * cm, f"Página {doc.page}")
+    canvas.restoreState()
@@ -0,0 +1,511 @@
+# relatorios_combustivel.py
+# Consultas dos relatórios de combustível da frota.
+# Tudo aqui é feito com poucas consultas "em conjunto" (uma para todos os veículos),
+# em vez de uma consulta por veículo dentro de um loop.
+
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy import func, case, literal
+from sqlalchemy.orm import aliased
+from flask_sqlalchemy.pagination import Pagination
+
+from extensions import db
+from models import Abastecimento, Veiculo, Motorista
+
+# O NumPy é opcional: só é usado no cálculo de consumo quando o banco não tem LAG()
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Quantas linhas o cursor do servidor traz por vez nas exportações
+LINHAS_POR_LOTE = 1000
+
+
+def intervalo_periodo(ano, mes_inicio=None, mes_fim=None):
+    """
+    Retorna (data_inicio, data_fim) para o período pedido.
+    Sem mês: o ano inteiro. Só mes_inicio: aquele mês. Com mes_fim: de mes_inicio
+    até mes_fim (inclusive).
+    A data_fim é exclusiva (primeiro dia do mês seguinte).
+    """
+    if mes_inicio is None:
+        mes_inicio, mes_fim = 1, 12
+    mes_fim = mes_fim or mes_inicio
+    if mes_fim < mes_inicio:
+        raise ValueError("O mês final não pode ser anterior ao mês inicial.")
+
+    data_inicio = datetime(ano, mes_inicio, 1)
+    if mes_fim == 12:
+        data_fim = datetime(ano + 1, 1, 1)
+    else:
+        data_fim = datetime(ano, mes_fim + 1, 1)
+    return data_inicio, data_fim
+
+
+def suporta_window_functions():
+    """Indica se o banco atual tem LAG()/LEAD() (o SQLite só a partir da versão 3.25)."""
+    bind = db.session.get_bind()
+    if bind.dialect.name == "sqlite":
+        return sqlite3.sqlite_version_info >= (3, 25, 0)
+    return True
+
+
+def _colunas_veiculo():
+    return (
+        Veiculo.modelo,
+        Veiculo.placa,
+        Veiculo.renavam,
+        Veiculo.ano_fabricacao,
+        Veiculo.ano_modelo,
+        Veiculo.tipo,
+        Veiculo.orgao,
+    )
+
+
+def _linha(row, km_inicial):
+    return {
+        "modelo": row.modelo,
+        "placa": row.placa,
+        "renavam": row.renavam,
+        "ano_fabricacao": row.ano_fabricacao,
+        "ano_modelo": row.ano_modelo,
+        "tipo": row.tipo,
+        "orgao": row.orgao,
+        "data": row.data,
+        "litros": row.litros,
+        "tipo_combustivel": row.tipo_combustivel,
+        "km_inicial": km_inicial,
+        "km_final": row.km_final,
+    }
+
+
+def abastecimentos_com_km_anterior(data_inicio, data_fim, orgao=None):
+    """
+    Lista os abastecimentos do período de todos os veículos, já com o km inicial
+    (km do abastecimento anterior do mesmo veículo) e o km final de cada um.
+
+    No PostgreSQL (e SQLite >= 3.25) é uma única consulta com LAG() particionado
+    por placa. Nos outros casos cai para duas consultas e o cálculo em Python.
+    """
+    if suporta_window_functions():
+        return _km_com_window(data_inicio, data_fim, orgao)
+    return _km_em_python(data_inicio, data_fim, orgao)
+
+
+def _km_com_window(data_inicio, data_fim, orgao):
+    anterior = aliased(Abastecimento)
+
+    # Para o primeiro abastecimento do período o LAG() é nulo; nesse caso busca o
+    # maior km antes do período (subconsulta só avaliada quando necessária).
+    km_antes_do_periodo = (
+        db.session.query(func.max(anterior.quilometragem))
+        .filter(
+            anterior.veiculo_placa == Abastecimento.veiculo_placa,
+            anterior.data < data_inicio,
+        )
+        .scalar_subquery()
+    )
+    km_anterior = func.lag(Abastecimento.quilometragem).over(
+        partition_by=Abastecimento.veiculo_placa,
+        order_by=(Abastecimento.quilometragem, Abastecimento.id),
+    )
+
+    janela = (
+        db.session.query(
+            Abastecimento.id.label("id"),
+            Abastecimento.veiculo_placa.label("veiculo_placa"),
+            Abastecimento.data.label("data"),
+            Abastecimento.litros.label("litros"),
+            Abastecimento.tipo_combustivel.label("tipo_combustivel"),
+            Abastecimento.quilometragem.label("km_final"),
+            func.coalesce(km_anterior, km_antes_do_periodo).label("km_inicial"),
+        )
+        .filter(Abastecimento.data >= data_inicio, Abastecimento.data < data_fim)
+        .subquery()
+    )
+
+    query = db.session.query(
+        *_colunas_veiculo(),
+        janela.c.data,
+        janela.c.litros,
+        janela.c.tipo_combustivel,
+        janela.c.km_final,
+        janela.c.km_inicial,
+    ).join(janela, janela.c.veiculo_placa == Veiculo.placa)
+
+    if orgao:
+        query = query.filter(Veiculo.orgao == orgao)
+
+    query = query.order_by(Veiculo.modelo, Veiculo.placa, janela.c.km_final, janela.c.id)
+    return [_linha(row, row.km_inicial) for row in query]
+
+
+def _km_em_python(data_inicio, data_fim, orgao):
+    query = (
+        db.session.query(
+            *_colunas_veiculo(),
+            Abastecimento.data,
+            Abastecimento.litros,
+            Abastecimento.tipo_combustivel,
+            Abastecimento.quilometragem.label("km_final"),
+        )
+        .join(Veiculo, Abastecimento.veiculo_placa == Veiculo.placa)
+        .filter(Abastecimento.data >= data_inicio, Abastecimento.data < data_fim)
+    )
+    if orgao:
+        query = query.filter(Veiculo.orgao == orgao)
+
+    placas_do_periodo = query.with_entities(Abastecimento.veiculo_placa).distinct()
+
+    # Maior km antes do período, de todos os veículos de uma vez
+    km_anterior_por_veiculo = dict(
+        db.session.query(Abastecimento.veiculo_placa, func.max(Abastecimento.quilometragem))
+        .filter(
+            Abastecimento.data < data_inicio,
+            Abastecimento.veiculo_placa.in_(placas_do_periodo.scalar_subquery()),
+        )
+        .group_by(Abastecimento.veiculo_placa)
+        .all()
+    )
+
+    linhas = []
+    query = query.order_by(Veiculo.modelo, Veiculo.placa, Abastecimento.quilometragem, Abastecimento.id)
+    for row in query:
+        linhas.append(_linha(row, km_anterior_por_veiculo.get(row.placa)))
+        km_anterior_por_veiculo[row.placa] = row.km_final
+    return linhas
+
+
+def consulta_exportacao(data_inicio=None, data_fim=None, secretaria_id=None, ordenar_por_modelo=False):
+    """
+    Query (somente colunas, sem carregar objetos ORM) dos abastecimentos para as
+    exportações em CSV. Usa yield_per, então no PostgreSQL as linhas vêm de um
+    cursor no servidor e a memória fica constante, não importa o tamanho da tabela.
+    """
+    query = (
+        db.session.query(
+            Abastecimento.data,
+            Abastecimento.quilometragem,
+            Abastecimento.tipo_combustivel,
+            Abastecimento.litros,
+            Abastecimento.valor_litro,
+            Abastecimento.valor_total,
+            Veiculo.placa,
+            Veiculo.modelo,
+            Veiculo.renavam,
+            Veiculo.ano_fabricacao,
+            Veiculo.ano_modelo,
+            Motorista.cpf.label("motorista_cpf"),
+            Motorista.nome.label("motorista_nome"),
+        )
+        .join(Veiculo, Abastecimento.veiculo_placa == Veiculo.placa)
+        .join(Motorista, Abastecimento.motorista_id == Motorista.id)
+    )
+
+    if data_inicio:
+        query = query.filter(Abastecimento.data >= data_inicio)
+    if data_fim:
+        query = query.filter(Abastecimento.data < data_fim)
+    if secretaria_id:
+        query = query.filter(Veiculo.secretaria_id == secretaria_id)
+
+    if ordenar_por_modelo:
+        query = query.order_by(Veiculo.modelo, Abastecimento.data.asc(), Abastecimento.id)
+    else:
+        query = query.order_by(Abastecimento.data.asc(), Abastecimento.id)
+
+    return query.yield_per(LINHAS_POR_LOTE)
+
+
+CABECALHO_TCE_PI = [
+    "unidade_gestora", "exercicio", "mes_referencia", "numero_notafiscal",
+    "data_notafiscal", "cpf_condutor", "nome_condutor", "placa_veiculo",
+    "quilometragem", "tipo_combustivel", "quantidade_combustivel",
+    "valor_unitario", "valor_total", "cnpj_fornecedor",
+]
+
+
+def linhas_tce_pi(query):
+    """Gera as linhas do CSV no layout exigido pelo TCE-PI."""
+    for r in query:
+        yield [
+            "", r.data.year, r.data.month, "", r.data.strftime("%Y-%m-%d"),
+            r.motorista_cpf, r.motorista_nome, r.placa,
+            f"{r.quilometragem:.1f}".replace(".", ","), r.tipo_combustivel,
+            f"{r.litros:.2f}".replace(".", ","), f"{r.valor_litro:.2f}".replace(".", ","),
+            f"{r.valor_total:.2f}".replace(".", ","), "",
+        ]
+
+
+CABECALHO_EXTRATO = [
+    "Data", "Modelo", "Placa", "Renavam", "Ano Fabricação", "Ano Modelo",
+    "Motorista", "Quilometragem", "Litros", "Valor por Litro", "Valor Total",
+]
+
+
+def linhas_extrato(query):
+    """Gera as linhas do extrato detalhado (uma por abastecimento)."""
+    for r in query:
+        yield [
+            r.data.strftime("%d/%m/%Y"),
+            r.modelo,
+            r.placa,
+            r.renavam or "",
+            r.ano_fabricacao or "",
+            r.ano_modelo or "",
+            r.motorista_nome,
+            f"{r.quilometragem:.1f}".replace(".", ","),
+            f"{r.litros:.2f}".replace(".", ","),
+            f"R$ {r.valor_litro:.2f}".replace(".", ","),
+            f"R$ {r.valor_total:.2f}".replace(".", ","),
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Análise de consumo (km rodado, km/l e R$/km) da página /combustivel/relatorio
+# ---------------------------------------------------------------------------
+
+class _PaginacaoLista(Pagination):
+    """Paginação de uma lista já calculada (usada no cálculo sem LAG())."""
+
+    def _query_items(self):
+        inicio = self._query_offset
+        return self._query_args["itens"][inicio:inicio + self.per_page]
+
+    def _query_count(self):
+        return len(self._query_args["itens"])
+
+
+def _filtros_analise(query, data_inicio, data_fim, placa):
+    if placa:
+        query = query.filter(Abastecimento.veiculo_placa == placa)
+    if data_inicio:
+        query = query.filter(Abastecimento.data >= data_inicio)
+    if data_fim:
+        query = query.filter(Abastecimento.data < data_fim)
+    return query
+
+
+def _totais(quantidade, litros, valor_total, km_rodado, litros_para_media):
+    return {
+        "quantidade": quantidade or 0,
+        "litros": litros or 0,
+        "valor_total": valor_total or 0,
+        "km_rodado": km_rodado or 0,
+        "consumo_medio": (km_rodado / litros_para_media) if km_rodado and litros_para_media else 0,
+        "custo_medio_km": (valor_total / km_rodado) if km_rodado and valor_total else 0,
+    }
+
+
+def analise_consumo(page=1, per_page=50, data_inicio=None, data_fim=None, placa=None):
+    """
+    Retorna (paginacao, totais) da análise de consumo. Cada item da página é um dict
+    com data, modelo, placa, quilometragem, litros, valor_total, km_rodado,
+    consumo_kml e custo_km. O abastecimento anterior de cada veículo vem de LAG() e
+    os totais de um único SUM() no banco; só a página pedida é trazida para o Python.
+    """
+    if suporta_window_functions():
+        return _analise_com_window(page, per_page, data_inicio, data_fim, placa)
+    return _analise_vetorizada(page, per_page, data_inicio, data_fim, placa)
+
+
+def _anterior_antes_do_periodo(coluna, data_inicio):
+    """Valor de 'coluna' no último abastecimento (por km) do veículo antes do período."""
+    anterior = aliased(Abastecimento)
+    return (
+        db.session.query(getattr(anterior, coluna))
+        .filter(
+            anterior.veiculo_placa == Abastecimento.veiculo_placa,
+            anterior.data < data_inicio,
+        )
+        .order_by(anterior.quilometragem.desc(), anterior.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def _analise_com_window(page, per_page, data_inicio, data_fim, placa):
+    def lag(coluna):
+        valor = func.lag(getattr(Abastecimento, coluna)).over(
+            partition_by=Abastecimento.veiculo_placa,
+            order_by=(Abastecimento.quilometragem, Abastecimento.id),
+        )
+        # O primeiro abastecimento do período usa o último registro anterior a ele
+        if data_inicio:
+            valor = func.coalesce(valor, _anterior_antes_do_periodo(coluna, data_inicio))
+        return valor
+
+    janela = _filtros_analise(
+        db.session.query(
+            Abastecimento.id.label("id"),
+            Abastecimento.data.label("data"),
+            Abastecimento.veiculo_placa.label("placa"),
+            Abastecimento.quilometragem.label("quilometragem"),
+            Abastecimento.litros.label("litros"),
+            Abastecimento.valor_total.label("valor_total"),
+            lag("quilometragem").label("km_anterior"),
+            lag("litros").label("litros_anterior"),
+            lag("valor_total").label("valor_anterior"),
+        ),
+        data_inicio, data_fim, placa,
+    ).subquery()
+
+    km_rodado = janela.c.quilometragem - janela.c.km_anterior
+    consumo_kml = case(
+        ((km_rodado > 0) & (janela.c.litros_anterior > 0), km_rodado / janela.c.litros_anterior),
+        else_=literal(0),
+    )
+    custo_km = case((km_rodado > 0, janela.c.valor_anterior / km_rodado), else_=literal(0))
+
+    query = (
+        db.session.query(
+            janela.c.data,
+            Veiculo.modelo,
+            janela.c.placa,
+            janela.c.quilometragem,
+            janela.c.litros,
+            janela.c.valor_total,
+            func.coalesce(km_rodado, 0).label("km_rodado"),
+            consumo_kml.label("consumo_kml"),
+            custo_km.label("custo_km"),
+        )
+        .join(Veiculo, Veiculo.placa == janela.c.placa)
+        .order_by(janela.c.placa, janela.c.quilometragem, janela.c.id)
+    )
+
+    # Totais do período inteiro (não só da página) em uma única consulta
+    km_valido = case((km_rodado > 0, km_rodado), else_=literal(0))
+    litros_validos = case((km_rodado > 0, janela.c.litros_anterior), else_=literal(0))
+    quantidade, litros, valor_total, km_total, litros_para_media = db.session.query(
+        func.count(janela.c.id),
+        func.sum(janela.c.litros),
+        func.sum(janela.c.valor_total),
+        func.sum(km_valido),
+        func.sum(litros_validos),
+    ).one()
+    totais = _totais(quantidade, litros, valor_total, km_total, litros_para_media)
+
+    # O total já veio do SUM(); evita um COUNT(*) a mais na paginação
+    paginacao = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    paginacao.total = totais["quantidade"]
+    paginacao.items = [row._asdict() for row in paginacao.items]
+    return paginacao, totais
+
+
+def _analise_vetorizada(page, per_page, data_inicio, data_fim, placa):
+    # Só as colunas numéricas do período, já na ordem (placa, km)
+    linhas = _filtros_analise(
+        db.session.query(
+            Abastecimento.id,
+            Abastecimento.veiculo_placa,
+            Abastecimento.quilometragem,
+            Abastecimento.litros,
+            Abastecimento.valor_total,
+        ),
+        data_inicio, data_fim, placa,
+    ).order_by(Abastecimento.veiculo_placa, Abastecimento.quilometragem, Abastecimento.id).all()
+
+    # Último abastecimento de cada veículo antes do período (uma consulta agrupada)
+    anteriores = {}
+    if data_inicio and linhas:
+        km_maximo = _filtros_analise(
+            db.session.query(
+                Abastecimento.veiculo_placa.label("placa"),
+                func.max(Abastecimento.quilometragem).label("km"),
+            ),
+            None, data_inicio, placa,
+        ).group_by(Abastecimento.veiculo_placa).subquery()
+        for r in (
+            db.session.query(
+                Abastecimento.veiculo_placa, Abastecimento.quilometragem,
+                Abastecimento.litros, Abastecimento.valor_total,
+            )
+            .join(km_maximo, (km_maximo.c.placa == Abastecimento.veiculo_placa)
+                  & (km_maximo.c.km == Abastecimento.quilometragem))
+            .filter(Abastecimento.data < data_inicio)
+        ):
+            anteriores[r[0]] = (r[1], r[2], r[3])
+
+    ids = [r[0] for r in linhas]
+    placas = [r[1] for r in linhas]
+    if np is not None:
+        km_rodado, consumo, custo, litros_ant = _calcular_numpy(linhas, placas, anteriores)
+    else:
+        km_rodado, consumo, custo, litros_ant = _calcular_python(linhas, placas, anteriores)
+
+    validos = [i for i, km in enumerate(km_rodado) if km > 0]
+    totais = _totais(
+        len(linhas),
+        sum(r[3] for r in linhas),
+        sum(r[4] for r in linhas),
+        sum(km_rodado[i] for i in validos),
+        sum(litros_ant[i] for i in validos),
+    )
+
+    indices = list(range(len(linhas)))
+    paginacao = _PaginacaoLista(page=page, per_page=per_page, error_out=False, itens=indices)
+
+    # Detalhes (data, modelo) só das linhas da página
+    ids_pagina = [ids[i] for i in paginacao.items]
+    detalhes = {
+        r.id: r for r in db.session.query(Abastecimento.id, Abastecimento.data, Veiculo.modelo)
+        .join(Veiculo, Veiculo.placa == Abastecimento.veiculo_placa)
+        .filter(Abastecimento.id.in_(ids_pagina))
+    } if ids_pagina else {}
+
+    paginacao.items = [
+        {
+            "data": detalhes[ids[i]].data,
+            "modelo": detalhes[ids[i]].modelo,
+            "placa": placas[i],
+            "quilometragem": linhas[i][2],
+            "litros": linhas[i][3],
+            "valor_total": linhas[i][4],
+            "km_rodado": float(km_rodado[i]),
+            "consumo_kml": float(consumo[i]),
+            "custo_km": float(custo[i]),
+        }
+        for i in paginacao.items
+    ]
+    return paginacao, totais
+
+
+def _calcular_numpy(linhas, placas, anteriores):
+    if not linhas:
+        return [], [], [], []
+    placas = np.array(placas, dtype=object)
+    km = np.array([r[2] for r in linhas], dtype=float)
+    litros = np.array([r[3] for r in linhas], dtype=float)
+    valor = np.array([r[4] for r in linhas], dtype=float)
+
+    # Desloca uma posição; onde a placa muda, o anterior vem de antes do período (ou NaN)
+    primeiro = np.ones(len(km), dtype=bool)
+    primeiro[1:] = placas[1:] != placas[:-1]
+    km_ant, litros_ant, valor_ant = (np.roll(km, 1), np.roll(litros, 1), np.roll(valor, 1))
+    for i in np.flatnonzero(primeiro):
+        km_ant[i], litros_ant[i], valor_ant[i] = anteriores.get(placas[i], (np.nan, np.nan, np.nan))
+
+    km_rodado = np.nan_to_num(km - km_ant)
+    valido = km_rodado > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        consumo = np.where(valido & (litros_ant > 0), km_rodado / litros_ant, 0.0)
+        custo = np.where(valido, valor_ant / km_rodado, 0.0)
+    return km_rodado, consumo, custo, np.nan_to_num(litros_ant)
+
+
+def _calcular_python(linhas, placas, anteriores):
+    km_rodado, consumo, custo, litros_ant = [], [], [], []
+    for i, r in enumerate(linhas):
+        if i > 0 and placas[i] == placas[i - 1]:
+            anterior = linhas[i - 1][2:5]
+        else:
+            anterior = anteriores.get(placas[i])
+        km = (r[2] - anterior[0]) if anterior else 0
+        valido = km > 0
+        km_rodado.append(km)
+        litros_ant.append(anterior[1] if anterior else 0)
+        consumo.append(km / anterior[1] if valido and anterior[1] > 0 else 0)
+        custo.append(anterior[2] / km if valido else 0)
+    return km_rodado, consumo, custo, litros_ant
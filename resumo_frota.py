@@ -0,0 +1,435 @@
+# resumo_frota.py
+# Mantém as tabelas resumo_veiculo e resumo_veiculo_mensal sempre em dia.
+# A cada abastecimento ou manutenção inserido/excluído, os eventos do SQLAlchemy
+# abaixo somam/subtraem os valores no resumo, dentro da mesma transação.
+# Assim a página de detalhes do veículo não precisa ler todo o histórico.
+
+from sqlalchemy import event, func, case, select, delete, update, inspect
+
+from extensions import db
+from utils import upsert
+from models import (
+    Abastecimento, Manutencao, Veiculo, Motorista, ResumoVeiculo, ResumoVeiculoMensal,
+)
+
+resumo = ResumoVeiculo.__table__
+mensal = ResumoVeiculoMensal.__table__
+abastecimento = Abastecimento.__table__
+manutencao = Manutencao.__table__
+
+
+def _mes(data):
+    return {"ano": data.year, "mes": data.month}
+
+
+def _tem_resumo(connection, placa):
+    return connection.execute(
+        select(resumo.c.veiculo_placa).where(resumo.c.veiculo_placa == placa)
+    ).first() is not None
+
+
+# ---------------------------------------------------------------------------
+# Abastecimentos
+# ---------------------------------------------------------------------------
+
+def _somar_abastecimento(connection, a):
+    km, litros, valor = a.quilometragem, a.litros, a.valor_total
+    maior_km = resumo.c.km_final.is_(None) | (resumo.c.km_final <= km)
+
+    upsert(
+        connection, resumo,
+        {"veiculo_placa": a.veiculo_placa},
+        {
+            "qtd_abastecimentos": 1, "total_litros": litros, "gasto_combustivel": valor,
+            "qtd_manutencoes": 0, "gasto_manutencao": 0.0,
+            "km_inicial": km, "km_final": km, "litros_ultimo": litros,
+        },
+        {
+            "qtd_abastecimentos": resumo.c.qtd_abastecimentos + 1,
+            "total_litros": resumo.c.total_litros + litros,
+            "gasto_combustivel": resumo.c.gasto_combustivel + valor,
+            "km_inicial": case(
+                (resumo.c.km_inicial.is_(None) | (resumo.c.km_inicial > km), km),
+                else_=resumo.c.km_inicial,
+            ),
+            "km_final": case((maior_km, km), else_=resumo.c.km_final),
+            "litros_ultimo": case((maior_km, litros), else_=resumo.c.litros_ultimo),
+        },
+    )
+    upsert(
+        connection, mensal,
+        {"veiculo_placa": a.veiculo_placa, **_mes(a.data)},
+        {
+            "qtd_abastecimentos": 1, "litros": litros, "gasto_combustivel": valor,
+            "gasto_manutencao": 0.0, "km_min": km, "km_max": km,
+        },
+        {
+            "qtd_abastecimentos": mensal.c.qtd_abastecimentos + 1,
+            "litros": mensal.c.litros + litros,
+            "gasto_combustivel": mensal.c.gasto_combustivel + valor,
+            "km_min": case(
+                (mensal.c.km_min.is_(None) | (mensal.c.km_min > km), km), else_=mensal.c.km_min
+            ),
+            "km_max": case(
+                (mensal.c.km_max.is_(None) | (mensal.c.km_max < km), km), else_=mensal.c.km_max
+            ),
+        },
+    )
+
+
+def _subtrair_abastecimento(connection, placa, data, km, litros, valor):
+    connection.execute(
+        update(resumo)
+        .where(resumo.c.veiculo_placa == placa)
+        .values(
+            qtd_abastecimentos=resumo.c.qtd_abastecimentos - 1,
+            total_litros=resumo.c.total_litros - litros,
+            gasto_combustivel=resumo.c.gasto_combustivel - valor,
+        )
+    )
+    _recalcular_extremos(connection, placa)
+
+    mes = _mes(data)
+    connection.execute(
+        update(mensal)
+        .where(mensal.c.veiculo_placa == placa, mensal.c.ano == mes["ano"], mensal.c.mes == mes["mes"])
+        .values(
+            qtd_abastecimentos=mensal.c.qtd_abastecimentos - 1,
+            litros=mensal.c.litros - litros,
+            gasto_combustivel=mensal.c.gasto_combustivel - valor,
+        )
+    )
+    _recalcular_extremos_do_mes(connection, placa, data)
+
+
+def _recalcular_extremos(connection, placa):
+    """Refaz km inicial/final e os litros do último abastecimento (duas leituras pelo índice placa+km)."""
+    km_min, km_max = connection.execute(
+        select(func.min(abastecimento.c.quilometragem), func.max(abastecimento.c.quilometragem))
+        .where(abastecimento.c.veiculo_placa == placa)
+    ).one()
+    litros_ultimo = connection.execute(
+        select(abastecimento.c.litros)
+        .where(abastecimento.c.veiculo_placa == placa)
+        .order_by(abastecimento.c.quilometragem.desc(), abastecimento.c.id.desc())
+        .limit(1)
+    ).scalar()
+    connection.execute(
+        update(resumo)
+        .where(resumo.c.veiculo_placa == placa)
+        .values(km_inicial=km_min, km_final=km_max, litros_ultimo=litros_ultimo)
+    )
+
+
+def _recalcular_extremos_do_mes(connection, placa, data):
+    mes = _mes(data)
+    inicio = data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    fim = inicio.replace(year=inicio.year + 1, month=1) if inicio.month == 12 else inicio.replace(month=inicio.month + 1)
+    km_min, km_max = connection.execute(
+        select(func.min(abastecimento.c.quilometragem), func.max(abastecimento.c.quilometragem))
+        .where(
+            abastecimento.c.veiculo_placa == placa,
+            abastecimento.c.data >= inicio,
+            abastecimento.c.data < fim,
+        )
+    ).one()
+    condicao = (mensal.c.veiculo_placa == placa, mensal.c.ano == mes["ano"], mensal.c.mes == mes["mes"])
+    connection.execute(update(mensal).where(*condicao).values(km_min=km_min, km_max=km_max))
+    # Remove o mês que ficou vazio
+    connection.execute(
+        delete(mensal).where(
+            *condicao, mensal.c.qtd_abastecimentos <= 0, mensal.c.gasto_manutencao <= 0
+        )
+    )
+
+
+# ---------------------------------------------------------------------------
+# Manutenções
+# ---------------------------------------------------------------------------
+
+def _somar_manutencao(connection, placa, data, custo, quantidade=1):
+    upsert(
+        connection, resumo,
+        {"veiculo_placa": placa},
+        {
+            "qtd_abastecimentos": 0, "total_litros": 0.0, "gasto_combustivel": 0.0,
+            "qtd_manutencoes": quantidade, "gasto_manutencao": custo,
+        },
+        {
+            "qtd_manutencoes": resumo.c.qtd_manutencoes + quantidade,
+            "gasto_manutencao": resumo.c.gasto_manutencao + custo,
+        },
+    )
+    upsert(
+        connection, mensal,
+        {"veiculo_placa": placa, **_mes(data)},
+        {"qtd_abastecimentos": 0, "litros": 0.0, "gasto_combustivel": 0.0, "gasto_manutencao": custo},
+        {"gasto_manutencao": mensal.c.gasto_manutencao + custo},
+    )
+    if quantidade < 0:
+        connection.execute(
+            delete(mensal).where(
+                mensal.c.veiculo_placa == placa,
+                mensal.c.ano == data.year,
+                mensal.c.mes == data.month,
+                mensal.c.qtd_abastecimentos <= 0,
+                mensal.c.gasto_manutencao <= 0,
+            )
+        )
+
+
+# ---------------------------------------------------------------------------
+# Recalculo completo (edições e carga inicial)
+# ---------------------------------------------------------------------------
+
+def _totais(connection, placa):
+    """Valores do resumo geral do veículo calculados direto do histórico."""
+    qtd, litros, valor = connection.execute(
+        select(
+            func.count(abastecimento.c.id),
+            func.coalesce(func.sum(abastecimento.c.litros), 0.0),
+            func.coalesce(func.sum(abastecimento.c.valor_total), 0.0),
+        ).where(abastecimento.c.veiculo_placa == placa)
+    ).one()
+    qtd_manut, custo_manut = connection.execute(
+        select(func.count(manutencao.c.id), func.coalesce(func.sum(manutencao.c.custo), 0.0))
+        .where(manutencao.c.veiculo_placa == placa)
+    ).one()
+
+    km_min, km_max = connection.execute(
+        select(func.min(abastecimento.c.quilometragem), func.max(abastecimento.c.quilometragem))
+        .where(abastecimento.c.veiculo_placa == placa)
+    ).one()
+    litros_ultimo = connection.execute(
+        select(abastecimento.c.litros)
+        .where(abastecimento.c.veiculo_placa == placa)
+        .order_by(abastecimento.c.quilometragem.desc(), abastecimento.c.id.desc())
+        .limit(1)
+    ).scalar()
+    return {
+        "qtd_abastecimentos": qtd, "total_litros": litros, "gasto_combustivel": valor,
+        "qtd_manutencoes": qtd_manut, "gasto_manutencao": custo_manut,
+        "km_inicial": km_min, "km_final": km_max, "litros_ultimo": litros_ultimo,
+    }
+
+
+def recalcular_resumo_veiculo(connection, placa):
+    """Refaz do zero o resumo geral e os meses de um veículo a partir do histórico."""
+    valores = _totais(connection, placa)
+    upsert(connection, resumo, {"veiculo_placa": placa}, valores, valores)
+
+    ano_a = func.extract("year", abastecimento.c.data)
+    mes_a = func.extract("month", abastecimento.c.data)
+    meses = {}
+    for ano, mes, qtd, litros, valor, km_min, km_max in connection.execute(
+        select(
+            ano_a, mes_a, func.count(abastecimento.c.id),
+            func.sum(abastecimento.c.litros), func.sum(abastecimento.c.valor_total),
+            func.min(abastecimento.c.quilometragem), func.max(abastecimento.c.quilometragem),
+        )
+        .where(abastecimento.c.veiculo_placa == placa)
+        .group_by(ano_a, mes_a)
+    ):
+        meses[(int(ano), int(mes))] = {
+            "qtd_abastecimentos": qtd, "litros": litros, "gasto_combustivel": valor,
+            "gasto_manutencao": 0.0, "km_min": km_min, "km_max": km_max,
+        }
+
+    ano_m = func.extract("year", manutencao.c.data)
+    mes_m = func.extract("month", manutencao.c.data)
+    for ano, mes, custo in connection.execute(
+        select(ano_m, mes_m, func.sum(manutencao.c.custo))
+        .where(manutencao.c.veiculo_placa == placa)
+        .group_by(ano_m, mes_m)
+    ):
+        bucket = meses.setdefault((int(ano), int(mes)), {
+            "qtd_abastecimentos": 0, "litros": 0.0, "gasto_combustivel": 0.0,
+            "gasto_manutencao": 0.0, "km_min": None, "km_max": None,
+        })
+        bucket["gasto_manutencao"] = custo
+
+    connection.execute(delete(mensal).where(mensal.c.veiculo_placa == placa))
+    if meses:
+        connection.execute(
+            mensal.insert(),
+            [{"veiculo_placa": placa, "ano": ano, "mes": mes, **v} for (ano, mes), v in meses.items()],
+        )
+
+
+def recalcular_todos(connection):
+    """Recalcula o resumo de todos os veículos (usado pelo comando 'flask recalcular-resumo-frota')."""
+    placas = connection.execute(select(Veiculo.__table__.c.placa)).scalars().all()
+    for placa in placas:
+        recalcular_resumo_veiculo(connection, placa)
+    return len(placas)
+
+
+# ---------------------------------------------------------------------------
+# Eventos do SQLAlchemy
+# ---------------------------------------------------------------------------
+
+# Somar/subtrair só vale sobre um resumo completo: se o veículo ainda não tem resumo
+# (histórico anterior à tabela), ele é calculado inteiro, já com o registro atual.
+
+@event.listens_for(Abastecimento, "after_insert")
+def _abastecimento_inserido(mapper, connection, target):
+    if not _tem_resumo(connection, target.veiculo_placa):
+        recalcular_resumo_veiculo(connection, target.veiculo_placa)
+        return
+    _somar_abastecimento(connection, target)
+
+
+@event.listens_for(Abastecimento, "after_delete")
+def _abastecimento_excluido(mapper, connection, target):
+    if not _tem_resumo(connection, target.veiculo_placa):
+        recalcular_resumo_veiculo(connection, target.veiculo_placa)
+        return
+    _subtrair_abastecimento(
+        connection, target.veiculo_placa, target.data,
+        target.quilometragem, target.litros, target.valor_total,
+    )
+
+
+@event.listens_for(Abastecimento, "after_update")
+@event.listens_for(Manutencao, "after_update")
+def _registro_editado(mapper, connection, target):
+    # Edições são raras: recalcula o veículo inteiro (e o antigo, se a placa mudou)
+    estado = inspect(target)
+    campos = ("data", "quilometragem", "litros", "valor_total", "custo", "veiculo_placa")
+    if not any(c in estado.attrs and estado.attrs[c].history.has_changes() for c in campos):
+        return
+    placas = {target.veiculo_placa, *estado.attrs.veiculo_placa.history.deleted}
+    for placa in placas:
+        if placa:
+            recalcular_resumo_veiculo(connection, placa)
+
+
+@event.listens_for(Manutencao, "after_insert")
+def _manutencao_inserida(mapper, connection, target):
+    if not _tem_resumo(connection, target.veiculo_placa):
+        recalcular_resumo_veiculo(connection, target.veiculo_placa)
+        return
+    _somar_manutencao(connection, target.veiculo_placa, target.data, target.custo)
+
+
+@event.listens_for(Manutencao, "after_delete")
+def _manutencao_excluida(mapper, connection, target):
+    if not _tem_resumo(connection, target.veiculo_placa):
+        recalcular_resumo_veiculo(connection, target.veiculo_placa)
+        return
+    _somar_manutencao(connection, target.veiculo_placa, target.data, -target.custo, quantidade=-1)
+
+
+@event.listens_for(Veiculo, "before_delete")
+def _veiculo_excluido(mapper, connection, target):
+    connection.execute(delete(mensal).where(mensal.c.veiculo_placa == target.placa))
+    connection.execute(delete(resumo).where(resumo.c.veiculo_placa == target.placa))
+
+
+# ---------------------------------------------------------------------------
+# Leitura (página de detalhes do veículo)
+# ---------------------------------------------------------------------------
+
+def obter_resumo(placa):
+    """
+    Resumo do veículo. Sem resumo gravado (veículo sem histórico, ou histórico
+    anterior à tabela que ainda não foi recalculado), os valores são calculados na
+    hora, só para leitura: o resumo é gravado pela migração, pelo comando
+    'flask recalcular-resumo-frota' ou no próximo abastecimento/manutenção.
+    """
+    registro = db.session.get(ResumoVeiculo, placa)
+    if registro is None:
+        registro = ResumoVeiculo(veiculo_placa=placa, **_totais(db.session.connection(), placa))
+    return registro
+
+
+def indicadores_veiculo(registro):
+    """Mesmos indicadores que a página calculava somando o histórico inteiro."""
+    indicadores = {
+        "gasto_combustivel": registro.gasto_combustivel,
+        "gasto_manutencao": registro.gasto_manutencao,
+        "total_litros": registro.total_litros,
+        "total_km_rodado": 0,
+        "consumo_medio_geral": 0,
+        "custo_medio_km": 0,
+    }
+    indicadores["gasto_total"] = indicadores["gasto_combustivel"] + indicadores["gasto_manutencao"]
+
+    if registro.qtd_abastecimentos > 1 and registro.km_final is not None:
+        indicadores["total_km_rodado"] = registro.km_final - registro.km_inicial
+        if indicadores["total_km_rodado"] > 0:
+            # O último abastecimento ainda não foi "rodado", por isso fica fora da média
+            litros_para_media = registro.total_litros - (registro.litros_ultimo or 0)
+            if litros_para_media > 0:
+                indicadores["consumo_medio_geral"] = indicadores["total_km_rodado"] / litros_para_media
+            if indicadores["gasto_total"] > 0:
+                indicadores["custo_medio_km"] = indicadores["gasto_total"] / indicadores["total_km_rodado"]
+    return indicadores
+
+
+def serie_mensal(placa, meses=24):
+    """Consumo (km/L) e custo por km mês a mês, a partir dos resumos mensais."""
+    registros = (
+        ResumoVeiculoMensal.query.filter_by(veiculo_placa=placa)
+        .order_by(ResumoVeiculoMensal.ano.desc(), ResumoVeiculoMensal.mes.desc())
+        .limit(meses + 1)
+        .all()
+    )
+    registros.reverse()
+
+    labels, consumo, custo_km = [], [], []
+    km_anterior = None
+    for r in registros:
+        if r.km_max is None:
+            continue
+        # km do mês = do último odômetro do mês anterior até o último deste mês
+        km_rodado = r.km_max - (km_anterior if km_anterior is not None else r.km_min)
+        km_anterior = r.km_max
+        if km_rodado > 0 and r.litros > 0:
+            labels.append(f"{r.mes:02d}/{r.ano}")
+            consumo.append(round(km_rodado / r.litros, 2))
+            custo_km.append(round(r.gasto_combustivel / km_rodado, 2))
+    return labels[-meses:], consumo[-meses:], custo_km[-meses:]
+
+
+def historico_abastecimentos(placa, page=1, per_page=20, total=None):
+    """
+    Página do histórico de abastecimentos (do maior km para o menor) com km rodado e
+    consumo. O registro anterior de cada linha é a linha seguinte da página, então
+    basta buscar um registro a mais além da página.
+    """
+    query = (
+        db.session.query(
+            Abastecimento.id,
+            Abastecimento.data,
+            Motorista.nome.label("motorista"),
+            Abastecimento.quilometragem,
+            Abastecimento.litros,
+            Abastecimento.valor_total,
+        )
+        .join(Motorista, Abastecimento.motorista_id == Motorista.id)
+        .filter(Abastecimento.veiculo_placa == placa)
+        .order_by(Abastecimento.quilometragem.desc(), Abastecimento.id.desc())
+    )
+    paginacao = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    if total is not None:
+        paginacao.total = total
+
+    linhas = list(paginacao.items)
+    if linhas:
+        seguinte = query.offset(paginacao.page * per_page).limit(1).first()
+        if seguinte is not None:
+            linhas.append(seguinte)
+
+    itens = []
+    for i, atual in enumerate(paginacao.items):
+        item = atual._asdict()
+        item.update({"km_rodado": 0, "consumo_kml": 0})
+        if i + 1 < len(linhas):
+            anterior = linhas[i + 1]
+            km_rodado = atual.quilometragem - anterior.quilometragem
+            if km_rodado > 0 and anterior.litros > 0:
+                item.update({"km_rodado": km_rodado, "consumo_kml": km_rodado / anterior.litros})
+        itens.append(item)
+    paginacao.items = itens
+    return paginacao
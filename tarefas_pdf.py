@@ -0,0 +1,396 @@
+# tarefas_pdf.py
+# Geração dos PDFs pesados (relatório geral de servidores, relatórios da
+# merenda) fora da requisição, num pool de processos, com o resultado guardado
+# num cache endereçado pelo conteúdo.
+#
+# Cada pedido é uma especificação: nome do relatório + parâmetros + secretaria
+# do escopo. A chave do cache é o sha256 da especificação junto com a versão
+# dos dados de que o relatório depende (tabela versao_dados, incrementada
+# depois de cada commit que grava nessas tabelas, numa transação curta à parte,
+# para não travar a linha da versão durante a transação do usuário e serializar
+# quem grava nas mesmas tabelas). Enquanto os dados não mudam, pedidos
+# iguais, de qualquer usuário ou worker, reaproveitam o mesmo arquivo; quando
+# mudam, a chave muda e o PDF é gerado de novo.
+#
+# O estado fica em arquivos na pasta PDF_CACHE_PASTA (<chave>.pdf e
+# <chave>.json), então qualquer worker do gunicorn responde ao acompanhamento.
+# O primeiro worker que cria o <chave>.json (O_EXCL) é o que gera; os outros
+# só acompanham.
+#
+# A chave não é segredo (a especificação e as versões são fáceis de adivinhar):
+# o <chave>.json guarda a secretaria de quem pediu e os perfis exigidos pelo
+# relatório, e /pdf/<chave> só entrega o arquivo a quem passa por acesso_permitido().
+
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import re
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from itertools import chain
+
+from flask import g, redirect, session, url_for
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import VersaoDados
+from escopo_secretaria import secretaria_do_escopo, TODAS_AS_SECRETARIAS
+from utils import upsert
+
+PROCESSOS_PADRAO = 2
+TEMPO_MAXIMO = 600   # segundos; geração "gerando" há mais tempo é dada como perdida
+ESPERA_PADRAO = 2.0  # segundos que a requisição espera antes de mostrar a página de aguarde
+
+# nome -> (função geradora(parametros, saida), tabelas das quais o relatório depende,
+#          perfis que podem baixar além do admin; vazio = qualquer usuário logado)
+RELATORIOS = {}
+
+_app = None
+_trava = threading.Lock()
+_pool = None
+_pool_pid = None
+_pendentes = {}  # chave -> Future, só das gerações agendadas por este processo
+
+
+def relatorio_pdf(nome, tabelas, papeis=()):
+    """
+    Decorador que registra uma função geradora: ela recebe os parâmetros da
+    especificação e o arquivo de saída, e roda no processo filho com o escopo
+    da secretaria de quem pediu. 'papeis' repete os perfis exigidos pela rota
+    (o admin sempre pode), conferidos de novo quando o arquivo é baixado.
+    """
+    def registrar(f):
+        RELATORIOS[nome] = (f, tuple(tabelas), tuple(papeis))
+        return f
+    return registrar
+
+
+def iniciar_tarefas_pdf(app):
+    global _app
+    _app = app
+
+
+def _pasta():
+    return _app.config.get("PDF_CACHE_PASTA") or os.path.join(_app.instance_path, "pdf_cache")
+
+
+def _caminhos(chave):
+    base = os.path.join(_pasta(), chave)
+    return base + ".pdf", base + ".json"
+
+
+def _chave_valida(chave):
+    return re.fullmatch(r"[0-9a-f]{64}", chave or "") is not None
+
+
+# ---------------------------------------------------------------------------
+# Versão dos dados
+# ---------------------------------------------------------------------------
+
+def _tabelas_vigiadas():
+    return set(chain.from_iterable(tabelas for _, tabelas, _ in RELATORIOS.values()))
+
+
+def marcar_alteracao(connection, *tabelas):
+    """Soma 1 à versão das tabelas. Para cargas feitas fora do ORM (ex.: importação)."""
+    versao = VersaoDados.__table__
+    for tabela in sorted(set(tabelas)):
+        upsert(connection, versao, {"tabela": tabela}, {"versao": 1}, {"versao": versao.c.versao + 1})
+
+
+@event.listens_for(Session, "after_flush")
+def _anotar_tabelas_alteradas(session, flush_context):
+    # Só anota: a versão é incrementada depois do commit (_marcar_tabelas_alteradas)
+    alteradas = {
+        getattr(obj, "__tablename__", None)
+        for obj in chain(session.new, session.dirty, session.deleted)
+    } & _tabelas_vigiadas()
+    if alteradas:
+        session.info.setdefault("tabelas_alteradas", set()).update(alteradas)
+
+
+@event.listens_for(Session, "after_commit")
+def _marcar_tabelas_alteradas(session):
+    alteradas = session.info.pop("tabelas_alteradas", None)
+    if not alteradas:
+        return
+    try:
+        with session.get_bind().begin() as connection:
+            marcar_alteracao(connection, *alteradas)
+    except Exception:
+        # Os dados já foram gravados; sem a nova versão, o cache só demora a perceber
+        logging.getLogger(__name__).exception("Falha ao incrementar versao_dados de %s", sorted(alteradas))
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tabelas_alteradas(session):
+    session.info.pop("tabelas_alteradas", None)
+
+
+def versoes(tabelas):
+    return dict(db.session.execute(
+        select(VersaoDados.tabela, VersaoDados.versao).where(VersaoDados.tabela.in_(tabelas))
+    ).all())
+
+
+# ---------------------------------------------------------------------------
+# Pedido e acompanhamento
+# ---------------------------------------------------------------------------
+
+def especificacao(relatorio, **parametros):
+    """Especificação de um PDF; os parâmetros precisam ser serializáveis em JSON."""
+    return {"relatorio": relatorio, "parametros": parametros, "secretaria": secretaria_do_escopo()}
+
+
+def chave_pdf(spec):
+    _, tabelas, _ = RELATORIOS[spec["relatorio"]]
+    conteudo = json.dumps({"spec": spec, "versoes": versoes(tabelas)}, sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def _ler(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar(caminho, status):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(status, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def _reservar(caminho_status, status):
+    """Cria o status da geração; False se outro processo já está gerando o mesmo PDF."""
+    try:
+        descritor = os.open(caminho_status, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        atual = _ler(caminho_status)
+        if atual is None:
+            return False  # acabou de ser criado por outro processo
+        if atual["situacao"] == "gerando" and time.time() - atual["desde"] < TEMPO_MAXIMO:
+            return False
+        # falhou ou ficou pelo caminho: tenta de novo
+        _gravar(caminho_status, status)
+        return True
+    with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+        json.dump(status, arquivo, ensure_ascii=False)
+    return True
+
+
+def pedir_pdf(spec, nome_arquivo):
+    """Devolve a chave do PDF, agendando a geração se ele ainda não estiver no cache."""
+    chave = chave_pdf(spec)
+    pdf, caminho_status = _caminhos(chave)
+    if os.path.exists(pdf):
+        os.utime(pdf)  # usado recentemente (ver limpar_cache_pdf)
+        return chave
+
+    os.makedirs(_pasta(), exist_ok=True)
+    status = {
+        "situacao": "gerando", "relatorio": spec["relatorio"], "nome_arquivo": nome_arquivo,
+        "secretaria": spec["secretaria"], "papeis": list(RELATORIOS[spec["relatorio"]][2]),
+        "desde": time.time(), "inicio": datetime.now().isoformat(timespec="seconds"),
+        "fim": None, "erro": None,
+    }
+    if _reservar(caminho_status, status):
+        futuro = _submeter(chave, spec)
+        _pendentes[chave] = futuro
+        futuro.add_done_callback(lambda f: _concluido(chave, f))
+    return chave
+
+
+def status_pdf(chave):
+    """Status da geração ({'situacao': gerando|pronto|falhou, ...}), ou None se não existir."""
+    if not _chave_valida(chave):
+        return None
+    pdf, caminho_status = _caminhos(chave)
+    status = _ler(caminho_status)
+    if os.path.exists(pdf):
+        return dict(status or {}, situacao="pronto")
+    if status is None and os.path.exists(caminho_status):
+        return {"situacao": "gerando"}
+    return status
+
+
+def acesso_permitido(status):
+    """
+    Se o usuário da sessão pode ver o PDF: o admin sempre; os demais só os pedidos
+    da própria secretaria, com um dos perfis exigidos pelo relatório.
+    """
+    if session.get("role") == "admin":
+        return True
+    if "secretaria" not in status:
+        # Status ainda sendo gravado pelo outro worker: não há nada a mostrar além disso
+        return status.get("situacao") == "gerando" and len(status) == 1
+    if status["secretaria"] != session.get("secretaria_id"):
+        return False
+    return not status.get("papeis") or session.get("role") in status["papeis"]
+
+
+def caminho_pdf(chave):
+    return _caminhos(chave)[0] if _chave_valida(chave) else None
+
+
+def aguardar_pdf(chave, espera):
+    """Espera até 'espera' segundos pela geração agendada por este processo."""
+    futuro = _pendentes.get(chave)
+    if futuro is not None:
+        wait([futuro], timeout=espera)
+    return status_pdf(chave)
+
+
+def resposta_pdf(spec, nome_arquivo, espera=ESPERA_PADRAO):
+    """
+    Para as rotas: agenda (ou reaproveita) o PDF e redireciona para /pdf/<chave>,
+    que entrega o arquivo pronto ou mostra a página que acompanha a geração.
+    Documentos pequenos costumam ficar prontos dentro da espera.
+    """
+    chave = pedir_pdf(spec, nome_arquivo)
+    aguardar_pdf(chave, espera)
+    return redirect(url_for("baixar_pdf", chave=chave))
+
+
+# ---------------------------------------------------------------------------
+# Pool de processos
+# ---------------------------------------------------------------------------
+
+def _configuracao():
+    """Configuração do app que pode ser enviada ao processo filho (valores serializáveis)."""
+    config = {}
+    for nome, valor in _app.config.items():
+        try:
+            pickle.dumps(valor)
+        except Exception:
+            continue
+        config[nome] = valor
+    return config
+
+
+def _executor():
+    global _pool, _pool_pid
+    with _trava:
+        # Depois de um fork (ex.: workers do gunicorn) cada processo cria o seu pool
+        if _pool is None or _pool_pid != os.getpid():
+            # "spawn" e não "fork": este processo já tem outras threads (auditoria,
+            # importação) e um fork no meio de um lock delas travaria o filho
+            _pool = ProcessPoolExecutor(
+                max_workers=_app.config.get("PDF_PROCESSOS", PROCESSOS_PADRAO),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_iniciar_processo,
+                initargs=(_app.import_name, _configuracao()),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _submeter(chave, spec):
+    global _pool
+    # PDF_MEDIR (ligado pelo bench-rotas) grava no status os comandos SQL e o pico de memória do filho
+    argumentos = (spec, *_caminhos(chave), _app.config.get("PDF_MEDIR", False))
+    try:
+        return _executor().submit(_gerar, *argumentos)
+    except BrokenProcessPool:
+        # Um processo filho morreu (ex.: falta de memória): o pool é refeito
+        with _trava:
+            _pool = None
+        return _executor().submit(_gerar, *argumentos)
+
+
+def _concluido(chave, futuro):
+    _pendentes.pop(chave, None)
+    erro = futuro.exception()
+    if erro is not None:
+        # _gerar trata os próprios erros; aqui só chega a morte do processo filho
+        caminho_status = _caminhos(chave)[1]
+        status = _ler(caminho_status) or {}
+        status.update(situacao="falhou", erro=str(erro) or type(erro).__name__,
+                      fim=datetime.now().isoformat(timespec="seconds"))
+        _gravar(caminho_status, status)
+
+
+def _iniciar_processo(modulo, config):
+    """
+    Roda uma vez em cada processo filho: importa o módulo do app (que registra os
+    relatórios e chama iniciar_tarefas_pdf) e aplica a configuração do pai, que
+    pode ter sido alterada depois da importação (ex.: outro banco nos testes).
+    """
+    app = importlib.import_module(modulo).app
+    app.config.update(config)
+    # O engine foi criado na importação, com a configuração original: refaz com a do pai
+    app.extensions.pop("sqlalchemy", None)
+    db.init_app(app)
+
+
+def _gerar(spec, pdf, caminho_status, medir=False):
+    """
+    Roda no processo filho: gera o PDF num temporário e o publica com os.replace.
+    Os caminhos vêm do pai, que pode ter mudado a pasta do cache depois de criar o pool.
+    Com 'medir', o status ganha 'consultas' e 'memoria_pico_kb' da geração.
+    """
+    status = _ler(caminho_status) or {}
+    temporario = f"{pdf}.{os.getpid()}.tmp"
+    consultas = [0]
+
+    def contar(*args):
+        consultas[0] += 1
+
+    try:
+        gerar, _, _ = RELATORIOS[spec["relatorio"]]
+        with _app.test_request_context():
+            g.escopo_secretaria = spec["secretaria"] or TODAS_AS_SECRETARIAS
+            if medir:
+                event.listen(db.engine, "before_cursor_execute", contar)
+                tracemalloc.start()
+            try:
+                with open(temporario, "wb") as saida:
+                    gerar(spec["parametros"], saida)
+            finally:
+                if medir:
+                    status.update(consultas=consultas[0],
+                                  memoria_pico_kb=round(tracemalloc.get_traced_memory()[1] / 1024))
+                    tracemalloc.stop()
+                    event.remove(db.engine, "before_cursor_execute", contar)
+                db.session.remove()
+        os.replace(temporario, pdf)
+        status.update(situacao="pronto", erro=None)
+    except Exception as e:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        status.update(situacao="falhou", erro=str(e))
+    status["fim"] = datetime.now().isoformat(timespec="seconds")
+    _gravar(caminho_status, status)
+
+
+# ---------------------------------------------------------------------------
+# Manutenção
+# ---------------------------------------------------------------------------
+
+def limpar_cache_pdf(dias):
+    """Apaga os PDFs (e status) sem uso há mais de 'dias' dias. Devolve quantos apagou."""
+    pasta = _pasta()
+    if not os.path.isdir(pasta):
+        return 0
+    limite = time.time() - dias * 86400
+    apagados = 0
+    for nome in os.listdir(pasta):
+        caminho = os.path.join(pasta, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+                apagados += nome.endswith(".pdf")
+        except OSError:
+            pass
+    return apagados
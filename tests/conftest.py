@@ -0,0 +1,38 @@
+# Fixtures dos testes: a aplicação apontando para um SQLite temporário com um
+# município sintético pequeno (dados_benchmark.py), no lugar do PostgreSQL
+# configurado em app.py. Rode com 'python -m pytest tests' na raiz do projeto.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    import app as modulo_app
+    from extensions import db
+
+    aplicacao = modulo_app.app
+    caminho = tmp_path_factory.mktemp("banco") / "teste.db"
+    aplicacao.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI=f"sqlite:///{caminho}")
+    # app.py já registrou o banco com a URI fixa; registra de novo com a base temporária
+    aplicacao.extensions.pop("sqlalchemy")
+    db.init_app(aplicacao)
+    with aplicacao.app_context():
+        db.create_all()
+    yield aplicacao
+    with aplicacao.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def app_com_dados(app):
+    from extensions import db
+    from dados_benchmark import tamanhos, gerar_municipio
+
+    with app.app_context(), db.engine.begin() as connection:
+        gerar_municipio(connection, tamanhos(0.01), progresso=lambda *args: None)
+    return app
@@ -0,0 +1,42 @@
+from flask import session
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Secretaria, Servidor
+
+
+def _secretaria_com_servidores():
+    return db.session.execute(
+        select(Servidor.secretaria_id, func.count()).group_by(Servidor.secretaria_id).limit(1)
+    ).first()
+
+
+def _contar_servidores(app, perfil):
+    with app.test_request_context():
+        secretaria_id, _ = _secretaria_com_servidores()
+        session.update({"logged_in": True, "role": perfil, "secretaria_id": secretaria_id})
+        return db.session.scalar(select(func.count()).select_from(Servidor))
+
+
+def test_admin_ve_todas_as_secretarias(app_com_dados):
+    with app_com_dados.app_context():
+        total = db.session.scalar(select(func.count()).select_from(Servidor))
+        assert db.session.scalar(select(func.count()).select_from(Secretaria)) > 1
+    assert _contar_servidores(app_com_dados, "admin") == total
+
+
+def test_demais_perfis_ficam_na_secretaria(app_com_dados):
+    with app_com_dados.app_context():
+        _, da_secretaria = _secretaria_com_servidores()
+    assert _contar_servidores(app_com_dados, "RH") == da_secretaria
+
+
+def test_lista_de_servidores_restringe_o_admin(app_com_dados):
+    with app_com_dados.app_context():
+        secretaria_id, da_secretaria = _secretaria_com_servidores()
+    cliente = app_com_dados.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao.update({"logged_in": True, "username": "admin", "role": "admin", "secretaria_id": secretaria_id})
+    resposta = cliente.get("/api/servidores")
+    assert resposta.status_code == 200
+    assert resposta.get_json()["total"] == da_secretaria
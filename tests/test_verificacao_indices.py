@@ -0,0 +1,23 @@
+import pytest
+
+from verificacao_indices import VERIFICACOES, verificar_indices, _varreduras_sqlite
+
+
+@pytest.fixture(scope="module")
+def resultados(app_com_dados):
+    return {descricao: (ok, plano) for descricao, ok, plano in verificar_indices(app_com_dados)}
+
+
+@pytest.mark.parametrize("descricao", [f"{nome} ({perfil})" for nome, perfil, _ in VERIFICACOES])
+def test_consultas_da_rota_usam_indices(resultados, descricao):
+    ok, plano = resultados[descricao]
+    assert ok, plano
+
+
+def test_varredura_completa_e_detectada(app_com_dados):
+    # Garante que a leitura do EXPLAIN ainda reconhece uma varredura nesta versão do SQLite
+    from extensions import db
+
+    with app_com_dados.app_context(), db.engine.connect() as connection:
+        varridas, plano = _varreduras_sqlite(connection, "SELECT id FROM log WHERE action = ?", ("x",))
+    assert "log" in varridas, plano
@@ -9,6 +9,7 @@ from extensions import db
 from models import RotaTransporte, AlunoTransporte, Servidor, Veiculo, TrechoRota
 from utils import login_required, fleet_required # Adicione/crie esta importação
 from utils import role_required
+from contagem_status import em_cache
 
 
 import requests
@@ -36,18 +37,25 @@ def login_required(f):
 @login_required
 @role_required('Combustivel', 'admin')
 def dashboard():
-    total_rotas = RotaTransporte.query.count()
-    total_alunos = AlunoTransporte.query.count()
-    alunos_manha = db.session.query(db.func.sum(RotaTransporte.qtd_alunos_manha)).scalar() or 0
-    alunos_tarde = db.session.query(db.func.sum(RotaTransporte.qtd_alunos_tarde)).scalar() or 0
-    total_motoristas = db.session.query(RotaTransporte.motorista_cpf).distinct().count()
-
-    return render_template('transporte_dashboard.html', 
-                           total_rotas=total_rotas,
-                           total_alunos=total_alunos,
-                           total_motoristas=total_motoristas,
-                           alunos_manha=int(alunos_manha),
-                           alunos_tarde=int(alunos_tarde))
+    # Os números das rotas saem de uma única consulta, com cache curto (contagem_status.py)
+    indicadores = em_cache('transporte:indicadores', [RotaTransporte, AlunoTransporte], indicadores_transporte)
+    return render_template('transporte_dashboard.html', **indicadores)
+
+
+def indicadores_transporte():
+    total_rotas, alunos_manha, alunos_tarde, total_motoristas = db.session.query(
+        db.func.count(RotaTransporte.id),
+        db.func.sum(RotaTransporte.qtd_alunos_manha),
+        db.func.sum(RotaTransporte.qtd_alunos_tarde),
+        db.func.count(db.distinct(RotaTransporte.motorista_cpf)),
+    ).one()
+    return {
+        'total_rotas': total_rotas,
+        'total_alunos': AlunoTransporte.query.count(),
+        'total_motoristas': total_motoristas,
+        'alunos_manha': int(alunos_manha or 0),
+        'alunos_tarde': int(alunos_tarde or 0),
+    }
 
 @transporte_bp.route('/rotas')
 @login_required
@@ -352,9 +360,8 @@ def imprimir_aluno(aluno_id):
     aluno = AlunoTransporte.query.get_or_404(aluno_id)
     
     # Importações necessárias para o PDF
-    from .utils import cabecalho_e_rodape_moderno
+    from recursos_pdf import estilos, cabecalho_moderno
     from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.pagesizes import A4
     from reportlab.lib.enums import TA_LEFT
     from reportlab.lib import colors
@@ -364,7 +371,7 @@ def imprimir_aluno(aluno_id):
 
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=3*cm, bottomMargin=2*cm)
-    styles = getSampleStyleSheet()
+    styles = estilos()
     story = []
 
     # Conteúdo do PDF
@@ -400,7 +407,7 @@ def imprimir_aluno(aluno_id):
     ]))
     story.append(t)
 
-    doc.build(story, onFirstPage=lambda canvas, doc: cabecalho_e_rodape_moderno(canvas, doc, "Ficha do Aluno"))
+    doc.build(story, onFirstPage=cabecalho_moderno("Ficha do Aluno"))
     
     buffer.seek(0)
     response = make_response(buffer.getvalue())
@@ -1,29 +1,152 @@
 # utils.py
-import os # <-- Adicionar
-from datetime import datetime # <-- Adicionar
-from reportlab.lib.pagesizes import A4 # <-- Adicionar
-from reportlab.lib import colors # <-- Adicionar
-from reportlab.lib.units import cm # <-- Adicionar
-from reportlab.platypus import Image # <-- Adicionar
+import io
+import csv
+import re
 from functools import wraps
-from flask import session, flash, redirect, url_for, request
+from flask import session, flash, redirect, url_for, request, Response, stream_with_context
+from sqlalchemy import update as sa_update, func, select, text
 from extensions import db
-from models import Log
+from models import Sequencia
+from auditoria import registrar_log  # noqa: F401 (os blueprints importam daqui)
+from recursos_pdf import cabecalho_e_rodape, cabecalho_e_rodape_moderno  # noqa: F401
 from functools import wraps
 from flask import session, flash, redirect, url_for
 
-def registrar_log(action):
-    """Registra uma ação no banco de dados."""
-    try:
-        if 'logged_in' in session:
-            username = session.get('username', 'Anônimo')
-            ip_address = request.remote_addr
-            log_entry = Log(username=username, action=action, ip_address=ip_address)
-            db.session.add(log_entry)
-            db.session.commit()
-    except Exception as e:
-        print(f"Erro ao registrar log: {e}")
-        db.session.rollback()
+def resposta_csv_streaming(linhas, cabecalho, nome_arquivo, delimitador=";", tamanho_bloco=64 * 1024):
+    """
+    Devolve uma Response que envia o CSV aos poucos, em blocos de ~64 KB, em vez de
+    montar o arquivo inteiro na memória. 'linhas' pode ser qualquer iterável
+    (de preferência um gerador alimentado por uma query com yield_per).
+    """
+    def gerar():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=delimitador)
+        buffer.write("\ufeff")  # BOM, para o Excel abrir com acentuação correta (igual ao utf-8-sig)
+        writer.writerow(cabecalho)
+        for linha in linhas:
+            writer.writerow(linha)
+            if buffer.tell() >= tamanho_bloco:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment;filename={nome_arquivo}"},
+    )
+
+
+def upsert(connection, tabela, chaves, valores, atualizacoes):
+    """
+    INSERT ... ON CONFLICT DO UPDATE no PostgreSQL e no SQLite (UPDATE + INSERT nos demais).
+    Usado pelas tabelas de resumo que são atualizadas de forma incremental pelos eventos.
+    """
+    dialeto = connection.dialect.name
+    if dialeto in ("postgresql", "sqlite"):
+        if dialeto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(tabela).values(**chaves, **valores)
+        stmt = stmt.on_conflict_do_update(index_elements=list(chaves), set_=atualizacoes)
+        connection.execute(stmt)
+        return
+
+    condicao = [tabela.c[nome] == valor for nome, valor in chaves.items()]
+    resultado = connection.execute(sa_update(tabela).where(*condicao).values(**atualizacoes))
+    if resultado.rowcount == 0:
+        connection.execute(tabela.insert().values(**chaves, **valores))
+
+
+def upsert_em_lote(connection, tabela, chaves, linhas, manter_existentes=False):
+    """
+    Versão em lote do upsert: um único INSERT ... ON CONFLICT DO UPDATE executado
+    com executemany para todas as linhas. As colunas que não são chave são
+    sobrescritas com os valores novos; com manter_existentes=True, um valor None
+    não apaga o que já estava gravado. Nos demais bancos, cai no upsert linha a linha.
+    """
+    if not linhas:
+        return
+    colunas = [c for c in linhas[0] if c not in chaves]
+    dialeto = connection.dialect.name
+    if dialeto in ("postgresql", "sqlite"):
+        if dialeto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(tabela)
+        if manter_existentes:
+            atualizacoes = {c: func.coalesce(stmt.excluded[c], tabela.c[c]) for c in colunas}
+        else:
+            atualizacoes = {c: stmt.excluded[c] for c in colunas}
+        stmt = stmt.on_conflict_do_update(index_elements=list(chaves), set_=atualizacoes)
+        connection.execute(stmt, linhas)
+        return
+
+    for linha in linhas:
+        valores = {c: linha[c] for c in colunas}
+        atualizacoes = {c: v for c, v in valores.items() if v is not None} if manter_existentes else valores
+        upsert(connection, tabela, {c: linha[c] for c in chaves}, valores, atualizacoes or valores)
+
+
+def proximo_numero(connection, escopo):
+    """
+    Reserva e devolve o próximo número da sequência 'escopo' (tabela sequencia).
+    No PostgreSQL e no SQLite é um único INSERT ... ON CONFLICT DO UPDATE ... RETURNING:
+    a linha do escopo fica travada até o fim da transação, então dois workers nunca
+    recebem o mesmo número e, se a transação for desfeita, o número volta a ficar livre.
+    Passe a conexão da transação que grava o registro numerado (db.session.connection()).
+    """
+    tabela = Sequencia.__table__
+    dialeto = connection.dialect.name
+    if dialeto in ("postgresql", "sqlite"):
+        if dialeto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(tabela).values(escopo=escopo, ultimo=1)
+        stmt = stmt.on_conflict_do_update(index_elements=["escopo"], set_={"ultimo": tabela.c.ultimo + 1})
+        return connection.execute(stmt.returning(tabela.c.ultimo)).scalar_one()
+
+    # Demais bancos: trava a linha com SELECT ... FOR UPDATE antes de incrementar
+    atual = connection.execute(
+        select(tabela.c.ultimo).where(tabela.c.escopo == escopo).with_for_update()
+    ).scalar()
+    if atual is None:
+        connection.execute(tabela.insert().values(escopo=escopo, ultimo=1))
+        return 1
+    connection.execute(sa_update(tabela).where(tabela.c.escopo == escopo).values(ultimo=atual + 1))
+    return atual + 1
+
+
+def ajustar_sequencias(connection):
+    """
+    Leva cada contador da tabela sequencia ao maior número já emitido no seu escopo
+    (protocolos 'AAAA-MM-NNN' e contratos 'NNN/AAAA'), sem nunca diminuí-lo.
+    Usado na criação da tabela e depois de cargas que gravam números direto no banco
+    (seed-bench). Devolve {escopo: ultimo} dos contadores ajustados.
+    """
+    ultimos = {}
+    for (numero,) in connection.execute(text("SELECT numero_protocolo FROM protocolo")):
+        encontrado = re.fullmatch(r"(\d{4})-(\d{2})-(\d+)", numero or "")
+        if encontrado:
+            escopo = f"protocolo:{encontrado.group(1)}-{encontrado.group(2)}"
+            ultimos[escopo] = max(ultimos.get(escopo, 0), int(encontrado.group(3)))
+    for numero, ano in connection.execute(text("SELECT numero, ano FROM contrato")):
+        encontrado = re.fullmatch(r"(\d+)/\d{4}", numero or "")
+        if encontrado:
+            escopo = f"contrato:{ano}"
+            ultimos[escopo] = max(ultimos.get(escopo, 0), int(encontrado.group(1)))
+
+    tabela = Sequencia.__table__
+    atuais = dict(connection.execute(select(tabela.c.escopo, tabela.c.ultimo)).all())
+    ajustados = {escopo: ultimo for escopo, ultimo in ultimos.items() if ultimo > atuais.get(escopo, 0)}
+    for escopo, ultimo in ajustados.items():
+        upsert(connection, tabela, {"escopo": escopo}, {"ultimo": ultimo}, {"ultimo": ultimo})
+    return ajustados
+
 
 def login_required(f):
     """Decorador para exigir que o usuário esteja logado."""
@@ -35,60 +158,6 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
     
-def cabecalho_e_rodape(canvas, doc):
-    canvas.saveState()
-    canvas.setFont('Helvetica', 9)
-    canvas.drawString(2*cm, 1.5*cm, f"Emitido em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-    canvas.drawRightString(doc.width + doc.leftMargin, 1.5*cm, f"Página {doc.page}")
-
-    if doc.page == 1:
-        # CORREÇÃO APLICADA AQUI
-        from flask import current_app
-        basedir = current_app.root_path
-        image_path = os.path.join(basedir, 'static', 'timbre.jpg')
-        if os.path.exists(image_path):
-            canvas.drawImage(image_path, 2*cm, A4[1] - 2.5*cm, width=17*cm, height=2.2*cm, preserveAspectRatio=True, mask='auto')
-    
-    canvas.restoreState()
-
-def cabecalho_e_rodape_moderno(canvas, doc, titulo_doc="Relatório"):
-    canvas.saveState()
-    cor_principal = colors.HexColor('#004d40')
-    
-    # --- Cabeçalho ---
-    # CORREÇÃO APLICADA AQUI
-    from flask import current_app
-    basedir = current_app.root_path
-    image_path = os.path.join(basedir, 'static', 'timbre.jpg')
-
-    if os.path.exists(image_path):
-        from reportlab.lib.utils import ImageReader
-        img_reader = ImageReader(image_path)
-        img_width, img_height = img_reader.getSize()
-        aspect = img_height / float(img_width)
-        
-        logo_width = 5*cm 
-        logo_height = logo_width * aspect 
-        
-        logo = Image(image_path, width=logo_width, height=logo_height)
-        logo.drawOn(canvas, doc.leftMargin, A4[1] - doc.topMargin + 1.2*cm - logo_height)
-
-    canvas.setFont('Helvetica-Bold', 18)
-    canvas.setFillColor(colors.black)
-    canvas.drawString(doc.leftMargin + logo_width + 0.5*cm, A4[1] - doc.topMargin + 0.8*cm, titulo_doc)
-
-    # --- Rodapé ---
-    canvas.setFillColor(cor_principal)
-    canvas.rect(doc.leftMargin, doc.bottomMargin - 0.5*cm, doc.width, 0.3*cm, fill=1, stroke=0)
-    canvas.setFont('Helvetica', 8)
-    canvas.setFillColor(colors.grey)
-    canvas.drawString(doc.leftMargin, doc.bottomMargin - 0.4*cm, f"SysEduca | Emitido em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-    canvas.drawRightString(doc.width + doc.leftMargin, doc.bottomMargin - 0.4*cm, f"Página {doc.page}")
-
-    canvas.restoreState()
-    
-    
-    
 def admin_required(f):
      @wraps(f)
      def decorated_function(*args, **kwargs):
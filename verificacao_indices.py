@@ -0,0 +1,164 @@
+# verificacao_indices.py
+# Confere, com EXPLAIN, se as consultas das rotas mais usadas estão usando os
+# índices (migração 5e0a7c3d2b81 e seguintes) em vez de varrer a tabela inteira.
+# As consultas não são copiadas aqui: cada rota é chamada pelo test client do
+# Flask e os SELECTs que ela realmente manda ao banco são capturados e passados
+# pelo EXPLAIN, então a verificação acompanha o código das rotas.
+# Usado pelo comando 'flask verificar-indices', que termina com erro se alguma
+# consulta cair em varredura sequencial, e pelos testes em tests/. Rode sobre
+# uma base com dados (por exemplo, a gerada por 'flask seed-bench').
+
+import json
+import re
+
+from flask import has_app_context, url_for
+from sqlalchemy import event, select
+
+from extensions import db
+from models import Secretaria
+from benchmark_rotas import rotas
+from consulta_servidores import limpar_opcoes_filtro
+from contagem_status import limpar_contagens
+
+# (rota, perfil do usuário, índices que as consultas da rota precisam usar). As rotas
+# vêm de benchmark_rotas.rotas() ou de _rotas_extras(). Perfis diferentes de admin
+# ficam presos à secretaria (escopo_secretaria.py), o que exercita os índices de
+# secretaria_id. Além de usar os índices, nenhuma consulta da rota pode varrer a
+# tabela deles.
+VERIFICACOES = [
+    ("detalhes_veiculo", "admin", ("ix_abastecimento_placa_km", "ix_manutencao_placa_data")),
+    ("gerar_relatorio_veiculos_mensal", "admin", ("ix_abastecimento_placa_data",)),
+    ("relatorio_combustivel", "Combustivel", ("ix_veiculo_secretaria_id", "ix_abastecimento_placa_km")),
+    ("api_servidores", "RH", ("ix_servidor_secretaria_id", "ix_requerimento_status_data_inicio")),
+    ("frequencia.dashboard_frequencia", "RH", ("ix_ponto_timestamp",)),
+    ("merenda.dashboard", "admin", ("ix_estoque_movimento_tipo_data",)),
+    ("protocolo.listar_protocolos", "RH", ("ix_protocolo_data_criacao_id",)),
+    ("ver_logs", "admin", ("ix_log_timestamp_id",)),
+    ("ver_logs (por usuário)", "admin", ("ix_log_username_timestamp_id",)),
+]
+
+
+def _rotas_extras():
+    return [
+        ("ver_logs", "GET", url_for("ver_logs"), None),
+        ("ver_logs (por usuário)", "GET", url_for("ver_logs", usuario="admin"), None),
+    ]
+
+
+def _varreduras_sqlite(connection, sql, parametros=()):
+    linhas = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+    plano = [linha[-1] for linha in linhas]
+    # "SCAN tabela" sem "USING INDEX" é varredura completa (versões antigas: "SCAN TABLE tabela")
+    varridas = {
+        m.group(2) for m in (re.match(r"SCAN (TABLE )?(\w+)(?: AS \w+)?$", d) for d in plano) if m
+    }
+    return varridas, "\n".join(plano)
+
+
+def _varreduras_postgresql(connection, sql, parametros=()):
+    # Com enable_seqscan desligado o planejador só faz Seq Scan se não houver índice utilizável
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plano = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", parametros).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+
+    varridas = set()
+    pendentes = [plano[0]["Plan"]]
+    while pendentes:
+        no = pendentes.pop()
+        if no.get("Node Type") == "Seq Scan":
+            varridas.add(no.get("Relation Name"))
+        pendentes.extend(no.get("Plans", []))
+    return varridas, json.dumps(plano, indent=2)
+
+
+def capturar_consultas(app, cliente, metodo, url, dados=None):
+    """
+    Faz a requisição e devolve (status, [(sql, parâmetros), ...]) com os SELECTs
+    que ela mandou ao banco. Os caches de consultas são esvaziados antes, para
+    que as consultas cacheadas também passem pelo banco.
+    """
+    consultas = []
+
+    def capturar(conn, cursor, sql, parametros, context, executemany):
+        if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            consultas.append((sql, parametros))
+
+    with app.app_context():
+        motor = db.engine
+    limpar_opcoes_filtro()
+    limpar_contagens()
+    event.listen(motor, "before_cursor_execute", capturar)
+    try:
+        resposta = cliente.open(url, method=metodo, data=dados)
+        resposta.get_data()
+    finally:
+        event.remove(motor, "before_cursor_execute", capturar)
+    return resposta.status_code, consultas
+
+
+def _cliente(app, perfil, secretaria):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao.update({
+            "logged_in": True, "username": "verificacao", "role": perfil,
+            "secretaria_id": secretaria.id if secretaria else None,
+            "secretaria": secretaria.nome if secretaria else None,
+        })
+    return cliente
+
+
+def verificar_indices(app):
+    """
+    Chama cada rota de VERIFICACOES, roda EXPLAIN nos SELECTs capturados e devolve
+    uma lista de (descrição, ok, plano), com as consultas problemáticas em plano.
+    Não altera dados; a transação do EXPLAIN é desfeita no final. Como medir(),
+    precisa rodar fora de um app context.
+    """
+    if has_app_context():
+        raise RuntimeError("verificar_indices() precisa rodar fora de um app context.")
+    with app.test_request_context():
+        secretaria = db.session.execute(select(Secretaria.id, Secretaria.nome).limit(1)).first()
+        disponiveis = {nome: (metodo, url, dados) for nome, metodo, url, dados in rotas() + _rotas_extras()}
+        dialeto = db.engine.dialect.name
+        tabela_do_indice = {
+            indice.name: tabela.name for tabela in db.metadata.tables.values() for indice in tabela.indexes
+        }
+
+    if dialeto == "postgresql":
+        analisar = _varreduras_postgresql
+    elif dialeto == "sqlite":
+        analisar = _varreduras_sqlite
+    else:
+        raise RuntimeError(f"EXPLAIN não suportado para o banco '{dialeto}'.")
+
+    resultados = []
+    for nome, perfil, indices in VERIFICACOES:
+        descricao = f"{nome} ({perfil})"
+        metodo, url, dados = disponiveis[nome]
+        if url is None:
+            resultados.append((descricao, False, "Sem dados na base para montar a rota."))
+            continue
+        status, consultas = capturar_consultas(app, _cliente(app, perfil, secretaria), metodo, url, dados)
+        if status != 200:
+            resultados.append((descricao, False, f"A rota respondeu {status}."))
+            continue
+
+        tabelas = {tabela_do_indice[indice] for indice in indices if indice in tabela_do_indice}
+        falhas, planos = [], []
+        with app.app_context(), db.engine.connect() as connection:
+            try:
+                for sql, parametros in consultas:
+                    varridas, plano = analisar(connection, sql, parametros)
+                    planos.append(plano)
+                    if varridas & tabelas:
+                        falhas.append(f"{sql}\n{plano}")
+            finally:
+                connection.rollback()
+        falhas.extend(
+            f"Nenhuma consulta da rota usou o índice {indice}."
+            for indice in indices
+            if not any(re.search(rf"\b{indice}\b", plano) for plano in planos)
+        )
+        resultados.append((descricao, not falhas, "\n\n".join(falhas)))
+    return resultados